@@ -1,6 +1,6 @@
 import os
 from flask import Flask
-from extensions import db, login_manager, csrf, bcrypt, limiter, migrate
+from extensions import db, database, login_manager, csrf, limiter, migrate, response_cache, explorer_engine, password_hasher, instrumentation, assets, page_cache, image_store, suggestions, exports
 
 def create_app():
   app = Flask(__name__)
@@ -10,6 +10,38 @@ def create_app():
   # if database_url.startswith("postgres://"):
   #   database_url = database_url.replace("postgres://", "postgresql://", 1)
   app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+  # "memory" (per process) or "sqlite:////path/cache.db" (shared by all workers)
+  app.config["RESPONSE_CACHE_BACKEND"] = os.environ.get("RESPONSE_CACHE_BACKEND", "memory")
+  # "sql" or "columnar" (in-memory NumPy filtering for the explorer)
+  app.config["EXPLORER_ENGINE"] = os.environ.get("EXPLORER_ENGINE", "sql")
+
+  # bcrypt cost; existing hashes with another cost are upgraded at login
+  app.config["BCRYPT_LOG_ROUNDS"] = int(os.environ.get("BCRYPT_LOG_ROUNDS", 12))
+  app.config["BCRYPT_POOL_SIZE"] = int(os.environ.get("BCRYPT_POOL_SIZE", min(os.cpu_count() or 1, 4)))
+
+  # accounts allowed to upload event images (comma-separated emails)
+  app.config["ADMIN_EMAILS"] = {e.strip().lower() for e in os.environ.get("ADMIN_EMAILS", "").split(",") if e.strip()}
+
+  # Server-Timing headers, slow query log, /_metrics (needs METRICS_TOKEN)
+  app.config["INSTRUMENTATION_ENABLED"] = os.environ.get("INSTRUMENTATION") == "1"
+  app.config["METRICS_TOKEN"] = os.environ.get("METRICS_TOKEN")
+  app.config["SLOW_QUERY_MS"] = int(os.environ.get("SLOW_QUERY_MS", 100))
+
+  # render the anonymous marketing pages into the page cache at startup
+  app.config["PAGE_CACHE_PRERENDER"] = os.environ.get("PAGE_CACHE_PRERENDER") == "1"
+
+  # rate limits shared by all workers on the host (ratelimit_store.py)
+  app.config["RATELIMIT_STORAGE_URI"] = os.environ.get(
+    "RATELIMIT_STORAGE_URI", "sqlite:///" + os.path.join(app.instance_path, "ratelimit.db"),
+  )
+  app.config["RATELIMIT_STRATEGY"] = os.environ.get("RATELIMIT_STRATEGY", "sliding-window-counter")
+
+  # engine layer (database.py): SQLite pragmas, server pool settings, read replica.
+  # The defaults live in database.py; only variables that are set override them.
+  for key in ("SQLITE_JOURNAL_MODE", "SQLITE_BUSY_TIMEOUT_MS", "DB_POOL_SIZE", "DB_MAX_OVERFLOW", "DB_POOL_RECYCLE"):
+    if key in os.environ:
+      app.config[key] = os.environ[key]
+  app.config["DATABASE_REPLICA_URL"] = os.environ.get("DATABASE_REPLICA_URL")
 
   is_prod = os.environ.get("ENV", "development") == "production"
   app.config.update(
@@ -21,25 +53,37 @@ def create_app():
     REMEMBER_COOKIE_SECURE=is_prod,
   )
 
+  database.configure(app)
   db.init_app(app)
+  database.init_app(app)
   migrate.init_app(app, db) 
 
   login_manager.init_app(app)
   csrf.init_app(app)
-  bcrypt.init_app(app)
+  password_hasher.init_app(app)
   limiter.init_app(app)
+  response_cache.init_app(app)
+  explorer_engine.init_app(app)
+  instrumentation.init_app(app)
+  assets.init_app(app)
+  page_cache.init_app(app)
+  image_store.init_app(app)
+  suggestions.init_app(app)
+  exports.init_app(app)
 
   login_manager.login_view = "main.login"
 
-  from models import User
-
-  @login_manager.user_loader
-  def load_user(user_id: str):
-    return User.query.get(int(user_id))
+  # cached: no query per authenticated request while the user is unchanged
+  app.config["USER_CACHE_TTL"] = int(os.environ.get("USER_CACHE_TTL", 30))
+  from user_cache import load_user
+  login_manager.user_loader(load_user)
 
   from views import bp as main_bp
   app.register_blueprint(main_bp)
 
+  if app.config["PAGE_CACHE_PRERENDER"]:
+    page_cache.prerender(app)
+
   return app
 
 if __name__ == "__main__":
@@ -0,0 +1,300 @@
+# assets.py
+"""
+Fingerprinted, precompressed static assets.
+
+``flask assets build`` minifies the files in ASSETS, writes them to
+static/dist/ under content-hashed names (css/styles.3f9a1c0d2e4b.css) with
+.gz and, when the brotli package is installed, .br siblings, and records
+source -> hashed name in static/dist/manifest.json.
+
+Templates link assets through asset_url('css/styles.css'): the hashed file
+under /assets/ when it is in the manifest, the plain static URL otherwise
+(nothing built yet, e.g. in development). /assets/ serves the best
+precompressed variant the client accepts with a one-year immutable
+Cache-Control; a changed file gets a new name, so it never needs revalidating.
+
+rcssmin / rjsmin are used when installed; otherwise a conservative built-in
+minifier strips comments and whitespace without rewriting any code.
+"""
+import gzip
+import hashlib
+import json
+import os
+import re
+
+from flask import Blueprint, abort, current_app, request, send_from_directory, url_for
+
+try:
+  import brotli
+except ImportError:  # pragma: no cover - optional dependency
+  brotli = None
+
+try:
+  import rcssmin
+except ImportError:  # pragma: no cover - optional dependency
+  rcssmin = None
+
+try:
+  import rjsmin
+except ImportError:  # pragma: no cover - optional dependency
+  rjsmin = None
+
+ASSETS = ("css/styles.css", "css/auth.css", "js/main.js", "js/auth.js")
+
+DIST_DIR = "dist"
+MANIFEST = "manifest.json"
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+# preferred first
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+# ----------------------------
+# Minifiers
+# ----------------------------
+
+# comments and strings in one pass, so a quote inside a comment ("can't")
+# never starts a string and "/*" inside a string never starts a comment
+_CSS_TOKEN = re.compile(r"""(/\*.*?(?:\*/|\Z)|"(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')""", re.S)
+_CSS_SPACE = re.compile(r"\s+")
+_CSS_PUNCT = re.compile(r"\s*([{};,>])\s*")
+
+
+def _squeeze_css(code: str) -> str:
+  code = _CSS_SPACE.sub(" ", code)
+  return _CSS_PUNCT.sub(r"\1", code).replace(";}", "}")
+
+
+def minify_css(source: str) -> str:
+  if rcssmin is not None:
+    return rcssmin.cssmin(source)
+  out = []
+  code = []  # code since the last string; comments between parts drop out
+  for i, part in enumerate(_CSS_TOKEN.split(source)):
+    if not i % 2:
+      code.append(part)
+    elif part.startswith("/*"):
+      continue
+    else:
+      # strings are kept verbatim; only the code between them is squeezed
+      out.append(_squeeze_css("".join(code)))
+      out.append(part)
+      code = []
+  out.append(_squeeze_css("".join(code)))
+  return "".join(out).strip()
+
+
+# a "/" after one of these (or at the start) begins a regex literal
+_REGEX_PRECEDERS = set("(,=:[!&|?{};+-*%<>~^") | {""}
+
+
+def minify_js(source: str) -> str:
+  """
+  Removes comments, indentation and blank lines. Line breaks are kept so
+  automatic semicolon insertion behaves exactly as before.
+  """
+  if rjsmin is not None:
+    return rjsmin.jsmin(source)
+
+  out = []
+  i, n = 0, len(source)
+  line_start = True
+
+  def last_significant():
+    for chunk in reversed(out):
+      stripped = chunk.rstrip()
+      if stripped:
+        return stripped[-1]
+    return ""
+
+  while i < n:
+    c = source[i]
+
+    if line_start and c in " \t":
+      i += 1
+      continue
+
+    if c in "'\"`":
+      # string or template literal, copied verbatim
+      j = i + 1
+      while j < n and source[j] != c:
+        j += 2 if source[j] == "\\" else 1
+      out.append(source[i:j + 1])
+      i = j + 1
+      line_start = False
+      continue
+
+    if c == "/" and source.startswith("//", i):
+      while i < n and source[i] != "\n":
+        i += 1
+      continue
+
+    if c == "/" and source.startswith("/*", i):
+      end = source.find("*/", i + 2)
+      i = n if end < 0 else end + 2
+      continue
+
+    if c == "/" and last_significant() in _REGEX_PRECEDERS:
+      j, in_class = i + 1, False
+      while j < n and (in_class or source[j] != "/"):
+        if source[j] == "\\":
+          j += 1
+        elif source[j] == "[":
+          in_class = True
+        elif source[j] == "]":
+          in_class = False
+        j += 1
+      out.append(source[i:j + 1])
+      i = j + 1
+      line_start = False
+      continue
+
+    if c == "\n":
+      # drop trailing spaces and blank lines
+      while out and out[-1] in (" ", "\t"):
+        out.pop()
+      if out and out[-1] != "\n":
+        out.append("\n")
+      line_start = True
+      i += 1
+      continue
+
+    out.append(c)
+    line_start = False
+    i += 1
+
+  return "".join(out).strip() + "\n"
+
+
+def minify(name: str, source: str) -> str:
+  if name.endswith(".css"):
+    return minify_css(source)
+  if name.endswith(".js"):
+    return minify_js(source)
+  return source
+
+
+# ----------------------------
+# Build
+# ----------------------------
+
+def dist_path(app) -> str:
+  return os.path.join(app.static_folder, DIST_DIR)
+
+
+def build(app, clean: bool = False) -> dict:
+  """Builds every asset; returns the new manifest."""
+  dist = dist_path(app)
+  manifest = {}
+  written = set()
+
+  for name in ASSETS:
+    with open(os.path.join(app.static_folder, name), encoding="utf-8") as fp:
+      data = minify(name, fp.read()).encode("utf-8")
+
+    digest = hashlib.sha256(data).hexdigest()[:12]
+    stem, ext = os.path.splitext(name)
+    hashed = f"{stem}.{digest}{ext}"
+    target = os.path.join(dist, hashed)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+
+    _write(target, data)
+    # mtime=0 keeps the .gz byte-identical across builds
+    _write(target + ".gz", gzip.compress(data, compresslevel=9, mtime=0))
+    if brotli is not None:
+      _write(target + ".br", brotli.compress(data, quality=11))
+
+    manifest[name] = hashed
+    written.update({hashed, hashed + ".gz", hashed + ".br"})
+
+  _write(os.path.join(dist, MANIFEST), json.dumps(manifest, indent=2, sort_keys=True).encode("utf-8"))
+
+  if clean:
+    # older builds are kept by default so pages cached with their names still load
+    for root, _, files in os.walk(dist):
+      for f in files:
+        rel = os.path.relpath(os.path.join(root, f), dist).replace(os.sep, "/")
+        if rel != MANIFEST and rel not in written:
+          os.remove(os.path.join(root, f))
+
+  return manifest
+
+
+def _write(path: str, data: bytes) -> None:
+  tmp = path + ".tmp"
+  with open(tmp, "wb") as fp:
+    fp.write(data)
+  os.replace(tmp, path)
+
+
+# ----------------------------
+# Serving
+# ----------------------------
+
+bp = Blueprint("assets", __name__)
+
+
+def _manifest() -> dict:
+  """Loaded once; reloaded on change in debug mode."""
+  state = current_app.extensions["assets"]
+  path = os.path.join(dist_path(current_app), MANIFEST)
+  if state["manifest"] is None or current_app.debug:
+    try:
+      mtime = os.path.getmtime(path)
+    except OSError:
+      state["manifest"], state["mtime"] = {}, None
+      return state["manifest"]
+    if mtime != state["mtime"]:
+      with open(path, encoding="utf-8") as fp:
+        state["manifest"], state["mtime"] = json.load(fp), mtime
+  return state["manifest"]
+
+
+def asset_url(filename: str, **values) -> str:
+  """url_for('static', filename=...) but pointing at the built, hashed file."""
+  hashed = _manifest().get(filename)
+  if hashed is None:
+    return url_for("static", filename=filename, **values)
+  return url_for("assets.dist", filename=hashed, **values)
+
+
+@bp.get("/assets/<path:filename>")
+def dist(filename: str):
+  if filename == MANIFEST or filename.endswith((".gz", ".br", ".tmp")):
+    abort(404)
+  folder = dist_path(current_app)
+
+  encoding, suffix = None, ""
+  for name, ext in ENCODINGS:
+    if request.accept_encodings[name] and os.path.isfile(os.path.join(folder, filename + ext)):
+      encoding, suffix = name, ext
+      break
+
+  resp = send_from_directory(
+    folder, filename + suffix,
+    mimetype=_mimetype(filename), max_age=31536000, conditional=True, etag=True,
+  )
+  if encoding:
+    resp.headers["Content-Encoding"] = encoding
+  resp.headers["Cache-Control"] = IMMUTABLE
+  resp.vary.add("Accept-Encoding")
+  return resp
+
+
+def _mimetype(filename: str) -> str:
+  if filename.endswith(".css"):
+    return "text/css; charset=utf-8"
+  if filename.endswith(".js"):
+    return "text/javascript; charset=utf-8"
+  return "application/octet-stream"
+
+
+class Assets:
+  def __init__(self, app=None):
+    if app is not None:
+      self.init_app(app)
+
+  def init_app(self, app) -> None:
+    app.extensions["assets"] = {"manifest": None, "mtime": None}
+    app.register_blueprint(bp)
+    app.add_template_global(asset_url)
@@ -0,0 +1,9 @@
+"""
+Reproducible load and benchmark suite.
+
+  python -m bench.generate --size 100k --db /tmp/bench-100k.db
+  python -m bench.run --db /tmp/bench-100k.db --out results.json
+  python -m bench.run --db /tmp/bench-100k.db --baseline results.json
+
+See bench/generate.py and bench/run.py for the options.
+"""
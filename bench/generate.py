@@ -0,0 +1,149 @@
+# bench/generate.py
+"""
+Seeded synthetic catalogue generator.
+
+Builds a database with SIZE events (1k / 100k / 1m, or any integer) with
+realistic fan-out: 1-3 categories, 0-4 tags and 1-5 images per event,
+dates from three months ago to a year ahead, ~30% multi-day events and
+~40% free events. The same --seed always produces the same catalogue.
+Rows are written through importer.EventImporter, so the FTS index and day
+buckets are populated exactly as a real import would.
+
+Also creates the benchmark login bench@example.com / bench-password.
+
+  python -m bench.generate --size 100k --db /tmp/bench-100k.db [--seed 42]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+SIZES = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+
+BENCH_EMAIL = "bench@example.com"
+BENCH_PASSWORD = "bench-password"
+
+CATEGORIES = [
+  "Art & Culture", "Business", "Community", "Conference", "Entertainment", "Events",
+  "Exhibition", "Family", "Festival", "Food & Beverage", "Lifestyle", "Music",
+  "Shopping", "Sports",
+]
+# skewed like a real calendar: festivals and culture dominate
+CATEGORY_WEIGHTS = [14, 4, 8, 3, 9, 5, 6, 8, 16, 7, 5, 10, 3, 6]
+
+TAGS = [
+  "Outdoor", "Indoor", "Kids", "Night", "Weekend", "Tshechu", "Dzong", "Archery",
+  "Hiking", "Trek", "Crafts", "Textiles", "Market", "Live music", "Dance", "Mask dance",
+  "Photography", "Wellness", "Meditation", "Monastery", "Food tasting", "Street food",
+  "Workshop", "Talk", "Networking", "Startup", "Film", "Theatre", "Poetry", "Books",
+  "Cycling", "Running", "Football", "Basketball", "Yoga", "Birdwatching", "Nature",
+  "Heritage", "Architecture", "Festival grounds", "Free entry", "Ticketed", "Family friendly",
+  "Accessible", "Local", "International", "Winter", "Spring", "Summer", "Autumn",
+]
+
+LOCATIONS = [
+  "Thimphu", "Paro", "Punakha", "Bumthang", "Wangdue Phodrang", "Trongsa", "Haa",
+  "Phobjikha", "Mongar", "Trashigang", "Gelephu", "Samdrup Jongkhar", "Dochula Pass",
+  "Tashichho Dzong", "Rinpung Dzong", "Punakha Dzong", "Changlimithang Stadium",
+]
+
+WORDS = (
+  "valley dzong festival mask dance monastery prayer flags river pass mountain "
+  "village market archery crafts weaving textile lantern drum cymbal procession "
+  "blessing ceremony community family music night lights food tasting chili cheese "
+  "butter tea momo heritage culture trek trail forest rhododendron snow peak sunrise "
+  "sunset photography workshop talk exhibition gallery painting thangka incense"
+).split()
+
+
+def _sentence(rnd, lo, hi):
+  return " ".join(rnd.choice(WORDS) for _ in range(rnd.randint(lo, hi))).capitalize() + "."
+
+
+def records(n: int, seed: int = 42, now: datetime = None):
+  """Yields importer records; deterministic for (n, seed, now)."""
+  rnd = random.Random(seed)
+  now = (now or datetime(2026, 1, 1)).replace(hour=0, minute=0, second=0, microsecond=0)
+
+  for i in range(n):
+    start = now + timedelta(days=rnd.randint(-90, 365), hours=rnd.choice([8, 9, 10, 14, 17, 18, 19]))
+    multi_day = rnd.random() < 0.3
+    end = start + timedelta(days=rnd.randint(1, 14)) if multi_day else None
+    is_free = rnd.random() < 0.4
+
+    cats = set()
+    for _ in range(rnd.choice([1, 1, 2, 2, 3])):
+      cats.add(rnd.choices(CATEGORIES, CATEGORY_WEIGHTS)[0])
+    tags = rnd.sample(TAGS, rnd.randint(0, 4))
+
+    images = [{"url": f"https://img.example/{seed}/{i}/cover.jpg", "kind": "cover", "sort_order": 0}]
+    for g in range(rnd.randint(0, 4)):
+      images.append({
+        "url": f"https://img.example/{seed}/{i}/g{g}.jpg",
+        "kind": "gallery" if rnd.random() < 0.8 else "past",
+        "sort_order": g + 1,
+      })
+
+    location = rnd.choice(LOCATIONS)
+    yield {
+      "external_id": f"bench-{seed}-{i}",
+      "title": f"{rnd.choice(WORDS).capitalize()} {rnd.choice(WORDS)} {location} {i}",
+      "description": " ".join(_sentence(rnd, 8, 20) for _ in range(rnd.randint(2, 6))),
+      "location": location,
+      "is_free": is_free,
+      "price_cents": None if is_free else rnd.choice([500, 1000, 2500, 5000, 10000]),
+      "start_at": start.isoformat(),
+      "end_at": end.isoformat() if end else None,
+      "timezone": "Asia/Thimphu",
+      "categories": sorted(cats),
+      "tags": tags,
+      "images": images,
+    }
+
+
+def parse_size(value: str) -> int:
+  return SIZES.get(value.lower()) or int(value)
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--size", default="1k", help="1k, 100k, 1m or a number of events")
+  parser.add_argument("--db", required=True, help="SQLite file to (re)create")
+  parser.add_argument("--seed", type=int, default=42)
+  parser.add_argument("--chunk-size", type=int, default=5000)
+  args = parser.parse_args(argv)
+
+  n = parse_size(args.size)
+  path = os.path.abspath(args.db)
+  if os.path.exists(path):
+    os.remove(path)
+  os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+
+  from app import create_app
+  from extensions import db
+  from importer import EventImporter
+  from models import User
+
+  app = create_app()
+  with app.app_context():
+    db.create_all()
+
+    started = time.monotonic()
+
+    def progress(done, rate):
+      print(f"  {done:,}/{n:,} events ({rate:,.0f}/s)", file=sys.stderr)
+
+    EventImporter(chunk_size=args.chunk_size, progress=progress).run(records(n, args.seed))
+
+    user = User(email=BENCH_EMAIL, first_name="Bench")
+    user.set_password(BENCH_PASSWORD)
+    db.session.add(user)
+    db.session.commit()
+
+    print(f"Generated {n:,} events in {time.monotonic() - started:.1f}s -> {path}")
+
+
+if __name__ == "__main__":
+  main()
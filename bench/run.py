@@ -0,0 +1,343 @@
+# bench/run.py
+"""
+Benchmark runner.
+
+Drives the app through the Flask test client (default) or a running server
+(--url) and reports, per scenario: p50/p95/p99 and mean latency in ms,
+throughput in requests/s and, in test-client mode, SQL queries per request.
+
+  python -m bench.run --db /tmp/bench-100k.db --out results.json
+  python -m bench.run --db /tmp/bench-100k.db --baseline results.json --tolerance 0.2
+  python -m bench.run --url http://127.0.0.1:8000 --only api_events
+
+Every scenario has an expected status (200, or 302 for the login
+redirect); a run where any response has another status lists them and
+exits with status 1, so a fast stream of 500s or 429s never passes for a
+speed-up. With --baseline, a scenario also regresses when its p95 grows by
+more than --tolerance (a fraction), its queries-per-request go up at all,
+or it answers with other status codes than in the baseline.
+
+The response and page caches are disabled unless --cache is given, so the
+numbers measure the real work behind each endpoint rather than cache hits.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import datetime
+
+from bench.generate import BENCH_EMAIL, BENCH_PASSWORD
+
+# views.login is limited to this many POSTs per minute per client; the
+# test client turns the limiter off, a server (--url) doesn't
+LOGIN_LIMIT_PER_MINUTE = 10
+
+
+def percentile(samples, p: float) -> float:
+  """Nearest-rank percentile of an unsorted list."""
+  ordered = sorted(samples)
+  k = max(int(round(p / 100.0 * len(ordered) + 0.5)) - 1, 0)
+  return ordered[min(k, len(ordered) - 1)]
+
+
+# ---- scenarios ----
+
+def scenarios(ctx):
+  """
+  [(name, method, path, form, expected status)]; ctx holds ids/cursors
+  picked from the catalogue so the same database always yields the same
+  requests.
+  """
+  out = [
+    ("page_home", "GET", "/", None, 200),
+    ("page_about", "GET", "/about", None, 200),
+    ("page_plan", "GET", "/plan", None, 200),
+    ("page_things", "GET", "/things", None, 200),
+    ("page_calendar", "GET", "/calendar", None, 200),
+    ("page_offers", "GET", "/offers", None, 200),
+    ("page_stopover", "GET", "/stopover", None, 200),
+    ("page_login", "GET", "/login", None, 200),
+    ("api_categories", "GET", "/api/categories", None, 200),
+    ("api_calendar", "GET", "/api/calendar", None, 200),
+  ]
+
+  cats = ctx["categories"]
+  base = "/api/events?"
+  combos = {
+    "api_events": {},
+    "api_events_facets": {"facets": "1"},
+    "api_events_category": {"category": cats[0]},
+    "api_events_categories": {"category": cats[:3]},
+    "api_events_free": {"type": "free"},
+    "api_events_paid": {"type": "paid"},
+    "api_events_date_week": {"date": "week"},
+    "api_events_date_next30": {"date": "next30"},
+    "api_events_date_range": {"start": ctx["range"][0], "end": ctx["range"][1]},
+    "api_events_all_filters": {
+      "category": cats[0], "type": "free", "date": "next30", "facets": "1",
+    },
+    "api_events_search": {"q": ctx["word"]},
+    "api_events_search_filtered": {"q": ctx["word"], "category": cats[0]},
+    "api_events_sparse": {
+      "per_page": "48", "fields": "title,description,location,is_free,start_at", "include": "categories,cover_image",
+    },
+    "api_events_deep_page": {"page": str(ctx["deep_page"])},
+    "api_events_deep_cursor": {"cursor": ctx["deep_cursor"]},
+  }
+  out += [
+    (name, "GET", base + urllib.parse.urlencode(params, doseq=True), None, 200) for name, params in combos.items()
+  ]
+
+  out += [(f"api_event_detail_{i}", "GET", f"/api/events/{id_}", None, 200) for i, id_ in enumerate(ctx["detail_ids"])]
+  # a successful login redirects to the dashboard
+  out.append(("login", "POST", "/login", {"email": BENCH_EMAIL, "password": BENCH_PASSWORD}, 302))
+  return out
+
+
+def catalogue_context(app):
+  """Deterministic request parameters drawn from the database."""
+  from sqlalchemy import func, select
+
+  from extensions import db
+  from models import Category, Event
+  from views import _encode_cursor
+
+  with app.app_context():
+    categories = db.session.execute(select(Category.slug).order_by(Category.id)).scalars().all()
+    total = db.session.scalar(select(func.count(Event.id))) or 0
+    lo, hi = db.session.execute(select(func.min(Event.start_at), func.max(Event.start_at))).one()
+
+    # the middle of the catalogue, for deep offset and keyset pages
+    middle = max(total // 2, 0)
+    row = db.session.execute(
+      select(Event.start_at, Event.id).order_by(Event.start_at, Event.id).offset(middle).limit(1)
+    ).first()
+    ids = db.session.execute(
+      select(Event.id).order_by(Event.id).offset(max(total // 4, 0)).limit(3)
+    ).scalars().all()
+
+  return {
+    "categories": categories or ["music"],
+    "word": "festival",
+    "range": (
+      (lo or datetime.utcnow()).date().isoformat(),
+      (hi or datetime.utcnow()).date().isoformat(),
+    ),
+    "deep_page": max(middle // 12, 1),
+    "deep_cursor": _encode_cursor(row.start_at, row.id) if row else "",
+    "detail_ids": ids or [1],
+    "events": total,
+  }
+
+
+# ---- clients ----
+
+class TestClientDriver:
+  """In-process requests with SQL query counting."""
+
+  def __init__(self, app):
+    from sqlalchemy import event
+
+    from extensions import db
+
+    self.app = app
+    self.queries = 0
+    with app.app_context():
+      engine = db.engine
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _count(*args, **kwargs):
+      self.queries += 1
+
+    self.client = app.test_client()
+
+  def request(self, method, path, form):
+    # logins get a fresh cookie jar, otherwise the second one just redirects
+    client = self.app.test_client() if form is not None else self.client
+    before = self.queries
+    response = client.open(path, method=method, data=form)
+    response.get_data()
+    return response.status_code, self.queries - before
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+  # report the redirect itself, as the test client does
+  def redirect_request(self, *args, **kwargs):
+    return None
+
+
+class HTTPDriver:
+  """Requests against a running server; queries are not observable."""
+
+  def __init__(self, base_url):
+    self.base_url = base_url.rstrip("/")
+    self.opener = urllib.request.build_opener(_NoRedirect)
+
+  def request(self, method, path, form):
+    data = urllib.parse.urlencode(form).encode("utf-8") if form is not None else None
+    req = urllib.request.Request(self.base_url + path, data=data, method=method)
+    try:
+      with self.opener.open(req) as response:
+        response.read()
+        return response.status, None
+    except urllib.error.HTTPError as exc:
+      return exc.code, None
+
+
+# ---- running ----
+
+def measure(driver, method, path, form, expected: int, iterations: int, warmup: int):
+  for _ in range(warmup):
+    driver.request(method, path, form)
+
+  latencies, queries, statuses = [], [], {}
+  started = time.perf_counter()
+  for _ in range(iterations):
+    t0 = time.perf_counter()
+    status, n = driver.request(method, path, form)
+    latencies.append((time.perf_counter() - t0) * 1000.0)
+    statuses[status] = statuses.get(status, 0) + 1
+    if n is not None:
+      queries.append(n)
+  elapsed = time.perf_counter() - started
+
+  return {
+    "path": path,
+    "method": method,
+    "n": iterations,
+    "p50_ms": round(percentile(latencies, 50), 3),
+    "p95_ms": round(percentile(latencies, 95), 3),
+    "p99_ms": round(percentile(latencies, 99), 3),
+    "mean_ms": round(statistics.fmean(latencies), 3),
+    "rps": round(iterations / elapsed, 1) if elapsed else None,
+    "queries_per_request": round(statistics.fmean(queries), 2) if queries else None,
+    "status": {str(k): v for k, v in sorted(statuses.items())},
+    "expected_status": expected,
+  }
+
+
+def unexpected_statuses(results):
+  """Messages for scenarios that answered with anything but their expected status."""
+  problems = []
+  for name, result in results["scenarios"].items():
+    other = {k: v for k, v in result["status"].items() if k != str(result["expected_status"])}
+    if other:
+      got = ", ".join(f"{v}x {k}" for k, v in other.items())
+      problems.append(f"{name}: {got} (expected {result['expected_status']})")
+  return problems
+
+
+def compare(results, baseline, tolerance: float):
+  """Regression messages for results against baseline."""
+  problems = []
+  for name, base in baseline.get("scenarios", {}).items():
+    current = results["scenarios"].get(name)
+    if current is None:
+      continue
+    limit = base["p95_ms"] * (1.0 + tolerance)
+    if current["p95_ms"] > limit:
+      problems.append(f"{name}: p95 {current['p95_ms']:.2f}ms > {base['p95_ms']:.2f}ms (+{tolerance:.0%})")
+    bq, cq = base.get("queries_per_request"), current.get("queries_per_request")
+    if bq is not None and cq is not None and cq > bq:
+      problems.append(f"{name}: {cq} queries/request > {bq}")
+    bs, cs = sorted(base.get("status", {})), sorted(current.get("status", {}))
+    if bs and cs != bs:
+      problems.append(f"{name}: status {', '.join(cs)} != baseline {', '.join(bs)}")
+  return problems
+
+
+def make_app(db_path, use_cache: bool):
+  os.environ["DATABASE_URL"] = f"sqlite:///{os.path.abspath(db_path)}"
+  from app import create_app
+
+  from extensions import limiter
+
+  app = create_app()
+  app.config.update(WTF_CSRF_ENABLED=False, RESPONSE_CACHE_ENABLED=use_cache, PAGE_CACHE_ENABLED=use_cache)
+  # /login is limited to 10/minute
+  limiter.enabled = False
+  return app
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--db", help="database built by bench.generate (test-client mode)")
+  parser.add_argument("--url", help="base URL of a running server instead of the test client")
+  parser.add_argument("--iterations", type=int, default=50)
+  parser.add_argument("--warmup", type=int, default=5)
+  parser.add_argument("--login-iterations", type=int, default=5, help="logins are bcrypt-bound; keep these few")
+  parser.add_argument("--only", action="append", default=[], help="run scenarios starting with this prefix")
+  parser.add_argument("--cache", action="store_true", help="leave the response and page caches enabled")
+  parser.add_argument("--out", help="write results JSON here (default: stdout)")
+  parser.add_argument("--baseline", help="results JSON to compare against")
+  parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p95 growth, as a fraction")
+  args = parser.parse_args(argv)
+
+  if not args.db:
+    parser.error("--db is required (for --url, the database the server uses)")
+
+  app = make_app(args.db, args.cache)
+  ctx = catalogue_context(app)
+  driver = HTTPDriver(args.url) if args.url else TestClientDriver(app)
+
+  results = {
+    "meta": {
+      "created_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+      "mode": "http" if args.url else "test-client",
+      "events": ctx["events"],
+      "iterations": args.iterations,
+      "cache": args.cache,
+      "python": platform.python_version(),
+      "platform": platform.platform(),
+    },
+    "scenarios": {},
+  }
+
+  for name, method, path, form, expected in scenarios(ctx):
+    if args.only and not any(name.startswith(prefix) for prefix in args.only):
+      continue
+    iterations = args.login_iterations if form is not None else args.iterations
+    warmup = min(args.warmup, 1) if form is not None else args.warmup
+    if args.url and path == "/login" and method == "POST" and iterations + warmup > LOGIN_LIMIT_PER_MINUTE:
+      print(
+        f"warning: {name} sends {iterations + warmup} logins, the server allows {LOGIN_LIMIT_PER_MINUTE}/minute;"
+        " expect 429s (lower --login-iterations)",
+        file=sys.stderr,
+      )
+    result = measure(driver, method, path, form, expected, iterations, warmup)
+    results["scenarios"][name] = result
+    print(
+      f"{name:32} p50 {result['p50_ms']:8.2f}  p95 {result['p95_ms']:8.2f}  p99 {result['p99_ms']:8.2f} ms"
+      f"  {result['rps'] or 0:8.1f} req/s  q/req {result['queries_per_request']}",
+      file=sys.stderr,
+    )
+
+  encoded = json.dumps(results, indent=2, sort_keys=True)
+  if args.out:
+    with open(args.out, "w", encoding="utf-8") as fp:
+      fp.write(encoded + "\n")
+  else:
+    print(encoded)
+
+  failed = False
+  for problem in unexpected_statuses(results):
+    print("UNEXPECTED STATUS " + problem, file=sys.stderr)
+    failed = True
+  if args.baseline:
+    with open(args.baseline, encoding="utf-8") as fp:
+      problems = compare(results, json.load(fp), args.tolerance)
+    for problem in problems:
+      print("REGRESSION " + problem, file=sys.stderr)
+      failed = True
+  if failed:
+    sys.exit(1)
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,129 @@
+# bench/startup.py
+"""
+Cold-start benchmark.
+
+Each trial runs in a fresh interpreter and reports the process start-up
+time, the time to import and build the app (create_app), and the latency of
+the first request to each of FIRST_REQUESTS, in that order. Trials alternate
+between a cold app and one warmed with warmup.warm() first, as wsgi.py does
+in the gunicorn master:
+
+  python -m bench.startup --db /tmp/bench-100k.db --out startup.json
+  python -m bench.startup --db /tmp/bench-100k.db --baseline startup.json --tolerance 0.2
+
+Results use the bench.run format (p50/p95/mean per scenario), and --baseline
+fails the same way, on p95 growth beyond --tolerance.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+from bench.run import compare, percentile
+
+FIRST_REQUESTS = ("/", "/api/categories", "/api/events")
+
+
+def child(db_path, warm: bool) -> dict:
+  """One trial in this (fresh) process; timings in ms."""
+  os.environ["DATABASE_URL"] = f"sqlite:///{os.path.abspath(db_path)}"
+  started = time.perf_counter()
+  from app import create_app
+
+  import warmup
+
+  app = create_app()
+  trial = {"create_app": (time.perf_counter() - started) * 1000.0}
+  if warm:
+    started = time.perf_counter()
+    warmup.warm(app)
+    trial["warmup"] = (time.perf_counter() - started) * 1000.0
+
+  client = app.test_client()
+  for path in FIRST_REQUESTS:
+    started = time.perf_counter()
+    response = client.get(path, headers={"Accept": "*/*"})
+    response.get_data()
+    if response.status_code != 200:
+      raise SystemExit(f"{path}: HTTP {response.status_code}")
+    trial[f"first_request{path}"] = (time.perf_counter() - started) * 1000.0
+  return trial
+
+
+def run_trial(db_path, warm: bool) -> dict:
+  command = [sys.executable, "-m", "bench.startup", "--child", "--db", db_path]
+  if warm:
+    command.append("--warm")
+  started = time.perf_counter()
+  output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+  trial = json.loads(output)
+  trial["process"] = (time.perf_counter() - started) * 1000.0
+  return trial
+
+
+def summarize(samples) -> dict:
+  return {
+    "n": len(samples),
+    "p50_ms": round(percentile(samples, 50), 2),
+    "p95_ms": round(percentile(samples, 95), 2),
+    "mean_ms": round(statistics.fmean(samples), 2),
+  }
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--db", required=True, help="database built by bench.generate")
+  parser.add_argument("--trials", type=int, default=5, help="processes per mode (cold, warm)")
+  parser.add_argument("--out", help="write results JSON here (default: stdout)")
+  parser.add_argument("--baseline", help="results JSON to compare against")
+  parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p95 growth, as a fraction")
+  parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+  parser.add_argument("--warm", action="store_true", help=argparse.SUPPRESS)
+  args = parser.parse_args(argv)
+
+  if args.child:
+    print(json.dumps(child(args.db, args.warm)))
+    return
+
+  samples = {}
+  for _ in range(args.trials):
+    for mode in ("cold", "warm"):
+      for name, ms in run_trial(args.db, mode == "warm").items():
+        samples.setdefault(f"{mode}:{name}", []).append(ms)
+
+  results = {
+    "meta": {
+      "created_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+      "mode": "startup",
+      "trials": args.trials,
+      "python": platform.python_version(),
+      "platform": platform.platform(),
+    },
+    "scenarios": {name: summarize(values) for name, values in sorted(samples.items())},
+  }
+  for name, result in results["scenarios"].items():
+    print(f"{name:34} p50 {result['p50_ms']:8.2f}  p95 {result['p95_ms']:8.2f} ms", file=sys.stderr)
+
+  encoded = json.dumps(results, indent=2, sort_keys=True)
+  if args.out:
+    with open(args.out, "w", encoding="utf-8") as fp:
+      fp.write(encoded + "\n")
+  else:
+    print(encoded)
+
+  if args.baseline:
+    with open(args.baseline, encoding="utf-8") as fp:
+      problems = compare(results, json.load(fp), args.tolerance)
+    for problem in problems:
+      print("REGRESSION " + problem, file=sys.stderr)
+    if problems:
+      sys.exit(1)
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,368 @@
+# cache.py
+"""
+Versioned response cache for the read-only catalogue APIs.
+
+Cached bodies are keyed on (endpoint, normalised query params, negotiated
+body format, catalogue version). The catalogue version is a counter in the cache backend that is
+bumped after any commit touching events, event images, categories or tags,
+so stale entries are simply never looked up again and age out of the LRU.
+
+Backends (RESPONSE_CACHE_BACKEND):
+  "memory"              per-process LRU (default)
+  "sqlite:///<path>"    file shared by every worker process on the host
+  or any object with get / set / delete / incr / get_counter
+
+With "memory", the version (and catalog_changed) only moves in the process
+that committed: other workers and `flask import-events` runs don't see it,
+so their entries are bounded by TTLs alone. Deployments with more than one
+worker process should use the sqlite backend.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from blinker import Namespace
+from flask import Response, current_app, has_app_context, make_response, request
+from sqlalchemy import event, inspect, select, table, column
+from sqlalchemy.orm import Session
+
+from database import replica_used
+
+# Tables whose rows make up the public catalogue
+CATALOG_TABLES = {"events", "event_images", "categories", "tags"}
+
+CATALOG_VERSION_KEY = "catalog:version"
+
+_signals = Namespace()
+
+# Sent after a commit that changed the catalogue, with event_ids= the set of
+# event ids whose public document may have changed and version= the new
+# catalogue version.
+catalog_changed = _signals.signal("catalog-changed")
+
+_event_categories = table("event_categories", column("event_id"), column("category_id"))
+_event_tags = table("event_tags", column("event_id"), column("tag_id"))
+
+
+# ----------------------------
+# Backends
+# ----------------------------
+
+class MemoryCacheBackend:
+  """Thread-safe, bounded LRU for a single process."""
+
+  # counters (the catalogue version) are seen by this process only
+  shared = False
+
+  def __init__(self, max_entries: int = 1024):
+    self.max_entries = max_entries
+    self._entries = OrderedDict()
+    self._counters = {}
+    self._lock = threading.Lock()
+
+  def get(self, key):
+    with self._lock:
+      item = self._entries.get(key)
+      if item is None:
+        return None
+      expires, value = item
+      if expires and expires < time.time():
+        del self._entries[key]
+        return None
+      self._entries.move_to_end(key)
+      return value
+
+  def set(self, key, value: bytes, ttl: int = 0) -> None:
+    with self._lock:
+      self._entries[key] = (time.time() + ttl if ttl else 0, value)
+      self._entries.move_to_end(key)
+      while len(self._entries) > self.max_entries:
+        self._entries.popitem(last=False)
+
+  def delete(self, key) -> None:
+    with self._lock:
+      self._entries.pop(key, None)
+
+  def incr(self, key) -> int:
+    with self._lock:
+      self._counters[key] = self._counters.get(key, 0) + 1
+      return self._counters[key]
+
+  def get_counter(self, key) -> int:
+    return self._counters.get(key, 0)
+
+
+class SQLiteCacheBackend:
+  """
+  Bounded cache in a local SQLite file (WAL), shared by all processes on a
+  host. Eviction is least-recently-read once max_entries is exceeded; each
+  table is bounded on its own, and all tables share the counters.
+  """
+
+  # evict every N writes rather than on each one
+  EVICT_EVERY = 64
+
+  shared = True
+
+  def __init__(self, path: str, max_entries: int = 1024, table: str = "cache_entries"):
+    self.path = path
+    self.max_entries = max_entries
+    self.table = table
+    self._local = threading.local()
+    self._writes = 0
+
+  def _conn(self):
+    conn = getattr(self._local, "conn", None)
+    # connections must not cross a fork
+    if conn is None or self._local.pid != os.getpid():
+      conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+      conn.execute("PRAGMA journal_mode=WAL")
+      conn.execute("PRAGMA synchronous=NORMAL")
+      conn.execute(
+        f"CREATE TABLE IF NOT EXISTS {self.table} ("
+        " key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL NOT NULL, accessed REAL NOT NULL)"
+      )
+      conn.execute(f"CREATE INDEX IF NOT EXISTS ix_{self.table}_accessed ON {self.table} (accessed)")
+      conn.execute("CREATE TABLE IF NOT EXISTS cache_counters (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+      self._local.conn = conn
+      self._local.pid = os.getpid()
+    return conn
+
+  def get(self, key):
+    conn = self._conn()
+    now = time.time()
+    row = conn.execute(f"SELECT value, expires FROM {self.table} WHERE key = ?", (key,)).fetchone()
+    if row is None:
+      return None
+    value, expires = row
+    if expires and expires < now:
+      conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+      return None
+    conn.execute(f"UPDATE {self.table} SET accessed = ? WHERE key = ?", (now, key))
+    return value
+
+  def set(self, key, value: bytes, ttl: int = 0) -> None:
+    conn = self._conn()
+    now = time.time()
+    conn.execute(
+      f"INSERT OR REPLACE INTO {self.table} (key, value, expires, accessed) VALUES (?, ?, ?, ?)",
+      (key, value, now + ttl if ttl else 0, now),
+    )
+    self._writes += 1
+    if self._writes % self.EVICT_EVERY == 0:
+      self._evict(conn, now)
+
+  def _evict(self, conn, now: float) -> None:
+    conn.execute(f"DELETE FROM {self.table} WHERE expires > 0 AND expires < ?", (now,))
+    conn.execute(
+      f"DELETE FROM {self.table} WHERE key IN ("
+      f" SELECT key FROM {self.table} ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+      (self.max_entries,),
+    )
+
+  def delete(self, key) -> None:
+    self._conn().execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+
+  def incr(self, key) -> int:
+    return self._conn().execute(
+      "INSERT INTO cache_counters (key, value) VALUES (?, 1)"
+      " ON CONFLICT(key) DO UPDATE SET value = value + 1 RETURNING value",
+      (key,),
+    ).fetchone()[0]
+
+  def get_counter(self, key) -> int:
+    row = self._conn().execute("SELECT value FROM cache_counters WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else 0
+
+
+def _backend_from_config(spec, max_entries: int, table: str = "cache_entries"):
+  if not isinstance(spec, str):
+    return spec
+  if spec == "memory":
+    return MemoryCacheBackend(max_entries)
+  if spec.startswith("sqlite:///"):
+    return SQLiteCacheBackend(spec[len("sqlite:///"):], max_entries, table)
+  raise ValueError(f"Unknown RESPONSE_CACHE_BACKEND: {spec!r}")
+
+
+# ----------------------------
+# Extension
+# ----------------------------
+
+class ResponseCache:
+  def __init__(self, app=None):
+    if app is not None:
+      self.init_app(app)
+
+  def init_app(self, app) -> None:
+    app.config.setdefault("RESPONSE_CACHE_ENABLED", True)
+    app.config.setdefault("RESPONSE_CACHE_BACKEND", "memory")
+    app.config.setdefault("RESPONSE_CACHE_MAX_ENTRIES", 1024)
+    # bounds how long relative date presets ("today", "next30") can drift
+    app.config.setdefault("RESPONSE_CACHE_TTL", 60)
+    # pre-encoded event documents (documents.py), bounded apart from the
+    # responses so that paging through events doesn't evict them
+    app.config.setdefault("EVENT_DOC_TTL", 300)
+    app.config.setdefault("EVENT_DOC_MAX_ENTRIES", 10000)
+
+    app.extensions["response_cache"] = _backend_from_config(
+      app.config["RESPONSE_CACHE_BACKEND"], app.config["RESPONSE_CACHE_MAX_ENTRIES"]
+    )
+    app.extensions["event_documents"] = _backend_from_config(
+      app.config["RESPONSE_CACHE_BACKEND"], app.config["EVENT_DOC_MAX_ENTRIES"], "event_documents"
+    )
+
+
+def get_backend():
+  return current_app.extensions["response_cache"]
+
+
+def get_document_backend():
+  """Store for the pre-encoded event documents; same kind as get_backend()."""
+  return current_app.extensions["event_documents"]
+
+
+def catalog_version() -> int:
+  return get_backend().get_counter(CATALOG_VERSION_KEY)
+
+
+def version_is_shared() -> bool:
+  """Whether commits made by other processes move catalog_version() here too."""
+  return getattr(get_backend(), "shared", False)
+
+
+def bump_catalog_version() -> int:
+  return get_backend().incr(CATALOG_VERSION_KEY)
+
+
+def notify_catalog_changed(event_ids=()) -> int:
+  """
+  Bump the catalogue version and send catalog_changed. Called automatically
+  after ORM commits; bulk writers that bypass the ORM call it themselves.
+  """
+  version = bump_catalog_version()
+  catalog_changed.send(
+    current_app._get_current_object(), event_ids=frozenset(event_ids), version=version
+  )
+  return version
+
+
+def _cache_key() -> str:
+  from documents import wants_msgpack  # documents imports this module
+
+  params = sorted(request.args.items(multi=True))
+  # views may negotiate the body format on Accept; key on the outcome, not
+  # the raw header, so each browser's Accept string doesn't get its own copy
+  body_format = "msgpack" if wants_msgpack() else "json"
+  raw = repr((request.endpoint, sorted(request.view_args.items()), params, body_format))
+  digest = hashlib.sha1(raw.encode("utf-8")).hexdigest()
+  return f"response:{catalog_version()}:{digest}"
+
+
+def cached_response(view):
+  """
+  Cache a view's 200 responses and answer If-None-Match with 304.
+  Stored value is b"<etag>\\n<mimetype>\\n<body>" so a revalidation needs no query.
+  """
+  @wraps(view)
+  def wrapper(*args, **kwargs):
+    if not current_app.config["RESPONSE_CACHE_ENABLED"]:
+      return view(*args, **kwargs)
+
+    backend = get_backend()
+    key = _cache_key()
+
+    entry = backend.get(key)
+    if entry is not None:
+      etag, mimetype, body = bytes(entry).split(b"\n", 2)
+      resp = Response(body, mimetype=mimetype.decode("ascii"))
+      resp.set_etag(etag.decode("ascii"))
+      resp.headers["X-Cache"] = "HIT"
+    else:
+      resp = make_response(view(*args, **kwargs))
+      if resp.status_code != 200 or resp.is_streamed:
+        return resp
+      body = resp.get_data()
+      etag = hashlib.sha1(body).hexdigest()
+      # a lagging replica's answer would outlive its lag under this version's key
+      if not replica_used():
+        backend.set(
+          key,
+          b"\n".join((etag.encode("ascii"), resp.mimetype.encode("ascii"), body)),
+          current_app.config["RESPONSE_CACHE_TTL"],
+        )
+      resp.set_etag(etag)
+      resp.headers["X-Cache"] = "MISS"
+
+    # let browsers keep the body but always revalidate (cheap 304)
+    resp.headers["Cache-Control"] = "no-cache"
+    resp.vary.add("Accept")
+    return resp.make_conditional(request)
+
+  return wrapper
+
+
+# ----------------------------
+# Catalogue change tracking
+# ----------------------------
+
+def is_catalog_row(obj) -> bool:
+  return getattr(obj, "__tablename__", None) in CATALOG_TABLES
+
+
+def affected_event_ids(session, objs) -> set:
+  """Ids of events whose document depends on any of the flushed rows."""
+  ids = set()
+  category_ids, tag_ids = set(), set()
+
+  for obj in objs:
+    name = obj.__tablename__
+    if name == "events":
+      ids.add(obj.id)
+    elif name == "event_images":
+      # include the previous owner if the image was moved
+      history = inspect(obj).attrs.event_id.history
+      ids.update(i for i in (*history.added, *history.unchanged, *history.deleted) if i is not None)
+    elif name == "categories" and obj.id is not None:
+      category_ids.add(obj.id)
+    elif name == "tags" and obj.id is not None:
+      tag_ids.add(obj.id)
+
+  conn = session.connection()
+  if category_ids:
+    ids.update(conn.execute(
+      select(_event_categories.c.event_id).where(_event_categories.c.category_id.in_(category_ids))
+    ).scalars())
+  if tag_ids:
+    ids.update(conn.execute(
+      select(_event_tags.c.event_id).where(_event_tags.c.tag_id.in_(tag_ids))
+    ).scalars())
+
+  ids.discard(None)
+  return ids
+
+
+@event.listens_for(Session, "after_flush")
+def _track_catalog_changes(session, flush_context):
+  changed = [o for o in (*session.new, *session.dirty, *session.deleted) if is_catalog_row(o)]
+  if changed:
+    session.info["catalog_changed"] = True
+    session.info.setdefault("catalog_event_ids", set()).update(affected_event_ids(session, changed))
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_on_commit(session):
+  event_ids = session.info.pop("catalog_event_ids", set())
+  if session.info.pop("catalog_changed", False) and has_app_context():
+    if "response_cache" in current_app.extensions:
+      notify_catalog_changed(event_ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_on_rollback(session):
+  session.info.pop("catalog_changed", None)
+  session.info.pop("catalog_event_ids", None)
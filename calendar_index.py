@@ -0,0 +1,177 @@
+# calendar_index.py
+"""
+Per-day buckets for events (``event_days``).
+
+Every event gets one row per local calendar day it touches, computed in the
+event's own ``timezone`` (``start_at``/``end_at`` are stored as naive UTC).
+Rows are rewritten whenever an event's dates or timezone change, so date
+window lookups and the month calendar become index range scans on
+``event_days.day``. Events longer than MAX_SPAN_DAYS are bucketed for their
+first MAX_SPAN_DAYS days only and matched on their dates past that.
+``flask db upgrade`` creates and fills the table for an existing database;
+``flask calendar-index`` rebuilds it.
+"""
+from datetime import date, datetime, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from sqlalchemy import delete, event, insert, inspect, select
+from sqlalchemy.orm import Session
+
+from extensions import db
+from models import Event, event_days
+
+# Cap for very long-running events (exhibitions, "all year" entries)
+MAX_SPAN_DAYS = 400
+
+# Largest UTC offset, used to widen UTC windows into local-day ranges
+_MAX_OFFSET = timedelta(hours=14)
+
+# An event that started at least this long before a window can still reach
+# it past its last (capped) bucket; those are matched on their dates instead
+_BUCKETED = timedelta(days=MAX_SPAN_DAYS - 2)
+
+_BUCKET_FIELDS = ("start_at", "end_at", "timezone")
+
+_zones = {}
+
+
+def _zone(name: str):
+  if name not in _zones:
+    try:
+      _zones[name] = ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+      _zones[name] = timezone.utc
+  return _zones[name]
+
+
+def local_days(start_at: datetime, end_at, tz_name: str):
+  """Local dates covered by [start_at, end_at] (naive UTC) in tz_name."""
+  tz = _zone(tz_name or "UTC")
+  first = start_at.replace(tzinfo=timezone.utc).astimezone(tz).date()
+  last = (end_at or start_at).replace(tzinfo=timezone.utc).astimezone(tz).date()
+  span = min(max((last - first).days, 0), MAX_SPAN_DAYS)
+  return [first + timedelta(days=i) for i in range(span + 1)]
+
+
+def bucket_rows(event_id: int, start_at: datetime, end_at, tz_name: str):
+  return [{"day": d, "event_id": event_id} for d in local_days(start_at, end_at, tz_name)]
+
+
+def window_event_ids(start: datetime, end: datetime):
+  """
+  Select of candidate event ids touching the UTC window [start, end),
+  widened by the largest UTC offset. Callers still apply the exact
+  overlap predicate; this only narrows the scan to an index range.
+  """
+  return (
+    select(event_days.c.event_id)
+    .where(
+      event_days.c.day >= (start - _MAX_OFFSET).date(),
+      event_days.c.day <= (end + _MAX_OFFSET).date(),
+    )
+  )
+
+
+def window_filter(start: datetime, end: datetime):
+  """
+  Candidate events for the UTC window [start, end): the day buckets, plus
+  events longer than MAX_SPAN_DAYS whose buckets stop before the window.
+  Callers still apply the exact overlap predicate.
+  """
+  return db.or_(
+    Event.id.in_(window_event_ids(start, end)),
+    _long_running(start),
+  )
+
+
+def _long_running(start: datetime):
+  return db.and_(Event.start_at < start - _BUCKETED, Event.end_at >= start)
+
+
+def month_days(year: int, month: int):
+  """{date: [event_id, ...]} for every local day of the month with events."""
+  first = date(year, month, 1)
+  nxt = date(year + month // 12, month % 12 + 1, 1)
+  rows = db.session.execute(
+    select(event_days.c.day, event_days.c.event_id)
+    .where(event_days.c.day >= first, event_days.c.day < nxt)
+    .order_by(event_days.c.day, event_days.c.event_id)
+  )
+  days = {}
+  for day, event_id in rows:
+    days.setdefault(day, []).append(event_id)
+
+  # days past the bucket cap of very long events
+  window_start = datetime.combine(first, datetime.min.time()) - _MAX_OFFSET
+  window_end = datetime.combine(nxt, datetime.min.time()) + _MAX_OFFSET
+  long_rows = db.session.execute(
+    select(Event.id, Event.start_at, Event.end_at, Event.timezone)
+    .where(Event.start_at < window_end - _BUCKETED, Event.end_at >= window_start)
+  )
+  for r in long_rows:
+    tz = _zone(r.timezone or "UTC")
+    begin = max(r.start_at.replace(tzinfo=timezone.utc).astimezone(tz).date(), first)
+    last = min(r.end_at.replace(tzinfo=timezone.utc).astimezone(tz).date(), nxt - timedelta(days=1))
+    for i in range((last - begin).days + 1):
+      ids = days.setdefault(begin + timedelta(days=i), [])
+      if r.id not in ids:
+        ids.append(r.id)
+        ids.sort()
+  return days
+
+
+def rebuild(conn, event_ids=None, batch_size: int = 5000) -> int:
+  """Rewrite buckets for event_ids (all events if None). Returns rows written."""
+  stmt = select(Event.id, Event.start_at, Event.end_at, Event.timezone)
+  if event_ids is None:
+    conn.execute(delete(event_days))
+  else:
+    event_ids = list(event_ids)
+    if not event_ids:
+      return 0
+    conn.execute(delete(event_days).where(event_days.c.event_id.in_(event_ids)))
+    stmt = stmt.where(Event.id.in_(event_ids))
+
+  written = 0
+  rows = []
+  for r in conn.execute(stmt):
+    rows.extend(bucket_rows(r.id, r.start_at, r.end_at, r.timezone))
+    if len(rows) >= batch_size:
+      conn.execute(insert(event_days), rows)
+      written += len(rows)
+      rows = []
+  if rows:
+    conn.execute(insert(event_days), rows)
+    written += len(rows)
+  return written
+
+
+# ----------------------------
+# Keep buckets in sync with the ORM
+# ----------------------------
+
+@event.listens_for(Session, "before_flush")
+def _drop_deleted_buckets(session, flush_context, instances):
+  ids = [o.id for o in session.deleted if isinstance(o, Event) and o.id is not None]
+  if ids:
+    session.connection().execute(delete(event_days).where(event_days.c.event_id.in_(ids)))
+
+
+@event.listens_for(Session, "after_flush")
+def _write_buckets(session, flush_context):
+  changed = [o for o in session.new if isinstance(o, Event)]
+  for o in session.dirty:
+    if isinstance(o, Event) and o not in session.deleted:
+      state = inspect(o)
+      if any(state.attrs[f].history.has_changes() for f in _BUCKET_FIELDS):
+        changed.append(o)
+  if not changed:
+    return
+
+  conn = session.connection()
+  conn.execute(delete(event_days).where(event_days.c.event_id.in_([o.id for o in changed])))
+  rows = []
+  for o in changed:
+    rows.extend(bucket_rows(o.id, o.start_at, o.end_at, o.timezone))
+  if rows:
+    conn.execute(insert(event_days), rows)
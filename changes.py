@@ -0,0 +1,166 @@
+# changes.py
+"""
+Change feed for the event catalogue (``GET /api/events/changes``).
+
+Every event carries a ``change_seq`` taken from a counter row
+(``change_counters``) and bumped, together with ``updated_at``, in the same
+transaction as any change to the event's public document: the event itself,
+its images, or one of its categories/tags (the rows cache.py tracks). A
+deleted event leaves a tombstone with its own sequence number. The feed is
+the union of both, ordered by (change_seq, id), so a client that stores the
+last cursor only ever downloads what changed since.
+
+Incrementing the counter row locks it until commit, so sequence numbers
+become visible in commit order and a cursor never skips a change committed
+later with a lower number.
+
+The importer stamps its chunks with stamp(). ``flask db upgrade`` adds the
+feed to an existing database and numbers its events; ``flask change-feed``
+numbers any event still without a sequence.
+"""
+import base64
+
+from sqlalchemy import DDL, event, func, insert, literal, select, tuple_, union_all, update
+from sqlalchemy.orm import Session
+
+from cache import affected_event_ids, is_catalog_row
+from extensions import db
+from models import ChangeCounter, Event, EventTombstone
+
+SEQUENCE = "events"
+
+event.listen(
+  ChangeCounter.__table__, "after_create",
+  DDL(f"INSERT INTO change_counters (name, value) VALUES ('{SEQUENCE}', 0)"),
+)
+
+
+# ----------------------------
+# Sequence
+# ----------------------------
+
+def next_seq(conn) -> int:
+  """Increments the events counter in conn's transaction and returns it."""
+  value = conn.execute(
+    update(ChangeCounter)
+      .where(ChangeCounter.name == SEQUENCE)
+      .values(value=ChangeCounter.value + 1)
+      .returning(ChangeCounter.value)
+  ).scalar()
+  if value is None:
+    # counter table created before the seed row existed
+    value = 1
+    conn.execute(insert(ChangeCounter).values(name=SEQUENCE, value=value))
+  return value
+
+
+def current_seq() -> int:
+  """The events counter as committed; 0 before the first change."""
+  return db.session.execute(select(ChangeCounter.value).where(ChangeCounter.name == SEQUENCE)).scalar() or 0
+
+
+def stamp(conn, event_ids, seq=None):
+  """Moves event_ids to the head of the feed. Returns the sequence used."""
+  event_ids = list(event_ids)
+  if not event_ids:
+    return None
+  seq = next_seq(conn) if seq is None else seq
+  conn.execute(
+    update(Event)
+      .where(Event.id.in_(event_ids))
+      .values(change_seq=seq, updated_at=func.now())
+  )
+  return seq
+
+
+def tombstone(conn, events, seq=None) -> None:
+  """Records deletes for events, a list of (id, external_id)."""
+  if not events:
+    return
+  seq = next_seq(conn) if seq is None else seq
+  conn.execute(
+    insert(EventTombstone),
+    [{"event_id": id_, "external_id": ext, "change_seq": seq} for id_, ext in events],
+  )
+
+
+def backfill(conn) -> int:
+  """Stamps every event that has no sequence yet; returns how many."""
+  seq = next_seq(conn)
+  return conn.execute(
+    update(Event)
+      .where(Event.change_seq.is_(None))
+      .values(change_seq=seq)
+  ).rowcount
+
+
+# ----------------------------
+# Feed
+# ----------------------------
+
+def encode_cursor(seq: int, event_id: int) -> str:
+  raw = f"{seq}|{event_id}".encode("ascii")
+  return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str):
+  """Returns (seq, id) or None if the cursor is malformed."""
+  try:
+    raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("ascii")
+    seq, event_id = raw.split("|", 1)
+    return int(seq), int(event_id)
+  except Exception:
+    return None
+
+
+def read(after, limit: int):
+  """
+  Up to limit changes after the (seq, id) cursor, oldest first, and whether
+  there are more. Each row has seq, id, op ("upsert" | "delete"),
+  external_id and at (updated_at / deleted_at).
+  """
+  events = (
+    select(
+      Event.change_seq.label("seq"), Event.id.label("id"), literal("upsert").label("op"),
+      Event.external_id.label("external_id"), Event.updated_at.label("at"),
+    )
+    .where(tuple_(Event.change_seq, Event.id) > tuple_(*after))
+    .order_by(Event.change_seq, Event.id)
+    .limit(limit + 1)
+  )
+  tombstones = (
+    select(
+      EventTombstone.change_seq, EventTombstone.event_id, literal("delete"),
+      EventTombstone.external_id, EventTombstone.deleted_at,
+    )
+    .where(tuple_(EventTombstone.change_seq, EventTombstone.event_id) > tuple_(*after))
+    .order_by(EventTombstone.change_seq, EventTombstone.event_id)
+    .limit(limit + 1)
+  )
+  # each side seeks its own index; only the merged head is sorted
+  merged = union_all(events.subquery().select(), tombstones.subquery().select()).subquery()
+  rows = db.session.execute(
+    select(merged).order_by(merged.c.seq, merged.c.id).limit(limit + 1)
+  ).all()
+  return rows[:limit], len(rows) > limit
+
+
+# ----------------------------
+# Keep sequences in sync with the ORM
+# ----------------------------
+
+@event.listens_for(Session, "after_flush")
+def _stamp_changes(session, flush_context):
+  changed = [o for o in (*session.new, *session.dirty, *session.deleted) if is_catalog_row(o)]
+  if not changed:
+    return
+
+  deleted = {o.id: o.external_id for o in session.deleted if isinstance(o, Event) and o.id is not None}
+  ids = affected_event_ids(session, changed) - set(deleted)
+  if not ids and not deleted:
+    return
+
+  conn = session.connection()
+  seq = next_seq(conn)
+  stamp(conn, ids, seq)
+  tombstone(conn, list(deleted.items()), seq)
@@ -0,0 +1,164 @@
+# database.py
+"""
+Engine settings and read routing.
+
+SQLite connections get their pragmas on connect:
+  journal_mode=WAL          readers no longer block on a writer (and vice versa)
+  synchronous=NORMAL        safe with WAL; fsync per checkpoint, not per commit
+  mmap_size, cache_size     fewer read syscalls / page cache misses
+  busy_timeout              wait for a lock instead of "database is locked"
+Server databases (Postgres) get pool size / overflow / timeout, pre-ping and
+recycle settings instead.
+
+DATABASE_REPLICA_URL adds a "replica" bind. Views decorated with
+@read_replica run their queries there; flushes always go to the primary.
+For SQLite, a read-only connection to the same file works as a replica:
+  sqlite:///file:/srv/app/instance/app.db?mode=ro&uri=true
+
+A replica may lag behind the primary, while the caches are keyed on the
+catalogue version and kept until it changes. So nothing read from the
+replica is cached: cached_response and the event documents skip storing
+when replica_used(), and the explorer snapshot and suggestion index load
+inside primary().
+"""
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import g, has_app_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+REPLICA = "replica"
+
+SQLITE_DEFAULTS = {
+  "SQLITE_JOURNAL_MODE": "WAL",
+  "SQLITE_SYNCHRONOUS": "NORMAL",
+  "SQLITE_MMAP_SIZE": 256 * 1024 * 1024,
+  "SQLITE_CACHE_SIZE": -64 * 1024,  # negative = KiB, i.e. 64 MiB
+  "SQLITE_BUSY_TIMEOUT_MS": 5000,
+}
+
+POOL_DEFAULTS = {
+  "DB_POOL_SIZE": 5,
+  "DB_MAX_OVERFLOW": 10,
+  "DB_POOL_TIMEOUT": 30,
+  "DB_POOL_RECYCLE": 1800,
+  "DB_POOL_PRE_PING": True,
+}
+
+
+def _is_sqlite(url) -> bool:
+  return make_url(url).get_backend_name() == "sqlite"
+
+
+def engine_options(url, config) -> dict:
+  """create_engine() options for url (pool settings for server databases)."""
+  if _is_sqlite(url):
+    return {}
+  return {
+    "pool_size": int(config["DB_POOL_SIZE"]),
+    "max_overflow": int(config["DB_MAX_OVERFLOW"]),
+    "pool_timeout": int(config["DB_POOL_TIMEOUT"]),
+    "pool_recycle": int(config["DB_POOL_RECYCLE"]),
+    "pool_pre_ping": bool(config["DB_POOL_PRE_PING"]),
+  }
+
+
+def _sqlite_pragmas(config, read_only: bool):
+  pragmas = [
+    f"PRAGMA busy_timeout = {int(config['SQLITE_BUSY_TIMEOUT_MS'])}",
+    f"PRAGMA synchronous = {config['SQLITE_SYNCHRONOUS']}",
+    f"PRAGMA mmap_size = {int(config['SQLITE_MMAP_SIZE'])}",
+    f"PRAGMA cache_size = {int(config['SQLITE_CACHE_SIZE'])}",
+  ]
+  # the journal mode is stored in the file; a read-only connection can't set it
+  if config["SQLITE_JOURNAL_MODE"] and not read_only:
+    pragmas.insert(0, f"PRAGMA journal_mode = {config['SQLITE_JOURNAL_MODE']}")
+
+  def on_connect(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+      for pragma in pragmas:
+        cursor.execute(pragma)
+    finally:
+      cursor.close()
+
+  return on_connect
+
+
+class DatabaseSettings:
+  """
+  configure(app) before db.init_app(app) sets the engine options and the
+  replica bind; init_app(app) after it attaches the SQLite pragmas.
+  """
+
+  def configure(self, app) -> None:
+    for key, value in {**SQLITE_DEFAULTS, **POOL_DEFAULTS}.items():
+      app.config.setdefault(key, value)
+    app.config.setdefault("DATABASE_REPLICA_URL", None)
+
+    options = dict(app.config.get("SQLALCHEMY_ENGINE_OPTIONS") or {})
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+      **engine_options(app.config["SQLALCHEMY_DATABASE_URI"], app.config), **options,
+    }
+
+    replica = app.config["DATABASE_REPLICA_URL"]
+    if replica:
+      binds = dict(app.config.get("SQLALCHEMY_BINDS") or {})
+      binds[REPLICA] = {"url": replica, **engine_options(replica, app.config)}
+      app.config["SQLALCHEMY_BINDS"] = binds
+
+  def init_app(self, app) -> None:
+    from extensions import db
+
+    with app.app_context():
+      for engine in db.engines.values():
+        if engine.dialect.name == "sqlite":
+          read_only = engine.url.query.get("mode") == "ro"
+          event.listen(engine, "connect", _sqlite_pragmas(app.config, read_only))
+
+
+# ----------------------------
+# Read routing
+# ----------------------------
+
+class RoutingSession(Session):
+  """db.session that sends a @read_replica view's reads to the replica bind."""
+
+  def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+    if bind is None and not self._flushing and has_app_context() and g.get("_read_replica"):
+      engine = self._db.engines.get(REPLICA)
+      if engine is not None:
+        g._replica_used = True
+        return engine
+    return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def read_replica(view):
+  """Run the view's queries on the replica, when one is configured."""
+  @wraps(view)
+  def wrapper(*args, **kwargs):
+    g._read_replica = True
+    try:
+      return view(*args, **kwargs)
+    finally:
+      g._read_replica = False
+
+  return wrapper
+
+
+def replica_used() -> bool:
+  """True once this request (app context) has read from the replica."""
+  return has_app_context() and g.get("_replica_used", False)
+
+
+@contextmanager
+def primary():
+  """Reads inside go to the primary, even within a @read_replica view."""
+  routed = g.get("_read_replica", False)
+  g._read_replica = False
+  try:
+    yield
+  finally:
+    g._read_replica = routed
@@ -0,0 +1,200 @@
+# documents.py
+"""
+Pre-encoded public JSON documents for events.
+
+Each event's ``to_dict()`` is encoded once and kept under ``eventdoc:<id>``
+in a store of the response cache's kind with its own bound
+(EVENT_DOC_MAX_ENTRIES), so documents and cached responses don't evict each
+other. The document is dropped when the event, its images, or one of its
+categories/tags changes (see cache.catalog_changed), so list and detail
+responses can splice stored bytes instead of serializing on every request. Documents also expire after EVENT_DOC_TTL seconds: with the
+per-process memory backend, changes committed by another process never drop
+them here (use the sqlite backend with several workers).
+
+Clients may ask for less (sparse fieldsets, see parse_fieldset): those
+documents load only the requested columns and relationships and bypass the
+stored documents. Responses are JSON, encoded with orjson when it is
+installed, or MessagePack when the client prefers application/msgpack
+(requires the msgpack package).
+"""
+import json
+
+from flask import Response, current_app, request
+from sqlalchemy.orm import load_only, noload, selectinload
+
+from cache import catalog_changed, get_document_backend
+from database import replica_used
+from instrumentation import timed
+from models import Event
+
+try:
+  import orjson
+except ImportError:  # pragma: no cover - optional dependency
+  orjson = None
+
+try:
+  import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+  msgpack = None
+
+DOC_KEY = "eventdoc:{}"
+
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack")
+
+# columns behind each public field (end_at falls back to start_at)
+_FIELD_COLUMNS = {
+  **{name: (getattr(Event, name),) for name in Event.FIELDS},
+  "end_at": (Event.end_at, Event.start_at),
+}
+_INCLUDE_RELATIONS = {
+  "categories": Event.categories,
+  "tags": Event.tags,
+  "cover_image": Event.images,
+  "gallery": Event.images,
+}
+
+
+# ----------------------------
+# Encoding
+# ----------------------------
+
+def dumps(obj) -> bytes:
+  """Compact JSON with sorted keys, like app.json; orjson when available."""
+  if orjson is not None:
+    return orjson.dumps(obj, default=current_app.json.default, option=orjson.OPT_SORT_KEYS)
+  return current_app.json.dumps(obj).encode("utf-8")
+
+
+def loads(data: bytes):
+  return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def wants_msgpack() -> bool:
+  if msgpack is None:
+    return False
+  best = request.accept_mimetypes.best_match(("application/json", *MSGPACK_TYPES), default="application/json")
+  return best in MSGPACK_TYPES
+
+
+def load_events(ids):
+  """Hydrates events by id, one batched query per relationship, keeping id order."""
+  if not ids:
+    return []
+  events = (
+    Event.query
+      .options(selectinload(Event.categories), selectinload(Event.tags), selectinload(Event.images))
+      .filter(Event.id.in_(ids))
+      .all()
+  )
+  by_id = {e.id: e for e in events}
+  return [by_id[i] for i in ids if i in by_id]
+
+
+def encode_event(e, fields=None, include=None) -> bytes:
+  with timed("serialize"):
+    return dumps(e.to_dict(fields, include))
+
+
+def event_documents(ids):
+  """Encoded documents for ids, in order. Unknown ids are skipped."""
+  backend = get_document_backend()
+  docs = {}
+  missing = []
+
+  for event_id in ids:
+    doc = backend.get(DOC_KEY.format(event_id))
+    if doc is None:
+      missing.append(event_id)
+    else:
+      docs[event_id] = bytes(doc)
+
+  ttl = current_app.config["EVENT_DOC_TTL"]
+  for e in load_events(missing):
+    doc = encode_event(e)
+    if not replica_used():
+      backend.set(DOC_KEY.format(e.id), doc, ttl)
+    docs[e.id] = doc
+
+  return [docs[i] for i in ids if i in docs]
+
+
+# ----------------------------
+# Sparse fieldsets
+# ----------------------------
+
+def parse_fieldset(args):
+  """
+  (fields, include) from ?fields=a,b and ?include=x,y, or None when
+  neither is given (full documents). fields defaults to all scalar fields
+  when only include is given; include defaults to none when only fields
+  is. "id" is always returned. Raises ValueError for unknown names.
+  """
+  if "fields" not in args and "include" not in args:
+    return None
+
+  def names(param, allowed):
+    values = [v.strip() for v in (args.get(param) or "").split(",") if v.strip()]
+    unknown = sorted(set(values) - set(allowed))
+    if unknown:
+      raise ValueError(f"unknown {param}: {', '.join(unknown)} (allowed: {', '.join(allowed)})")
+    return values
+
+  fields = names("fields", Event.FIELDS) if "fields" in args else list(Event.FIELDS)
+  include = names("include", Event.INCLUDES)
+  if "id" not in fields:
+    fields.insert(0, "id")
+  return tuple(dict.fromkeys(fields)), tuple(dict.fromkeys(include))
+
+
+def sparse_documents(ids, fields, include):
+  """Encoded documents with only fields / include, loaded with just those columns."""
+  if not ids:
+    return []
+  columns = {col for name in fields for col in _FIELD_COLUMNS[name]}
+  relations = {_INCLUDE_RELATIONS[name] for name in include}
+  options = [load_only(*columns, raiseload=False)]
+  for rel in (Event.categories, Event.tags, Event.images):
+    options.append(selectinload(rel) if rel in relations else noload(rel))
+
+  events = Event.query.options(*options).filter(Event.id.in_(ids)).all()
+  by_id = {e.id: e for e in events}
+  return [encode_event(by_id[i], fields, include) for i in ids if i in by_id]
+
+
+# ----------------------------
+# Responses
+# ----------------------------
+
+def json_response(payload: dict, **documents) -> Response:
+  """
+  JSON response for payload with pre-encoded values spliced in, e.g.
+  json_response({"page": 1}, events=[doc, ...]) or json_response({}, event=doc).
+  """
+  with timed("serialize"):
+    body = dumps(payload)[:-1]
+    for name, value in documents.items():
+      if isinstance(value, list):
+        value = b"[" + b",".join(value) + b"]"
+      if len(body) > 1:
+        body += b","
+      body += dumps(name) + b":" + value
+  return Response(body + b"}", mimetype="application/json")
+
+
+def api_response(payload: dict, **documents) -> Response:
+  """json_response(), or MessagePack when the client's Accept prefers it."""
+  if not wants_msgpack():
+    return json_response(payload, **documents)
+  with timed("serialize"):
+    obj = dict(payload)
+    for name, value in documents.items():
+      obj[name] = [loads(v) for v in value] if isinstance(value, list) else loads(value)
+    body = msgpack.packb(obj, use_bin_type=True)
+  return Response(body, mimetype=MSGPACK_TYPES[0])
+
+
+@catalog_changed.connect
+def _drop_changed_documents(app, event_ids=frozenset(), **extra):
+  backend = app.extensions["event_documents"]
+  for event_id in event_ids:
+    backend.delete(DOC_KEY.format(event_id))
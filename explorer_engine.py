@@ -0,0 +1,294 @@
+# explorer_engine.py
+"""
+Optional in-memory columnar engine for the events explorer.
+
+Keeps a snapshot of every event as NumPy arrays sorted in explorer order
+(start_at, id): start/end timestamps, the free flag, and one boolean bitmap
+per category slug. Category / type / date filters, counts, facets and
+ordering are then answered with vectorized operations, and only the page's
+ids go back to the database for hydration.
+
+Enable with EXPLORER_ENGINE = "columnar" (requires numpy). Requests it can't
+answer (full-text search) fall back to SQL. The snapshot is tied to the
+catalogue version: commits made in this process are patched in by reloading
+just the changed events. With a shared cache backend (sqlite), a version
+bump from another process triggers a full reload. The per-process memory
+backend never sees other processes' commits, so there the snapshot is also
+reloaded once it is EXPLORER_SNAPSHOT_TTL seconds old.
+"""
+import logging
+import threading
+import time
+from datetime import datetime
+
+from flask import current_app
+
+from cache import catalog_changed, catalog_version, version_is_shared
+from database import primary
+
+try:
+  import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+  np = None
+
+log = logging.getLogger(__name__)
+
+_NO_END = np.datetime64("NaT") if np is not None else None
+
+
+def _dt64(value: datetime):
+  return np.datetime64(value, "us")
+
+
+class ColumnarSnapshot:
+  def __init__(self, version, ids, start, end, is_free, categories):
+    self.version = version
+    self.ids = ids                # int64, explorer order
+    self.start = start            # datetime64[us]
+    self.end = end                # datetime64[us], NaT when end_at is NULL
+    self.is_free = is_free        # bool
+    self.categories = categories  # {slug: bool array}
+    # time.monotonic() of the last full load; patches keep it
+    self.loaded_at = time.monotonic()
+
+  def __len__(self):
+    return len(self.ids)
+
+  # ---- building ----
+
+  @classmethod
+  def from_rows(cls, version, rows, category_pairs):
+    """
+    rows: iterable of (id, start_at, end_at, is_free);
+    category_pairs: iterable of (event_id, slug).
+    """
+    rows = list(rows)
+    ids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+    start = np.array([r[1] for r in rows], dtype="datetime64[us]")
+    end = np.array([r[2] if r[2] is not None else _NO_END for r in rows], dtype="datetime64[us]")
+    is_free = np.fromiter((bool(r[3]) for r in rows), dtype=bool, count=len(rows))
+
+    order = np.lexsort((ids, start))
+    ids, start, end, is_free = ids[order], start[order], end[order], is_free[order]
+    position = {int(i): p for p, i in enumerate(ids)}
+
+    return cls(
+      version, ids, start, end, is_free,
+      cls._bitmaps(category_pairs, position, len(ids)),
+    )
+
+  @staticmethod
+  def _bitmaps(pairs, position, n):
+    bitmaps = {}
+    for event_id, slug in pairs:
+      p = position.get(event_id)
+      if p is None:
+        continue
+      bits = bitmaps.get(slug)
+      if bits is None:
+        bits = bitmaps[slug] = np.zeros(n, dtype=bool)
+      bits[p] = True
+    return bitmaps
+
+  def patched(self, version, changed_ids, rows, category_pairs):
+    """
+    New snapshot with changed_ids replaced by rows (missing ids = deleted).
+    The arrays are spliced rather than rebuilt: the changed positions are
+    deleted and the new rows inserted at their (start_at, id) positions.
+    """
+    drop = np.flatnonzero(np.isin(self.ids, np.fromiter(changed_ids, dtype=np.int64)))
+    ids = np.delete(self.ids, drop)
+    start = np.delete(self.start, drop)
+
+    rows = sorted(rows, key=lambda r: (r[1], r[0]))
+    at = []
+    for event_id, start_at, _, _ in rows:
+      s = _dt64(start_at)
+      lo = int(np.searchsorted(start, s, side="left"))
+      hi = int(np.searchsorted(start, s, side="right"))
+      at.append(lo + int(np.searchsorted(ids[lo:hi], event_id)))
+
+    def splice(column, values, dtype):
+      return np.insert(np.delete(column, drop), at, np.array(values, dtype=dtype))
+
+    snap = ColumnarSnapshot(
+      version,
+      splice(self.ids, [r[0] for r in rows], np.int64),
+      splice(self.start, [r[1] for r in rows], "datetime64[us]"),
+      splice(self.end, [r[2] if r[2] is not None else _NO_END for r in rows], "datetime64[us]"),
+      splice(self.is_free, [bool(r[3]) for r in rows], bool),
+      {slug: splice(bits, [False] * len(rows), bool) for slug, bits in self.categories.items()},
+    )
+    # np.insert puts the k-th new row (in sorted order) at at[k] + k
+    position = {r[0]: p + k for k, (r, p) in enumerate(zip(rows, at))}
+    for event_id, slug in category_pairs:
+      p = position.get(event_id)
+      if p is None:
+        continue
+      bits = snap.categories.get(slug)
+      if bits is None:
+        bits = snap.categories[slug] = np.zeros(len(snap.ids), dtype=bool)
+      bits[p] = True
+    snap.loaded_at = self.loaded_at
+    return snap
+
+  # ---- querying ----
+
+  def _any_of(self, bitmaps, slugs):
+    mask = np.zeros(len(self.ids), dtype=bool)
+    for slug in slugs:
+      bits = bitmaps.get(slug)
+      if bits is not None:
+        mask |= bits
+    return mask
+
+  def _window(self, start, end):
+    """Same overlap semantics as views._overlaps / the start/end-only filters."""
+    if start and end:
+      s, e = _dt64(start), _dt64(end)
+      no_end = np.isnat(self.end)
+      return (self.start < e) & np.where(no_end, self.start >= s, self.end >= s)
+    if start:
+      return self.start >= _dt64(start)
+    if end:
+      return self.start < _dt64(end)
+    return None
+
+  def mask(self, filters, skip=()):
+    mask = np.ones(len(self.ids), dtype=bool)
+    if filters["categories"] and "categories" not in skip:
+      mask &= self._any_of(self.categories, filters["categories"])
+    if filters["type"] == "free" and "type" not in skip:
+      mask &= self.is_free
+    elif filters["type"] == "paid" and "type" not in skip:
+      mask &= ~self.is_free
+    if "date" not in skip:
+      window = self._window(filters["start"], filters["end"])
+      if window is not None:
+        mask &= window
+    return mask
+
+  def page(self, filters, offset: int, limit: int):
+    """(total, ids) for an offset page."""
+    positions = np.flatnonzero(self.mask(filters))
+    return len(positions), self.ids[positions[offset:offset + limit]].tolist()
+
+  def seek(self, filters, after, limit: int):
+    """[(id, start_at)] after the (start_at, id) keyset position."""
+    positions = np.flatnonzero(self.mask(filters))
+    if after is not None:
+      start_at, event_id = _dt64(after[0]), after[1]
+      lo = np.searchsorted(self.start, start_at, side="left")
+      hi = np.searchsorted(self.start, start_at, side="right")
+      first = lo + int(np.searchsorted(self.ids[lo:hi], event_id, side="right"))
+      positions = positions[np.searchsorted(positions, first):]
+    positions = positions[:limit]
+    return list(zip(self.ids[positions].tolist(), self.start[positions].astype(object).tolist()))
+
+  def facets(self, filters, date_windows):
+    """Same shape and semantics as views._event_facets."""
+    total = int(self.mask(filters).sum())
+
+    base = self.mask(filters, skip=("categories",))
+    categories = {
+      slug: int((base & bits).sum()) for slug, bits in self.categories.items() if (base & bits).any()
+    }
+
+    base = self.mask(filters, skip=("type",))
+    free = int((base & self.is_free).sum())
+    paid = int(base.sum()) - free
+
+    base = self.mask(filters, skip=("date",))
+    date = {"all": int(base.sum())}
+    for preset, (start, end) in date_windows.items():
+      date[preset] = int((base & self._window(start, end)).sum())
+
+    return total, {
+      "categories": categories,
+      "type": {"all": free + paid, "free": free, "paid": paid},
+      "date": date,
+    }
+
+
+class ExplorerEngine:
+  def __init__(self, app=None):
+    self._snapshot = None
+    self._lock = threading.Lock()
+    self._pending = {}  # catalogue version -> event ids changed by this process
+    if app is not None:
+      self.init_app(app)
+
+  def init_app(self, app) -> None:
+    app.config.setdefault("EXPLORER_ENGINE", "sql")
+    app.config.setdefault("EXPLORER_SNAPSHOT_TTL", 60)
+    enabled = app.config["EXPLORER_ENGINE"] == "columnar"
+    if enabled and np is None:
+      log.warning("EXPLORER_ENGINE=columnar needs numpy; falling back to SQL")
+      enabled = False
+    app.extensions["explorer_engine"] = self if enabled else None
+    if enabled:
+      catalog_changed.connect(self._on_catalog_changed, sender=app, weak=False)
+
+  def _on_catalog_changed(self, app, event_ids=frozenset(), version=None, **extra):
+    if version is not None:
+      with self._lock:
+        if len(self._pending) > 1000:
+          # nobody has queried in a long while; next snapshot() reloads fully
+          self._pending.clear()
+        self._pending[version] = set(event_ids)
+
+  def _expired(self, snap) -> bool:
+    ttl = current_app.config["EXPLORER_SNAPSHOT_TTL"]
+    return bool(ttl) and not version_is_shared() and time.monotonic() - snap.loaded_at >= ttl
+
+  def _fresh(self, snap, version) -> bool:
+    return snap is not None and snap.version == version and not self._expired(snap)
+
+  def snapshot(self):
+    """Current snapshot, refreshed if the catalogue version moved on (or it expired)."""
+    version = catalog_version()
+    snap = self._snapshot
+    if self._fresh(snap, version):
+      return snap
+
+    with self._lock:
+      snap = self._snapshot
+      if self._fresh(snap, version):
+        return snap
+
+      missed = set(range(snap.version + 1, version + 1)) if snap is not None else None
+      if missed and missed <= self._pending.keys() and not self._expired(snap):
+        changed = set().union(*(self._pending[v] for v in missed))
+        snap = snap.patched(version, changed, *_load(changed))
+      else:
+        snap = ColumnarSnapshot.from_rows(version, *_load(None))
+
+      self._pending = {v: ids for v, ids in self._pending.items() if v > version}
+      self._snapshot = snap
+      return snap
+
+
+def _load(event_ids):
+  """Rows and (event_id, slug) pairs for event_ids, or every event if None."""
+  from sqlalchemy import select
+
+  from extensions import db
+  from models import Category, Event, event_categories
+
+  rows = select(Event.id, Event.start_at, Event.end_at, Event.is_free)
+  cats = select(event_categories.c.event_id, Category.slug).join(Category)
+  if event_ids is not None:
+    ids = list(event_ids)
+    rows = rows.where(Event.id.in_(ids))
+    cats = cats.where(event_categories.c.event_id.in_(ids))
+
+  with primary():
+    return (
+      db.session.execute(rows).all(),
+      db.session.execute(cats).all(),
+    )
+
+
+def get_engine():
+  """The engine if enabled for the current app, else None."""
+  return current_app.extensions.get("explorer_engine")
@@ -0,0 +1,416 @@
+# exports.py
+"""
+Printable PDF and iCalendar exports of filtered event lists.
+
+Both take the explorer filters of /api/events. Finished files are kept in
+a disk cache (EXPORT_PATH, default instance/exports) named after the
+normalised filters and the change-feed sequence (changes.py). That counter
+lives in the database, so every worker names a file the same way and a
+restart doesn't orphan the cache. A popular export is built once per
+catalogue change and then sent as a plain file.
+
+  .ics  is streamed row by row from a server-side cursor and written to
+        the cache as it goes out.
+  .pdf  (at most EXPORT_PDF_LIMIT events) is built by a process pool with
+        the small PDF writer below. Until the file exists the endpoint
+        answers 202 with Retry-After, and the client polls the same URL.
+
+Old files are pruned beyond EXPORT_CACHE_FILES.
+"""
+import hashlib
+import json
+import logging
+import os
+import textwrap
+import threading
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from flask import current_app
+
+log = logging.getLogger(__name__)
+
+# date presets are relative to today, so their exports are per day
+_RELATIVE_DATES = {"today", "week", "next30", "next3m", "next6m"}
+
+
+# ----------------------------
+# Cache keys
+# ----------------------------
+
+def export_key(filters) -> str:
+  """
+  Digest of the normalised explorer filters (views._event_filters), the
+  same dict the export query is built from.
+  """
+  normalised = {"categories": filters["categories"], "type": filters["type"], "q": filters["q"]}
+  if filters["date"] in _RELATIVE_DATES:
+    normalised["date"] = filters["date"]
+    normalised["day"] = datetime.utcnow().date().isoformat()
+  else:
+    normalised["start"] = filters["start"].isoformat() if filters["start"] else None
+    normalised["end"] = filters["end"].isoformat() if filters["end"] else None
+  raw = json.dumps(normalised, sort_keys=True)
+  return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:20]
+
+
+_DATE_LABELS = {
+  "today": "Today", "week": "This week", "next30": "Next 30 days",
+  "next3m": "Next 3 months", "next6m": "Next 6 months",
+}
+
+
+def describe_filters(filters) -> str:
+  """One line for the PDF heading, e.g. "festival, music · Free · Next 30 days"."""
+  parts = []
+  if filters["categories"]:
+    parts.append(", ".join(filters["categories"]))
+  if filters["type"] != "all":
+    parts.append(filters["type"].capitalize())
+  if filters["date"] in _DATE_LABELS:
+    parts.append(_DATE_LABELS[filters["date"]])
+  elif filters["start"] or filters["end"]:
+    start, end = (f"{v:%Y-%m-%d}" if v else "…" for v in (filters["start"], filters["end"]))
+    parts.append(f"{start} to {end}")
+  if filters["q"]:
+    parts.append(f"“{filters['q']}”")
+  return "  ·  ".join(parts) or "All events"
+
+
+def _local(value: datetime, tz_name: str) -> datetime:
+  try:
+    tz = ZoneInfo(tz_name or "UTC")
+  except (ZoneInfoNotFoundError, ValueError):
+    tz = timezone.utc
+  return value.replace(tzinfo=timezone.utc).astimezone(tz)
+
+
+def pdf_event(e) -> dict:
+  """The plain (picklable) values the PDF shows for Event e."""
+  start = _local(e.start_at, e.timezone)
+  when = f"{start:%a %d %b %Y, %H:%M}"
+  if e.end_at is not None and e.end_at > e.start_at:
+    end = _local(e.end_at, e.timezone)
+    when += f" – {end:%H:%M}" if end.date() == start.date() else f" – {end:%a %d %b %Y}"
+  return {
+    "title": e.title,
+    "when": when,
+    "location": e.location or "",
+    "price": "Free" if e.is_free else "Paid",
+    "categories": [c.name for c in e.categories],
+    "description": " ".join((e.description or "").split()),
+  }
+
+
+# ----------------------------
+# iCalendar
+# ----------------------------
+
+def _ical_escape(value: str) -> str:
+  return (
+    (value or "")
+    .replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+    .replace("\r\n", "\\n").replace("\n", "\\n")
+  )
+
+
+def _ical_fold(line: str) -> str:
+  """Folds a content line at 75 octets (RFC 5545 3.1)."""
+  data = line.encode("utf-8")
+  if len(data) <= 75:
+    return line + "\r\n"
+  parts, start = [], 0
+  while start < len(data):
+    end = min(start + (75 if not parts else 74), len(data))
+    # never split a UTF-8 sequence
+    while end < len(data) and (data[end] & 0xC0) == 0x80:
+      end -= 1
+    parts.append(data[start:end].decode("utf-8"))
+    start = end
+  return "\r\n ".join(parts) + "\r\n"
+
+
+def _ical_time(value: datetime) -> str:
+  # stored as naive UTC
+  return value.strftime("%Y%m%dT%H%M%SZ")
+
+
+def ical_chunks(rows, host: str):
+  """
+  An iCalendar file as str chunks, one per event. rows yields
+  (id, title, description, location, start_at, end_at, updated_at).
+  """
+  stamp = _ical_time(datetime.utcnow())
+  yield "".join(_ical_fold(line) for line in (
+    "BEGIN:VCALENDAR",
+    "VERSION:2.0",
+    f"PRODID:-//{host}//Events//EN",
+    "CALSCALE:GREGORIAN",
+    "METHOD:PUBLISH",
+  ))
+  for event_id, title, description, location, start_at, end_at, updated_at in rows:
+    lines = [
+      "BEGIN:VEVENT",
+      f"UID:event-{event_id}@{host}",
+      f"DTSTAMP:{stamp}",
+      f"DTSTART:{_ical_time(start_at)}",
+    ]
+    if end_at is not None and end_at > start_at:
+      lines.append(f"DTEND:{_ical_time(end_at)}")
+    if updated_at is not None:
+      lines.append(f"LAST-MODIFIED:{_ical_time(updated_at)}")
+    lines.append(f"SUMMARY:{_ical_escape(title)}")
+    if location:
+      lines.append(f"LOCATION:{_ical_escape(location)}")
+    if description:
+      lines.append(f"DESCRIPTION:{_ical_escape(description)}")
+    lines.append("END:VEVENT")
+    yield "".join(_ical_fold(line) for line in lines)
+  yield _ical_fold("END:VCALENDAR")
+
+
+# ----------------------------
+# PDF (runs in the pool processes)
+# ----------------------------
+
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842  # A4, in points
+MARGIN = 50
+
+# (font resource, size, leading); F1 Helvetica, F2 Helvetica-Bold
+_STYLES = {
+  "title": ("F2", 18, 26),
+  "subtitle": ("F1", 10, 22),
+  "event": ("F2", 12, 16),
+  "meta": ("F1", 9, 13),
+  "body": ("F1", 9, 12),
+  "gap": ("F1", 9, 10),
+}
+
+
+def _pdf_string(text: str) -> bytes:
+  # the standard fonts cover WinAnsi (cp1252); anything else becomes "?"
+  data = text.encode("cp1252", "replace")
+  return b"(" + data.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+
+def _wrap(text: str, size: int):
+  # Helvetica averages about half an em per character
+  width = int((PAGE_WIDTH - 2 * MARGIN) / (size * 0.5))
+  return textwrap.wrap(text, width) or [""]
+
+
+def _layout(title: str, subtitle: str, events):
+  """Pages of (style, x, y, text), top to bottom."""
+  pages = [[]]
+  y = PAGE_HEIGHT - MARGIN
+
+  def put(style, text, indent=0):
+    nonlocal y
+    _, size, leading = _STYLES[style]
+    if y - leading < MARGIN:
+      pages.append([])
+      y = PAGE_HEIGHT - MARGIN
+    y -= leading
+    if text:
+      pages[-1].append((style, MARGIN + indent, y, text))
+
+  put("title", title)
+  for line in _wrap(subtitle, _STYLES["subtitle"][1]):
+    put("subtitle", line)
+  if not events:
+    put("body", "No events match these filters.")
+
+  for e in events:
+    for line in _wrap(e["title"], _STYLES["event"][1]):
+      put("event", line)
+    put("meta", "  ·  ".join(part for part in (e["when"], e["location"], e["price"]) if part))
+    if e["categories"]:
+      put("meta", ", ".join(e["categories"]))
+    for line in _wrap(e["description"], _STYLES["body"][1])[:4]:
+      put("body", line, indent=8)
+    put("gap", "")
+  return pages
+
+
+def _content_stream(lines) -> bytes:
+  ops = []
+  for style, x, y, text in lines:
+    font, size, _ = _STYLES[style]
+    ops.append(b"BT /%s %d Tf %d %d Td %s Tj ET" % (font.encode(), size, x, y, _pdf_string(text)))
+  return zlib.compress(b"\n".join(ops))
+
+
+def pdf_bytes(title: str, subtitle: str, events) -> bytes:
+  """A4 PDF listing events (dicts of title, when, location, price, categories, description)."""
+  pages = _layout(title, subtitle, events)
+
+  objects = [
+    b"<< /Type /Catalog /Pages 2 0 R >>",
+    None,  # page tree, once the page ids are known
+    b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+    b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>",
+  ]
+  page_ids = []
+  for lines in pages:
+    stream = _content_stream(lines)
+    objects.append(b"<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream" % (len(stream), stream))
+    objects.append(
+      b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Contents %d 0 R"
+      b" /Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> >>" % (PAGE_WIDTH, PAGE_HEIGHT, len(objects))
+    )
+    page_ids.append(len(objects))
+  kids = b" ".join(b"%d 0 R" % i for i in page_ids)
+  objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))
+
+  out = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+  offsets = []
+  for number, body in enumerate(objects, start=1):
+    offsets.append(len(out))
+    out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+  xref = len(out)
+  out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+  for offset in offsets:
+    out += b"%010d 00000 n \n" % offset
+  out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+  return bytes(out)
+
+
+def write_pdf(path: str, title: str, subtitle: str, events) -> str:
+  data = pdf_bytes(title, subtitle, events)
+  tmp = f"{path}.{os.getpid()}.tmp"
+  with open(tmp, "wb") as fp:
+    fp.write(data)
+  os.replace(tmp, path)
+  return path
+
+
+# ----------------------------
+# Store
+# ----------------------------
+
+class Exports:
+  def __init__(self, app=None):
+    self._pool = None
+    self._pool_pid = None
+    self._jobs = {}  # path -> Future, for the pool in this process
+    self._failed = set()
+    self._lock = threading.Lock()
+    if app is not None:
+      self.init_app(app)
+
+  def init_app(self, app) -> None:
+    app.config.setdefault("EXPORT_PATH", os.path.join(app.instance_path, "exports"))
+    app.config.setdefault("EXPORT_WORKERS", 2)
+    app.config.setdefault("EXPORT_PDF_LIMIT", 48)
+    app.config.setdefault("EXPORT_CACHE_FILES", 500)
+
+    self.root = app.config["EXPORT_PATH"]
+    self.workers = int(app.config["EXPORT_WORKERS"])
+    self.pdf_limit = int(app.config["EXPORT_PDF_LIMIT"])
+    self.max_files = int(app.config["EXPORT_CACHE_FILES"])
+    app.extensions["exports"] = self
+
+  def _executor(self):
+    # created lazily so it is never inherited across a worker fork
+    if self._pool is None or self._pool_pid != os.getpid():
+      with self._lock:
+        if self._pool is None or self._pool_pid != os.getpid():
+          self._pool = ProcessPoolExecutor(max_workers=max(self.workers, 1))
+          self._pool_pid = os.getpid()
+          self._jobs = {}
+    return self._pool
+
+  def shutdown(self) -> None:
+    with self._lock:
+      if self._pool is not None and self._pool_pid == os.getpid():
+        self._pool.shutdown(wait=True)
+      self._pool = None
+      self._jobs = {}
+
+  def path(self, key: str, ext: str) -> str:
+    from changes import current_seq
+
+    return os.path.join(self.root, f"events-{key}-s{current_seq()}{ext}")
+
+  def cached(self, key: str, ext: str):
+    """Path of the finished export, or None."""
+    path = self.path(key, ext)
+    return path if os.path.isfile(path) else None
+
+  def building(self, key: str) -> bool:
+    job = self._jobs.get(self.path(key, ".pdf"))
+    return job is not None and not job.done()
+
+  def submit_pdf(self, key: str, title: str, subtitle: str, events) -> None:
+    """Queues the PDF for key unless it is already being built here."""
+    path = self.path(key, ".pdf")
+    executor = self._executor()
+    with self._lock:
+      job = self._jobs.get(path)
+      if job is not None and not job.done():
+        return
+      os.makedirs(self.root, exist_ok=True)
+      job = self._jobs[path] = executor.submit(write_pdf, path, title, subtitle, events)
+
+    def done(f):
+      with self._lock:
+        self._jobs.pop(path, None)
+        if f.exception() is not None:
+          self._failed.add(path)
+      if f.exception() is not None:
+        log.error("PDF export %s failed: %s", path, f.exception())
+      else:
+        self.prune()
+
+    job.add_done_callback(done)
+
+  def pop_failure(self, key: str) -> bool:
+    """True once if the last build of the PDF for key failed; the next request retries."""
+    path = self.path(key, ".pdf")
+    with self._lock:
+      if path in self._failed:
+        self._failed.discard(path)
+        return True
+    return False
+
+  def stream_ics(self, key: str, chunks):
+    """Passes chunks through while writing them to the cache."""
+    path = self.path(key, ".ics")
+    os.makedirs(self.root, exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    complete = False
+    try:
+      with open(tmp, "wb") as fp:
+        for chunk in chunks:
+          data = chunk.encode("utf-8")
+          fp.write(data)
+          yield data
+      complete = True
+    finally:
+      # an aborted download leaves no partial file behind
+      if complete:
+        os.replace(tmp, path)
+        self.prune()
+      elif os.path.exists(tmp):
+        os.remove(tmp)
+
+  def prune(self) -> None:
+    """Removes the oldest exports beyond EXPORT_CACHE_FILES."""
+    try:
+      files = [
+        os.path.join(self.root, f) for f in os.listdir(self.root)
+        if f.startswith("events-") and not f.endswith(".tmp")
+      ]
+      if len(files) <= self.max_files:
+        return
+      files.sort(key=os.path.getmtime)
+      for path in files[:len(files) - self.max_files]:
+        os.remove(path)
+    except OSError as exc:
+      log.warning("pruning exports failed: %s", exc)
+
+
+def get_exports() -> Exports:
+  return current_app.extensions["exports"]
@@ -1,15 +1,35 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from flask_wtf.csrf import CSRFProtect
-from flask_bcrypt import Bcrypt
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from flask_migrate import Migrate
 
-db = SQLAlchemy()
+from assets import Assets
+from cache import ResponseCache
+from database import DatabaseSettings, RoutingSession
+from explorer_engine import ExplorerEngine
+from exports import Exports
+from images import ImageStore
+from instrumentation import Instrumentation
+from page_cache import PageCache
+from passwords import PasswordHasher
+import ratelimit_store  # noqa: F401 - registers the sqlite:// limiter storage
+from suggest import Suggestions
+
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 login_manager = LoginManager()
 csrf = CSRFProtect()
-bcrypt = Bcrypt()
 limiter = Limiter(get_remote_address)
 
 migrate = Migrate()
+database = DatabaseSettings()
+response_cache = ResponseCache()
+explorer_engine = ExplorerEngine()
+password_hasher = PasswordHasher()
+instrumentation = Instrumentation()
+assets = Assets()
+page_cache = PageCache()
+image_store = ImageStore()
+suggestions = Suggestions()
+exports = Exports()
@@ -0,0 +1,30 @@
+# gunicorn.conf.py
+"""
+gunicorn -c gunicorn.conf.py wsgi:app
+
+The app is built and warmed once in the master (preload_app), then forked:
+workers share the compiled templates, prerendered pages and in-memory
+indexes copy-on-write instead of each building their own.
+"""
+import gc
+import os
+
+bind = os.environ.get("BIND", "127.0.0.1:8000")
+workers = int(os.environ.get("WEB_CONCURRENCY", 2 * (os.cpu_count() or 1) + 1))
+threads = int(os.environ.get("GUNICORN_THREADS", 1))
+preload_app = os.environ.get("PRELOAD", "1") == "1"
+
+
+def when_ready(server):
+  # runs in the master before the first fork: keep the warmed objects out of
+  # the collector so gc passes in the workers don't touch (and copy) their pages
+  if preload_app:
+    gc.freeze()
+
+
+def post_fork(server, worker):
+  if preload_app:
+    import warmup
+    from wsgi import app
+
+    warmup.after_fork(app)
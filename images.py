@@ -0,0 +1,264 @@
+# images.py
+"""
+Local image store with responsive variants for EventImage.
+
+Originals are ingested once, from an upload or a local / offline copy,
+never hotlinked. They are stored content-addressed under IMAGE_STORE_PATH
+(default instance/media):
+
+  originals/<sha256>.<ext>
+  variants/<sha256>/<width>.webp
+  variants/<sha256>/<width>.jpg
+
+Variants at IMAGE_WIDTHS (never wider than the original) are made by a
+process pool, since resizing is CPU-bound. Each image records its
+dimensions and variants on the EventImage row, and to_dict() exposes them
+as srcset strings. /media/<sha256>/<file> serves variants with a one-year
+immutable Cache-Control. A file's name is derived from its content, so a
+URL never changes meaning.
+
+Requires Pillow; without it ingest raises ImagesUnavailable and images
+keep their original url.
+
+  flask images ingest [--source-dir DIR] [--event-id ID] [--force]
+  POST /api/events/<id>/images   (multipart upload, ADMIN_EMAILS accounts)
+"""
+import hashlib
+import io
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from urllib.parse import unquote, urlparse
+
+from flask import Blueprint, abort, current_app, send_from_directory
+
+try:
+  from PIL import Image, ImageOps
+except ImportError:  # pragma: no cover - optional dependency
+  Image = ImageOps = None
+
+FORMATS = {"webp": ("WEBP", ".webp"), "jpeg": ("JPEG", ".jpg")}
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+class ImagesUnavailable(RuntimeError):
+  """Pillow is not installed, or the pool can't take the image right now."""
+
+
+# ----------------------------
+# Worker (runs in the pool processes)
+# ----------------------------
+
+def make_variants(original: str, out_dir: str, widths, formats, quality: int):
+  """
+  Writes <width>.<ext> for each width/format into out_dir; existing files
+  are kept (same content hash => same output).
+  Returns (width, height, [{"width", "format", "file"}]).
+  """
+  with Image.open(original) as img:
+    img = ImageOps.exif_transpose(img)
+    if img.mode not in ("RGB", "RGBA"):
+      img = img.convert("RGBA" if "transparency" in img.info else "RGB")
+    width, height = img.size
+
+    targets = sorted({w for w in widths if w < width} | {min(width, max(widths))})
+    os.makedirs(out_dir, exist_ok=True)
+
+    variants = []
+    for w in targets:
+      h = max(round(height * w / width), 1)
+      resized = img if w == width else img.resize((w, h), Image.LANCZOS)
+      for fmt in formats:
+        pil_format, ext = FORMATS[fmt]
+        name = f"{w}{ext}"
+        path = os.path.join(out_dir, name)
+        if not os.path.exists(path):
+          out = resized.convert("RGB") if pil_format == "JPEG" and resized.mode != "RGB" else resized
+          tmp = f"{path}.{os.getpid()}.tmp"
+          if pil_format == "JPEG":
+            out.save(tmp, pil_format, quality=quality, optimize=True, progressive=True)
+          else:
+            out.save(tmp, pil_format, quality=quality, method=4)
+          os.replace(tmp, path)
+        variants.append({"width": w, "format": fmt, "file": name})
+  return width, height, variants
+
+
+# ----------------------------
+# Store
+# ----------------------------
+
+class ImageStore:
+  def __init__(self, app=None):
+    self._pool = None
+    self._pool_pid = None
+    self._lock = threading.Lock()
+    if app is not None:
+      self.init_app(app)
+
+  def init_app(self, app) -> None:
+    app.config.setdefault("IMAGE_STORE_PATH", os.path.join(app.instance_path, "media"))
+    app.config.setdefault("IMAGE_WIDTHS", (320, 640, 1280))
+    app.config.setdefault("IMAGE_FORMATS", ("webp", "jpeg"))
+    app.config.setdefault("IMAGE_QUALITY", 80)
+    app.config.setdefault("IMAGE_WORKERS", min(os.cpu_count() or 1, 4))
+    app.config.setdefault("IMAGE_MAX_BYTES", 25 * 1024 * 1024)
+    app.config.setdefault("IMAGE_PROCESS_TIMEOUT", 30)
+
+    self.root = app.config["IMAGE_STORE_PATH"]
+    self.widths = tuple(int(w) for w in app.config["IMAGE_WIDTHS"])
+    self.formats = tuple(app.config["IMAGE_FORMATS"])
+    self.quality = int(app.config["IMAGE_QUALITY"])
+    self.workers = int(app.config["IMAGE_WORKERS"])
+    self.max_bytes = int(app.config["IMAGE_MAX_BYTES"])
+    self.timeout = float(app.config["IMAGE_PROCESS_TIMEOUT"])
+    app.extensions["images"] = self
+    app.register_blueprint(bp)
+
+  def _executor(self):
+    # created lazily so it is never inherited across a worker fork
+    if self._pool is None or self._pool_pid != os.getpid():
+      with self._lock:
+        if self._pool is None or self._pool_pid != os.getpid():
+          self._pool = ProcessPoolExecutor(max_workers=max(self.workers, 1))
+          self._pool_pid = os.getpid()
+    return self._pool
+
+  def shutdown(self) -> None:
+    with self._lock:
+      if self._pool is not None and self._pool_pid == os.getpid():
+        self._pool.shutdown(wait=True)
+      self._pool = None
+
+  def variant_dir(self, digest: str) -> str:
+    return os.path.join(self.root, "variants", digest)
+
+  def store_original(self, data: bytes) -> tuple:
+    """(sha256, path) of the stored original; validates that it is an image."""
+    if Image is None:
+      raise ImagesUnavailable("Pillow is required for the image pipeline")
+    if len(data) > self.max_bytes:
+      raise ValueError("image too large")
+    try:
+      with Image.open(io.BytesIO(data)) as img:
+        img.verify()
+        ext = "." + (img.format or "bin").lower().replace("jpeg", "jpg")
+    except (OSError, SyntaxError) as exc:
+      raise ValueError(f"not a readable image ({exc})") from exc
+
+    digest = hashlib.sha256(data).hexdigest()
+    path = os.path.join(self.root, "originals", digest + ext)
+    if not os.path.exists(path):
+      os.makedirs(os.path.dirname(path), exist_ok=True)
+      tmp = f"{path}.{os.getpid()}.tmp"
+      with open(tmp, "wb") as fp:
+        fp.write(data)
+      os.replace(tmp, path)
+    return digest, path
+
+  def submit(self, data: bytes):
+    """Stores data and queues its variants; returns (sha256, Future)."""
+    digest, path = self.store_original(data)
+    future = self._executor().submit(
+      make_variants, path, self.variant_dir(digest), self.widths, self.formats, self.quality,
+    )
+    return digest, future
+
+  def process(self, image, data: bytes) -> None:
+    """
+    Ingest uploaded data as the file for EventImage image, waiting for its
+    variants. An image without a url gets its largest variant's.
+
+    Raises ValueError for data that isn't a usable image (including one that
+    passes verify() but fails to decode in the pool) and ImagesUnavailable
+    when the pool is broken or doesn't finish within IMAGE_PROCESS_TIMEOUT.
+    """
+    digest, future = self.submit(data)
+    try:
+      result = future.result(timeout=self.timeout)
+    except FutureTimeoutError as exc:
+      raise ImagesUnavailable("processing timed out") from exc
+    except BrokenProcessPool as exc:
+      with self._lock:
+        self._pool = None  # rebuilt by the next _executor()
+      raise ImagesUnavailable("image pool failed") from exc
+    except Exception as exc:
+      raise ValueError(f"not a usable image ({exc})") from exc
+    apply_variants(image, digest, *result)
+    if not image.url:
+      image.url = largest_variant_url(image)
+
+
+def apply_variants(image, digest, width, height, variants) -> None:
+  image.content_hash = digest
+  image.width = width
+  image.height = height
+  image.variants = variants
+
+
+def largest_variant_url(image) -> str:
+  """/media/ url of the widest variant, JPEG preferred (every browser reads it)."""
+  best = max(image.variants, key=lambda v: (v["width"], v["format"] == "jpeg"))
+  return f"/media/{image.content_hash}/{best['file']}"
+
+
+# ----------------------------
+# Sources
+# ----------------------------
+
+def read_source(url: str, source_dir: str = None):
+  """
+  Bytes for an image url from local disk: a file path or file:// url, or
+  (for remote urls) a file in source_dir named after the url's last path
+  segment, with or without an extension. None if not found.
+  """
+  parsed = urlparse(url)
+  candidates = []
+  if parsed.scheme in ("", "file"):
+    candidates.append(unquote(parsed.path))
+  elif source_dir:
+    stem = os.path.basename(unquote(parsed.path).rstrip("/"))
+    if stem:
+      candidates.append(os.path.join(source_dir, stem))
+      try:
+        candidates += [
+          os.path.join(source_dir, f) for f in sorted(os.listdir(source_dir))
+          if os.path.splitext(f)[0] == stem
+        ]
+      except OSError:
+        pass
+
+  for path in candidates:
+    if os.path.isfile(path):
+      with open(path, "rb") as fp:
+        return fp.read()
+  return None
+
+
+def srcsets(image) -> dict:
+  """{"webp": "/media/<sha>/320.webp 320w, ...", "jpeg": ...} or {}."""
+  if not image.content_hash or not image.variants:
+    return {}
+  out = {}
+  for v in image.variants:
+    url = f"/media/{image.content_hash}/{v['file']}"
+    out.setdefault(v["format"], []).append(f"{url} {v['width']}w")
+  return {fmt: ", ".join(entries) for fmt, entries in out.items()}
+
+
+# ----------------------------
+# Serving
+# ----------------------------
+
+bp = Blueprint("images", __name__)
+
+
+@bp.get("/media/<digest>/<name>")
+def media(digest: str, name: str):
+  if len(digest) != 64 or not all(c in "0123456789abcdef" for c in digest):
+    abort(404)
+  store = current_app.extensions["images"]
+  resp = send_from_directory(store.variant_dir(digest), name, max_age=31536000, conditional=True)
+  resp.headers["Cache-Control"] = IMMUTABLE
+  return resp
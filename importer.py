@@ -0,0 +1,324 @@
+# importer.py
+"""
+Streaming bulk import of events (``flask import-events``).
+
+Records are read one at a time from JSONL or CSV and written in chunks with
+Core executemany inserts/updates; nothing but the current chunk and the
+category/tag slug -> id maps is held in memory. Events are upserted on
+``external_id`` (records without one are always inserted), and each
+event's images, categories and tags are replaced by the record's.
+
+JSONL record:
+  {"external_id": "abc-1", "title": "...", "description": "...",
+   "location": "...", "is_free": false, "price_cents": 2500,
+   "start_at": "2026-04-10T09:00:00", "end_at": null, "timezone": "Asia/Thimphu",
+   "categories": ["Festival", "Art & Culture"], "tags": ["Outdoor"],
+   "images": [{"url": "...", "alt_text": "...", "kind": "cover"}]}
+
+CSV: the same scalar columns; categories, tags and image_urls are
+"|"-separated (the first image is the cover, the rest gallery).
+
+Invalid records (a line that isn't JSON, a missing title, a category that
+isn't a name, ...) are skipped and counted; the first MAX_ERRORS reasons are
+kept in EventImporter.errors with their line or record number.
+"""
+import csv
+import json
+import re
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import bindparam, delete, insert, select, update
+
+import calendar_index
+import changes
+from cache import notify_catalog_changed
+from extensions import db
+from models import Category, Event, EventImage, Tag, event_categories, event_tags
+
+EVENT_FIELDS = (
+  "external_id", "title", "description", "location", "is_free",
+  "price_cents", "start_at", "end_at", "timezone",
+)
+
+_SLUG_RE = re.compile(r"[^a-z0-9]+")
+
+MAX_ERRORS = 20
+
+
+def slugify(name: str) -> str:
+  return _SLUG_RE.sub("-", name.lower()).strip("-")
+
+
+def _parse_dt(value):
+  if not value:
+    return None
+  if isinstance(value, datetime):
+    dt = value
+  else:
+    dt = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+  # stored as naive UTC
+  if dt.tzinfo is not None:
+    dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+  return dt
+
+
+def _parse_bool(value) -> bool:
+  if isinstance(value, bool):
+    return value
+  return str(value).strip().lower() in ("1", "true", "yes", "y", "free")
+
+
+def _split(value):
+  if not value:
+    return []
+  if isinstance(value, list):
+    return value
+  return [v.strip() for v in str(value).split("|") if v.strip()]
+
+
+class InvalidRecord:
+  """Stands in for a record the reader couldn't parse."""
+
+  def __init__(self, line: int, reason: str):
+    self.line = line
+    self.reason = reason
+
+
+def read_jsonl(fp):
+  for number, line in enumerate(fp, start=1):
+    line = line.strip()
+    if not line:
+      continue
+    try:
+      record = json.loads(line)
+    except json.JSONDecodeError as exc:
+      record = InvalidRecord(number, f"invalid JSON ({exc.msg})")
+    yield record
+
+
+def read_csv(fp):
+  for row in csv.DictReader(fp):
+    urls = _split(row.pop("image_urls", ""))
+    row["images"] = [
+      {"url": url, "kind": "cover" if i == 0 else "gallery", "sort_order": i}
+      for i, url in enumerate(urls)
+    ]
+    yield row
+
+
+def _text(record: dict, key: str):
+  value = record.get(key)
+  if value is not None and not isinstance(value, str):
+    raise ValueError(f"{key} must be a string")
+  return value
+
+
+def _names(value, key: str):
+  """Category/tag names from a list or "|"-separated string (items may be {"name": ...})."""
+  names = []
+  for item in _split(value):
+    name = item.get("name") if isinstance(item, dict) else item
+    if not isinstance(name, str):
+      raise ValueError(f"{key} must be names")
+    names.append(name)
+  return names
+
+
+def _normalise(record: dict) -> dict:
+  """Validated record: event column values plus categories/tags/images."""
+  if not isinstance(record, dict):
+    raise ValueError("record must be an object")
+  title = (_text(record, "title") or "").strip()
+  start_at = _parse_dt(record.get("start_at"))
+  if not title or start_at is None:
+    raise ValueError("title and start_at are required")
+
+  price = record.get("price_cents")
+  is_free = record.get("is_free")
+  return {
+    "external_id": (str(record["external_id"]) if record.get("external_id") not in (None, "") else None),
+    "title": title[:160],
+    "description": _text(record, "description") or None,
+    "location": (_text(record, "location") or None),
+    "is_free": _parse_bool(is_free) if is_free not in (None, "") else not price,
+    "price_cents": int(price) if price not in (None, "") else None,
+    "start_at": start_at,
+    "end_at": _parse_dt(record.get("end_at")),
+    "timezone": _text(record, "timezone") or "Asia/Thimphu",
+    "categories": _names(record.get("categories"), "categories"),
+    "tags": _names(record.get("tags"), "tags"),
+    "images": [_image(img, i) for i, img in enumerate(_split(record.get("images")))],
+  }
+
+
+def _image(img, position: int) -> dict:
+  img = img if isinstance(img, dict) else {"url": img}
+  for key in ("url", "alt_text", "kind"):
+    _text(img, key)
+  return {**img, "sort_order": int(img.get("sort_order", position))}
+
+
+class EventImporter:
+  def __init__(self, chunk_size: int = 1000, progress=None):
+    self.chunk_size = chunk_size
+    self.progress = progress
+    # slug -> id and name -> id; names are unique too
+    self.category_ids, self.category_names = {}, {}
+    self.tag_ids, self.tag_names = {}, {}
+    self.inserted = 0
+    self.updated = 0
+    self.skipped = 0
+    self.errors = []  # "line 3: invalid JSON (...)", at most MAX_ERRORS
+    self.changed_ids = set()
+
+  # ---- slug maps ----
+
+  def _load_slug_maps(self, conn):
+    for model, by_slug, by_name in (
+      (Category, self.category_ids, self.category_names),
+      (Tag, self.tag_ids, self.tag_names),
+    ):
+      for id_, slug, name in conn.execute(select(model.id, model.slug, model.name)):
+        by_slug[slug] = by_name[name] = id_
+
+  def _ids_for(self, conn, model, by_slug: dict, by_name: dict, names):
+    """Ids for names (matched on slug, then name), inserting missing rows in one executemany."""
+    wanted = {}
+    for name in names:
+      slug = slugify(name)
+      if slug:
+        wanted.setdefault(slug, name.strip()[:80])
+
+    missing = []
+    for slug, name in wanted.items():
+      if slug in by_slug:
+        continue
+      if name in by_name:
+        # an existing row with this name but another slug
+        by_slug[slug] = by_name[name]
+      else:
+        missing.append({"slug": slug, "name": name})
+    if missing:
+      rows = conn.execute(
+        insert(model).returning(model.id, model.slug, model.name, sort_by_parameter_order=True), missing
+      ).all()
+      for id_, slug, name in rows:
+        by_slug[slug] = by_name[name] = id_
+    return [by_slug[slug] for slug in wanted]
+
+  # ---- chunks ----
+
+  def _write_chunk(self, conn, records):
+    # last record wins for a repeated external_id
+    keyed = {}
+    anonymous = []
+    for r in records:
+      if r["external_id"] is None:
+        anonymous.append(r)
+      else:
+        keyed[r["external_id"]] = r
+
+    existing = {}
+    if keyed:
+      existing = dict(conn.execute(
+        select(Event.external_id, Event.id).where(Event.external_id.in_(list(keyed)))
+      ).all())
+
+    updates = [r for ext, r in keyed.items() if ext in existing]
+    inserts = [r for ext, r in keyed.items() if ext not in existing] + anonymous
+
+    if updates:
+      fields = [f for f in EVENT_FIELDS if f != "external_id"]
+      conn.execute(
+        update(Event)
+          .where(Event.id == bindparam("_id"))
+          .values({f: bindparam(f"_{f}") for f in fields}),
+        [{"_id": existing[r["external_id"]], **{f"_{f}": r[f] for f in fields}} for r in updates],
+      )
+      for r in updates:
+        r["id"] = existing[r["external_id"]]
+
+    if inserts:
+      ids = conn.execute(
+        insert(Event).returning(Event.id, sort_by_parameter_order=True),
+        [{f: r[f] for f in EVENT_FIELDS} for r in inserts],
+      ).scalars().all()
+      for r, id_ in zip(inserts, ids):
+        r["id"] = id_
+
+    chunk = updates + inserts
+    event_ids = [r["id"] for r in chunk]
+
+    # replace relations
+    conn.execute(delete(event_categories).where(event_categories.c.event_id.in_(event_ids)))
+    conn.execute(delete(event_tags).where(event_tags.c.event_id.in_(event_ids)))
+    conn.execute(delete(EventImage).where(EventImage.event_id.in_(event_ids)))
+
+    cat_rows, tag_rows, image_rows = [], [], []
+    for r in chunk:
+      for cid in self._ids_for(conn, Category, self.category_ids, self.category_names, r["categories"]):
+        cat_rows.append({"event_id": r["id"], "category_id": cid})
+      for tid in self._ids_for(conn, Tag, self.tag_ids, self.tag_names, r["tags"]):
+        tag_rows.append({"event_id": r["id"], "tag_id": tid})
+      for i, img in enumerate(r["images"]):
+        if img.get("url"):
+          image_rows.append({
+            "event_id": r["id"],
+            "url": img["url"],
+            "alt_text": (img.get("alt_text") or None),
+            "kind": img.get("kind") or ("cover" if i == 0 else "gallery"),
+            "sort_order": img["sort_order"],
+          })
+
+    if cat_rows:
+      conn.execute(insert(event_categories), cat_rows)
+    if tag_rows:
+      conn.execute(insert(event_tags), tag_rows)
+    if image_rows:
+      conn.execute(insert(EventImage), image_rows)
+
+    calendar_index.rebuild(conn, event_ids)
+    changes.stamp(conn, event_ids)
+
+    self.updated += len(updates)
+    self.inserted += len(inserts)
+    self.changed_ids.update(event_ids)
+
+  def run(self, records) -> None:
+    started = time.monotonic()
+    with db.engine.begin() as conn:
+      self._load_slug_maps(conn)
+
+    chunk = []
+    for number, record in enumerate(records, start=1):
+      if isinstance(record, InvalidRecord):
+        self._skip(f"line {record.line}: {record.reason}")
+        continue
+      try:
+        chunk.append(_normalise(record))
+      except (ValueError, TypeError, KeyError) as exc:
+        self._skip(f"record {number}: {exc}")
+        continue
+      if len(chunk) >= self.chunk_size:
+        self._flush(chunk, started)
+        chunk = []
+    if chunk:
+      self._flush(chunk, started)
+
+    if self.changed_ids:
+      notify_catalog_changed(self.changed_ids)
+
+  def _skip(self, reason: str) -> None:
+    self.skipped += 1
+    if len(self.errors) < MAX_ERRORS:
+      self.errors.append(reason)
+
+  def _flush(self, chunk, started) -> None:
+    # one transaction per chunk
+    with db.engine.begin() as conn:
+      self._write_chunk(conn, chunk)
+    if self.progress:
+      done = self.inserted + self.updated
+      elapsed = time.monotonic() - started
+      self.progress(done, done / elapsed if elapsed else 0.0)
@@ -0,0 +1,366 @@
+# instrumentation.py
+"""
+Opt-in per-request performance instrumentation (INSTRUMENTATION_ENABLED).
+
+For every request it records:
+  - the number of SQL statements and the time spent executing them,
+  - time spent serializing JSON (see timed("serialize") in documents.py),
+  - time spent rendering templates,
+  - total time in the app,
+and sends them as a Server-Timing header, e.g.
+
+  Server-Timing: db;dur=4.1;desc="3 queries", serialize;dur=0.8, render;dur=0, app;dur=6.2
+
+Statements slower than SLOW_QUERY_MS are logged with their parameters and
+EXPLAIN plan. Rolling per-endpoint latency histograms (the last
+METRICS_WINDOW_MINUTES, per process) are served at /_metrics to requests
+carrying "Authorization: Bearer <METRICS_TOKEN>"; without a token configured
+the endpoint does not exist.
+
+A single request can be profiled by sending "X-Profile: <METRICS_TOKEN>":
+a sampling profiler records the request thread's stack every
+PROFILE_INTERVAL_MS and writes folded stacks (flamegraph.pl / speedscope
+input) to instance/profiles/. The file name comes back in X-Profile-File.
+"""
+import bisect
+import hmac
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import contextmanager
+
+from flask import Blueprint, abort, current_app, g, has_app_context, jsonify, request
+from flask import before_render_template, request_started, template_rendered
+from sqlalchemy import event
+
+log = logging.getLogger(__name__)
+
+# histogram bucket upper bounds, in ms
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, float("inf"))
+
+
+class RequestTimings:
+  __slots__ = ("started", "queries", "sql_ms", "serialize_ms", "render_ms", "_render_started")
+
+  def __init__(self):
+    self.started = time.perf_counter()
+    self.queries = 0
+    self.sql_ms = 0.0
+    self.serialize_ms = 0.0
+    self.render_ms = 0.0
+    self._render_started = []
+
+
+def _timings():
+  """The current request's RequestTimings, or None (disabled / no request)."""
+  if not has_app_context():
+    return None
+  return g.get("_timings")
+
+
+@contextmanager
+def timed(kind: str):
+  """Adds the block's duration to the current request's <kind>_ms."""
+  timings = _timings()
+  if timings is None:
+    yield
+    return
+  t0 = time.perf_counter()
+  try:
+    yield
+  finally:
+    attr = f"{kind}_ms"
+    setattr(timings, attr, getattr(timings, attr) + (time.perf_counter() - t0) * 1000.0)
+
+
+# ----------------------------
+# Rolling histograms
+# ----------------------------
+
+class EndpointHistograms:
+  """Per-endpoint latency histograms over a sliding window of minutes."""
+
+  def __init__(self, window_minutes: int = 15):
+    self.window_minutes = window_minutes
+    self._minutes = deque()  # (minute, {endpoint: _Window})
+    self._lock = threading.Lock()
+
+  def _current(self):
+    minute = int(time.time() // 60)
+    if not self._minutes or self._minutes[-1][0] != minute:
+      self._minutes.append((minute, defaultdict(_Window)))
+    while self._minutes and self._minutes[0][0] <= minute - self.window_minutes:
+      self._minutes.popleft()
+    return self._minutes[-1][1]
+
+  def record(self, endpoint: str, timings: RequestTimings, total_ms: float) -> None:
+    with self._lock:
+      self._current()[endpoint].add(timings, total_ms)
+
+  def summary(self) -> dict:
+    with self._lock:
+      self._current()
+      merged = defaultdict(_Window)
+      for _, windows in self._minutes:
+        for endpoint, window in windows.items():
+          merged[endpoint].merge(window)
+    return {endpoint: window.summary() for endpoint, window in sorted(merged.items())}
+
+
+class _Window:
+  __slots__ = ("counts", "n", "total_ms", "sql_ms", "queries", "serialize_ms", "render_ms", "max_ms")
+
+  def __init__(self):
+    self.counts = [0] * len(BUCKETS_MS)
+    self.n = 0
+    self.total_ms = self.sql_ms = self.serialize_ms = self.render_ms = self.max_ms = 0.0
+    self.queries = 0
+
+  def add(self, t: RequestTimings, total_ms: float) -> None:
+    self.counts[bisect.bisect_left(BUCKETS_MS, total_ms)] += 1
+    self.n += 1
+    self.total_ms += total_ms
+    self.max_ms = max(self.max_ms, total_ms)
+    self.sql_ms += t.sql_ms
+    self.queries += t.queries
+    self.serialize_ms += t.serialize_ms
+    self.render_ms += t.render_ms
+
+  def merge(self, other) -> None:
+    self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+    self.n += other.n
+    self.total_ms += other.total_ms
+    self.max_ms = max(self.max_ms, other.max_ms)
+    self.sql_ms += other.sql_ms
+    self.queries += other.queries
+    self.serialize_ms += other.serialize_ms
+    self.render_ms += other.render_ms
+
+  def _quantile(self, q: float) -> float:
+    """Upper bound of the bucket holding the q-quantile."""
+    rank = q * self.n
+    seen = 0
+    for bound, count in zip(BUCKETS_MS, self.counts):
+      seen += count
+      if seen >= rank:
+        return bound if bound != float("inf") else self.max_ms
+    return self.max_ms
+
+  def summary(self) -> dict:
+    n = max(self.n, 1)
+    return {
+      "requests": self.n,
+      "buckets_ms": {("inf" if b == float("inf") else str(b)): c for b, c in zip(BUCKETS_MS, self.counts)},
+      "p50_ms": self._quantile(0.50),
+      "p95_ms": self._quantile(0.95),
+      "p99_ms": self._quantile(0.99),
+      "max_ms": round(self.max_ms, 3),
+      "mean_ms": round(self.total_ms / n, 3),
+      "mean_sql_ms": round(self.sql_ms / n, 3),
+      "mean_queries": round(self.queries / n, 2),
+      "mean_serialize_ms": round(self.serialize_ms / n, 3),
+      "mean_render_ms": round(self.render_ms / n, 3),
+    }
+
+
+# ----------------------------
+# Sampling profiler
+# ----------------------------
+
+class SamplingProfiler:
+  """Samples one thread's stack from a background thread."""
+
+  def __init__(self, thread_id: int, interval: float = 0.001):
+    self.thread_id = thread_id
+    self.interval = interval
+    self.stacks = Counter()
+    self._stop = threading.Event()
+    self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+  def start(self) -> None:
+    self._thread.start()
+
+  def stop(self) -> Counter:
+    self._stop.set()
+    self._thread.join()
+    return self.stacks
+
+  def _run(self) -> None:
+    while not self._stop.wait(self.interval):
+      frame = sys._current_frames().get(self.thread_id)
+      if frame is None:
+        continue
+      stack = []
+      while frame is not None:
+        code = frame.f_code
+        stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+      self.stacks[";".join(reversed(stack))] += 1
+
+  def write_folded(self, path: str) -> None:
+    with open(path, "w", encoding="utf-8") as fp:
+      for stack, count in self.stacks.most_common():
+        fp.write(f"{stack} {count}\n")
+
+
+# ----------------------------
+# Extension
+# ----------------------------
+
+metrics_bp = Blueprint("instrumentation", __name__)
+
+
+def _check_token(supplied: str) -> bool:
+  token = current_app.config.get("METRICS_TOKEN")
+  return bool(token) and hmac.compare_digest(supplied.encode("utf-8"), token.encode("utf-8"))
+
+
+@metrics_bp.get("/_metrics")
+def metrics():
+  if not current_app.config.get("METRICS_TOKEN"):
+    abort(404)
+  auth = request.headers.get("Authorization", "")
+  if not auth.startswith("Bearer ") or not _check_token(auth[len("Bearer "):]):
+    abort(403)
+  ext = current_app.extensions["instrumentation"]
+  return jsonify({
+    "pid": os.getpid(),
+    "window_minutes": ext.histograms.window_minutes,
+    "endpoints": ext.histograms.summary(),
+  })
+
+
+class Instrumentation:
+  def __init__(self, app=None):
+    self.histograms = None
+    if app is not None:
+      self.init_app(app)
+
+  def init_app(self, app) -> None:
+    app.config.setdefault("INSTRUMENTATION_ENABLED", False)
+    app.config.setdefault("SLOW_QUERY_MS", 100)
+    app.config.setdefault("METRICS_TOKEN", None)
+    app.config.setdefault("METRICS_WINDOW_MINUTES", 15)
+    app.config.setdefault("PROFILE_INTERVAL_MS", 1)
+
+    if not app.config["INSTRUMENTATION_ENABLED"]:
+      return
+
+    self.histograms = EndpointHistograms(app.config["METRICS_WINDOW_MINUTES"])
+    app.extensions["instrumentation"] = self
+
+    from extensions import db
+    with app.app_context():
+      for engine in db.engines.values():
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(engine, "handle_error", _handle_error)
+
+    request_started.connect(_on_request_started, app, weak=False)
+    before_render_template.connect(_on_before_render, app, weak=False)
+    template_rendered.connect(_on_rendered, app, weak=False)
+    app.after_request(self._after_request)
+    app.register_blueprint(metrics_bp)
+
+  def _after_request(self, response):
+    timings = _timings()
+    if timings is None:
+      return response
+    total_ms = (time.perf_counter() - timings.started) * 1000.0
+
+    # a streamed body (the home page) hasn't rendered yet; its numbers would
+    # be partial, so it gets no header (the histogram has time to headers)
+    if not response.is_streamed:
+      response.headers["Server-Timing"] = ", ".join((
+        f'db;dur={timings.sql_ms:.1f};desc="{timings.queries} queries"',
+        f"serialize;dur={timings.serialize_ms:.1f}",
+        f"render;dur={timings.render_ms:.1f}",
+        f"app;dur={total_ms:.1f}",
+      ))
+    self.histograms.record(request.endpoint or "<unmatched>", timings, total_ms)
+
+    profiler = g.pop("_profiler", None)
+    if profiler is not None:
+      profiler.stop()
+      folder = os.path.join(current_app.instance_path, "profiles")
+      os.makedirs(folder, exist_ok=True)
+      name = f"{request.endpoint or 'unmatched'}-{int(time.time() * 1000)}.folded"
+      profiler.write_folded(os.path.join(folder, name))
+      response.headers["X-Profile-File"] = name
+    return response
+
+
+def _on_request_started(app, **extra):
+  g._timings = RequestTimings()
+  supplied = request.headers.get("X-Profile")
+  if supplied and _check_token(supplied):
+    g._profiler = SamplingProfiler(threading.get_ident(), app.config["PROFILE_INTERVAL_MS"] / 1000.0)
+    g._profiler.start()
+
+
+def _on_before_render(app, template, context, **extra):
+  timings = _timings()
+  if timings is not None:
+    timings._render_started.append(time.perf_counter())
+
+
+def _on_rendered(app, template, context, **extra):
+  timings = _timings()
+  if timings is not None and timings._render_started:
+    timings.render_ms += (time.perf_counter() - timings._render_started.pop()) * 1000.0
+
+
+# ----------------------------
+# SQL timing and slow query log
+# ----------------------------
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+  conn.info.setdefault("_query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+  elapsed_ms = (time.perf_counter() - conn.info["_query_started"].pop()) * 1000.0
+  timings = _timings()
+  if timings is None:
+    return
+  timings.queries += 1
+  timings.sql_ms += elapsed_ms
+
+  if elapsed_ms >= current_app.config["SLOW_QUERY_MS"]:
+    log.warning(
+      "slow query (%.1f ms) on %s\n%s\nparameters: %r\nplan:\n%s",
+      elapsed_ms, request.endpoint, statement, parameters,
+      _explain(conn, statement, parameters, executemany),
+    )
+
+
+def _handle_error(context):
+  # a failed execute never reaches after_cursor_execute; drop its start time
+  if context.connection is not None and context.execution_context is not None:
+    started = context.connection.info.get("_query_started")
+    if started:
+      started.pop()
+
+
+def _explain(conn, statement, parameters, executemany) -> str:
+  if executemany or not statement.lstrip().upper().startswith(("SELECT", "WITH")):
+    return "(not explained)"
+  dialect = conn.dialect.name
+  prefix = {"sqlite": "EXPLAIN QUERY PLAN ", "postgresql": "EXPLAIN "}.get(dialect)
+  if prefix is None:
+    return "(not explained)"
+  # a raw DBAPI cursor, so the EXPLAIN itself is neither counted nor logged
+  cursor = conn.connection.cursor()
+  try:
+    cursor.execute(prefix + statement, parameters)
+    rows = cursor.fetchall()
+  except Exception as exc:  # never fail the request over a diagnostic
+    return f"(explain failed: {exc})"
+  finally:
+    cursor.close()
+  if dialect == "sqlite":
+    return "\n".join(f"  {row[-1]}" for row in rows)
+  return "\n".join(f"  {row[0]}" for row in rows)
@@ -7,5 +7,147 @@ import click
 app = create_app()
 migrate = Migrate(app, db)
 
+
+@app.cli.command("search-index")
+@click.option("--rebuild/--no-rebuild", default=True, help="Re-index all existing events.")
+@with_appcontext
+def search_index(rebuild):
+  """Create (and optionally rebuild) the full-text search index for events."""
+  import search
+
+  search.ensure_index(rebuild=rebuild)
+  click.echo(f"Search index ready ({db.engine.dialect.name}).")
+
+
+@app.cli.command("calendar-index")
+@with_appcontext
+def calendar_index_rebuild():
+  """Rebuild the per-day event buckets (event_days) for every event."""
+  import calendar_index
+
+  with db.engine.begin() as conn:
+    written = calendar_index.rebuild(conn)
+  click.echo(f"Wrote {written} day buckets.")
+
+
+@app.cli.command("change-feed")
+@with_appcontext
+def change_feed_backfill():
+  """Give events that predate the change feed a sequence number."""
+  import changes
+
+  with db.engine.begin() as conn:
+    stamped = changes.backfill(conn)
+  click.echo(f"Stamped {stamped} events.")
+
+
+@app.cli.command("import-events")
+@click.argument("path", type=click.Path(allow_dash=True))
+@click.option("--format", "fmt", type=click.Choice(["jsonl", "csv"]), default=None,
+              help="Input format (default: from the file extension).")
+@click.option("--chunk-size", default=1000, show_default=True, help="Events per transaction.")
+@with_appcontext
+def import_events(path, fmt, chunk_size):
+  """Stream events from a JSONL or CSV file (or - for stdin) into the database."""
+  import time
+  from importer import EventImporter, read_csv, read_jsonl
+
+  fmt = fmt or ("csv" if path.endswith(".csv") else "jsonl")
+  reader = read_csv if fmt == "csv" else read_jsonl
+
+  def progress(done, rate):
+    click.echo(f"  {done:,} events ({rate:,.0f}/s)")
+
+  importer = EventImporter(chunk_size=chunk_size, progress=progress)
+  started = time.monotonic()
+  with click.open_file(path, "r", encoding="utf-8") as fp:
+    importer.run(reader(fp))
+  elapsed = time.monotonic() - started
+
+  click.echo(
+    f"Imported {importer.inserted:,} new and {importer.updated:,} updated events, "
+    f"skipped {importer.skipped:,} invalid records in {elapsed:.1f}s."
+  )
+  for error in importer.errors:
+    click.echo(f"  skipped {error}", err=True)
+
+
+@app.cli.group("assets")
+def assets_cli():
+  """Fingerprinted static assets."""
+
+
+@assets_cli.command("build")
+@click.option("--clean", is_flag=True, help="Delete files from previous builds.")
+@with_appcontext
+def assets_build(clean):
+  """Minify, hash and precompress static assets into static/dist."""
+  import assets
+
+  manifest = assets.build(app, clean=clean)
+  for source, hashed in sorted(manifest.items()):
+    click.echo(f"  {source} -> {assets.DIST_DIR}/{hashed}")
+  if assets.brotli is None:
+    click.echo("brotli is not installed; wrote gzip variants only.")
+
+
+@app.cli.group("images")
+def images_cli():
+  """Local image store and responsive variants."""
+
+
+@images_cli.command("ingest")
+@click.option("--source-dir", type=click.Path(file_okay=False), default=None,
+              help="Offline copies of remote images, named after the url's last path segment.")
+@click.option("--event-id", type=int, default=None, help="Only this event's images.")
+@click.option("--force", is_flag=True, help="Re-ingest images that already have variants.")
+@click.option("--batch-size", default=64, show_default=True, help="Images per commit.")
+@with_appcontext
+def images_ingest(source_dir, event_id, force, batch_size):
+  """Store event images locally and generate their resized variants."""
+  from images import ImagesUnavailable, apply_variants, read_source
+  from extensions import image_store
+  from models import EventImage
+
+  query = EventImage.query.order_by(EventImage.id)
+  if event_id is not None:
+    query = query.filter(EventImage.event_id == event_id)
+  if not force:
+    query = query.filter(EventImage.content_hash.is_(None))
+  ids = [row.id for row in query.with_entities(EventImage.id)]
+
+  done = missing = failed = 0
+  try:
+    for i in range(0, len(ids), batch_size):
+      rows = EventImage.query.filter(EventImage.id.in_(ids[i:i + batch_size])).all()
+      jobs = []
+      for row in rows:
+        data = read_source(row.url, source_dir)
+        if data is None:
+          missing += 1
+          continue
+        try:
+          jobs.append((row, *image_store.submit(data)))
+        except ValueError as exc:  # not an image / too large
+          click.echo(f"  image {row.id}: {exc}")
+          failed += 1
+
+      for row, digest, future in jobs:
+        try:
+          apply_variants(row, digest, *future.result())
+          done += 1
+        except Exception as exc:
+          click.echo(f"  image {row.id}: {exc}")
+          failed += 1
+      db.session.commit()
+      click.echo(f"  {min(i + batch_size, len(ids)):,}/{len(ids):,}")
+  except ImagesUnavailable as exc:
+    raise click.ClickException(str(exc))
+  finally:
+    image_store.shutdown()
+
+  click.echo(f"Ingested {done:,} images; {missing:,} without a local source, {failed:,} failed.")
+
+
 if __name__ == "__main__":
-  app.run()
\ No newline at end of file
+  app.run()
@@ -0,0 +1,54 @@
+"""event change feed
+
+Revision ID: 02cf0ab0ffa0
+Revises: f52f9c5ce8f0
+Create Date: 2026-10-18 17:01:44.317562
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '02cf0ab0ffa0'
+down_revision = 'f52f9c5ce8f0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    change_counters = op.create_table(
+        'change_counters',
+        sa.Column('name', sa.String(length=32), nullable=False),
+        sa.Column('value', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('name')
+    )
+    op.create_table(
+        'event_tombstones',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('event_id', sa.Integer(), nullable=False),
+        sa.Column('external_id', sa.String(length=64), nullable=True),
+        sa.Column('change_seq', sa.BigInteger(), nullable=False),
+        sa.Column('deleted_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_event_tombstones_event_id'), 'event_tombstones', ['event_id'], unique=False)
+    op.create_index('ix_event_tombstones_change_seq_event_id', 'event_tombstones', ['change_seq', 'event_id'], unique=False)
+
+    op.add_column('events', sa.Column('change_seq', sa.BigInteger(), nullable=True))
+    op.create_index('ix_events_change_seq_id', 'events', ['change_seq', 'id'], unique=False)
+    op.create_index(op.f('ix_events_updated_at'), 'events', ['updated_at'], unique=False)
+
+    # existing events all enter the feed at sequence 1
+    op.bulk_insert(change_counters, [{'name': 'events', 'value': 1}])
+    op.execute("UPDATE events SET change_seq = 1")
+
+
+def downgrade():
+    op.drop_index(op.f('ix_events_updated_at'), table_name='events')
+    op.drop_index('ix_events_change_seq_id', table_name='events')
+    op.drop_column('events', 'change_seq')
+    op.drop_index('ix_event_tombstones_change_seq_event_id', table_name='event_tombstones')
+    op.drop_index(op.f('ix_event_tombstones_event_id'), table_name='event_tombstones')
+    op.drop_table('event_tombstones')
+    op.drop_table('change_counters')
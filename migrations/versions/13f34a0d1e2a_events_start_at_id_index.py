@@ -0,0 +1,24 @@
+"""events (start_at, id) index for keyset pagination
+
+Revision ID: 13f34a0d1e2a
+Revises: 7c859115ea76
+Create Date: 2026-10-18 16:33:20.641077
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '13f34a0d1e2a'
+down_revision = '7c859115ea76'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_events_start_at_id', 'events', ['start_at', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_events_start_at_id', table_name='events')
@@ -0,0 +1,26 @@
+"""event external_id for imports
+
+Revision ID: 1b2ed830e60d
+Revises: e7e28f136921
+Create Date: 2026-10-18 16:40:13.871920
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1b2ed830e60d'
+down_revision = 'e7e28f136921'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('events', sa.Column('external_id', sa.String(length=64), nullable=True))
+    op.create_index(op.f('ix_events_external_id'), 'events', ['external_id'], unique=True)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_events_external_id'), table_name='events')
+    op.drop_column('events', 'external_id')
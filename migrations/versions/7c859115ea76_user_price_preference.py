@@ -0,0 +1,24 @@
+"""user price preference
+
+Revision ID: 7c859115ea76
+Revises: 1b2ed830e60d
+Create Date: 2026-10-18 16:42:35.208114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c859115ea76'
+down_revision = '1b2ed830e60d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('user', sa.Column('price_preference', sa.String(length=8), nullable=True))
+
+
+def downgrade():
+    op.drop_column('user', 'price_preference')
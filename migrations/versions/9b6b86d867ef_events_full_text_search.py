@@ -0,0 +1,87 @@
+"""events full-text search index
+
+Revision ID: 9b6b86d867ef
+Revises: 
+Create Date: 2026-10-18 16:31:02.114532
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b6b86d867ef'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+SQLITE_UPGRADE = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS events_fts USING fts5(
+      title, location, description,
+      content='events', content_rowid='id',
+      tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS events_fts_ai AFTER INSERT ON events BEGIN
+      INSERT INTO events_fts(rowid, title, location, description)
+      VALUES (new.id, new.title, coalesce(new.location, ''), coalesce(new.description, ''));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS events_fts_ad AFTER DELETE ON events BEGIN
+      INSERT INTO events_fts(events_fts, rowid, title, location, description)
+      VALUES ('delete', old.id, old.title, coalesce(old.location, ''), coalesce(old.description, ''));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS events_fts_au AFTER UPDATE OF title, location, description ON events BEGIN
+      INSERT INTO events_fts(events_fts, rowid, title, location, description)
+      VALUES ('delete', old.id, old.title, coalesce(old.location, ''), coalesce(old.description, ''));
+      INSERT INTO events_fts(rowid, title, location, description)
+      VALUES (new.id, new.title, coalesce(new.location, ''), coalesce(new.description, ''));
+    END
+    """,
+    # index the rows that already exist
+    "INSERT INTO events_fts(events_fts) VALUES ('rebuild')",
+]
+
+SQLITE_DOWNGRADE = [
+    "DROP TRIGGER IF EXISTS events_fts_au",
+    "DROP TRIGGER IF EXISTS events_fts_ad",
+    "DROP TRIGGER IF EXISTS events_fts_ai",
+    "DROP TABLE IF EXISTS events_fts",
+]
+
+POSTGRES_UPGRADE = [
+    """
+    ALTER TABLE events ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+      setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+      setweight(to_tsvector('simple', coalesce(location, '')), 'B') ||
+      setweight(to_tsvector('simple', coalesce(description, '')), 'C')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_events_search_vector ON events USING gin (search_vector)",
+]
+
+POSTGRES_DOWNGRADE = [
+    "DROP INDEX IF EXISTS ix_events_search_vector",
+    "ALTER TABLE events DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def _run(sqlite, postgres):
+    dialect = op.get_bind().dialect.name
+    for stmt in {"sqlite": sqlite, "postgresql": postgres}.get(dialect, []):
+        op.execute(stmt)
+
+
+def upgrade():
+    _run(SQLITE_UPGRADE, POSTGRES_UPGRADE)
+
+
+def downgrade():
+    _run(SQLITE_DOWNGRADE, POSTGRES_DOWNGRADE)
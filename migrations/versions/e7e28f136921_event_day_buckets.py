@@ -0,0 +1,67 @@
+"""event day buckets
+
+Revision ID: e7e28f136921
+Revises: 9b6b86d867ef
+Create Date: 2026-10-18 16:36:47.502861
+
+"""
+from datetime import timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7e28f136921'
+down_revision = '9b6b86d867ef'
+branch_labels = None
+depends_on = None
+
+
+# calendar_index.MAX_SPAN_DAYS at the time of this revision
+MAX_SPAN_DAYS = 400
+
+
+def _zone(name):
+    try:
+        return ZoneInfo(name or "UTC")
+    except (ZoneInfoNotFoundError, ValueError):
+        return timezone.utc
+
+
+def upgrade():
+    event_days = op.create_table(
+        'event_days',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('event_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['event_id'], ['events.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('day', 'event_id')
+    )
+    op.create_index(op.f('ix_event_days_event_id'), 'event_days', ['event_id'], unique=False)
+
+    # one row per local day each existing event touches
+    events = sa.table(
+        'events',
+        sa.column('id', sa.Integer),
+        sa.column('start_at', sa.DateTime),
+        sa.column('end_at', sa.DateTime),
+        sa.column('timezone', sa.String),
+    )
+    rows = []
+    for event_id, start_at, end_at, tz_name in op.get_bind().execute(sa.select(events)):
+        tz = _zone(tz_name)
+        first = start_at.replace(tzinfo=timezone.utc).astimezone(tz).date()
+        last = (end_at or start_at).replace(tzinfo=timezone.utc).astimezone(tz).date()
+        span = min(max((last - first).days, 0), MAX_SPAN_DAYS)
+        rows.extend({"day": first + timedelta(days=i), "event_id": event_id} for i in range(span + 1))
+        if len(rows) >= 5000:
+            op.bulk_insert(event_days, rows)
+            rows = []
+    if rows:
+        op.bulk_insert(event_days, rows)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_event_days_event_id'), table_name='event_days')
+    op.drop_table('event_days')
@@ -0,0 +1,32 @@
+"""event image dimensions and variants
+
+Revision ID: f52f9c5ce8f0
+Revises: 13f34a0d1e2a
+Create Date: 2026-10-18 16:52:08.930417
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f52f9c5ce8f0'
+down_revision = '13f34a0d1e2a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('event_images', sa.Column('content_hash', sa.String(length=64), nullable=True))
+    op.add_column('event_images', sa.Column('width', sa.Integer(), nullable=True))
+    op.add_column('event_images', sa.Column('height', sa.Integer(), nullable=True))
+    op.add_column('event_images', sa.Column('variants', sa.JSON(), nullable=True))
+    op.create_index(op.f('ix_event_images_content_hash'), 'event_images', ['content_hash'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_event_images_content_hash'), table_name='event_images')
+    op.drop_column('event_images', 'variants')
+    op.drop_column('event_images', 'height')
+    op.drop_column('event_images', 'width')
+    op.drop_column('event_images', 'content_hash')
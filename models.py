@@ -1,9 +1,11 @@
 # models.py
 from datetime import datetime
+from flask import current_app
 from flask_login import UserMixin
 from sqlalchemy import func
 
-from extensions import db, bcrypt
+from extensions import db, password_hasher
+from images import srcsets
 
 # ----------------------------
 # Association tables
@@ -21,6 +23,14 @@ event_tags = db.Table(
   db.Column("tag_id", db.Integer, db.ForeignKey("tags.id"), primary_key=True),
 )
 
+# Local calendar days each event touches (in the event's timezone);
+# maintained by calendar_index.py
+event_days = db.Table(
+  "event_days",
+  db.Column("day", db.Date, primary_key=True),
+  db.Column("event_id", db.Integer, db.ForeignKey("events.id", ondelete="CASCADE"), primary_key=True, index=True),
+)
+
 # Optional: store user interest themes
 user_theme_categories = db.Table(
   "user_theme_categories",
@@ -39,14 +49,24 @@ class User(db.Model, UserMixin):
   last_name = db.Column(db.String(80), nullable=True)
   password_hash = db.Column(db.String(255), nullable=False)
 
-  # Optional: saved theme interests (checkboxes)
-  theme_categories = db.relationship("Category", secondary=user_theme_categories, lazy="joined")
+  # Optional: saved theme interests (checkboxes); loaded only when a view uses them
+  theme_categories = db.relationship("Category", secondary=user_theme_categories, lazy="select")
+  # Optional: "free" | "paid" | None (no preference); used by recommendations
+  price_preference = db.Column(db.String(8), nullable=True)
 
+  # both run in the bcrypt process pool and may raise PasswordHasherBusy
   def set_password(self, password: str) -> None:
-    self.password_hash = bcrypt.generate_password_hash(password).decode("utf-8")
+    self.password_hash = password_hasher.hash(password)
 
   def check_password(self, password: str) -> bool:
-    return bcrypt.check_password_hash(self.password_hash, password)
+    return password_hasher.verify(self.password_hash, password)
+
+  def password_needs_rehash(self) -> bool:
+    return password_hasher.needs_rehash(self.password_hash)
+
+  @property
+  def is_admin(self) -> bool:
+    return self.email.lower() in current_app.config.get("ADMIN_EMAILS", ())
 
 
 # ----------------------------
@@ -79,8 +99,17 @@ class Tag(db.Model):
 
 class Event(db.Model):
   __tablename__ = "events"
+  __table_args__ = (
+    # explorer sort order / keyset pagination seek
+    db.Index("ix_events_start_at_id", "start_at", "id"),
+    # change feed seek (changes.py)
+    db.Index("ix_events_change_seq_id", "change_seq", "id"),
+  )
   id = db.Column(db.Integer, primary_key=True)
 
+  # stable id from an import feed (flask import-events upserts on it)
+  external_id = db.Column(db.String(64), nullable=True, unique=True, index=True)
+
   title = db.Column(db.String(160), nullable=False, index=True)
   description = db.Column(db.Text, nullable=True)
   location = db.Column(db.String(160), nullable=True, index=True)
@@ -96,7 +125,11 @@ class Event(db.Model):
   timezone = db.Column(db.String(64), nullable=False, default="Asia/Thimphu")
 
   created_at = db.Column(db.DateTime, nullable=False, server_default=func.now())
-  updated_at = db.Column(db.DateTime, nullable=False, server_default=func.now(), onupdate=func.now())
+  updated_at = db.Column(db.DateTime, nullable=False, server_default=func.now(), onupdate=func.now(), index=True)
+
+  # position in the change feed; bumped with updated_at whenever the event's
+  # document changes (changes.py). None until first stamped.
+  change_seq = db.Column(db.BigInteger, nullable=True)
 
   categories = db.relationship("Category", secondary=event_categories, lazy="joined")
   tags = db.relationship("Tag", secondary=event_tags, lazy="joined")
@@ -109,25 +142,33 @@ class Event(db.Model):
     order_by="EventImage.sort_order.asc()",
   )
 
-  def to_dict(self):
-    cover = next((img for img in self.images if img.kind == "cover"), None)
-    gallery = [img.to_dict() for img in self.images if img.kind in ("gallery", "past")]
-
-    return {
-      "id": self.id,
-      "title": self.title,
-      "description": self.description or "",
-      "location": self.location or "",
-      "is_free": self.is_free,
-      "price_cents": self.price_cents,
-      "start_at": self.start_at.isoformat(),
-      "end_at": (self.end_at or self.start_at).isoformat(),
-      "timezone": self.timezone,
-      "categories": [c.to_dict() for c in self.categories],
-      "tags": [t.to_dict() for t in self.tags],
-      "cover_image": cover.to_dict() if cover else None,
-      "gallery": gallery,
-    }
+  # public document fields; ?fields= / ?include= pick subsets of these
+  FIELDS = ("id", "title", "description", "location", "is_free", "price_cents", "start_at", "end_at", "timezone")
+  INCLUDES = ("categories", "tags", "cover_image", "gallery")
+
+  def to_dict(self, fields=None, include=None):
+    fields = self.FIELDS if fields is None else fields
+    include = self.INCLUDES if include is None else include
+
+    out = {}
+    for name in fields:
+      value = getattr(self, name)
+      if name == "end_at":
+        value = value or self.start_at
+      elif name in ("description", "location"):
+        value = value or ""
+      out[name] = value.isoformat() if isinstance(value, datetime) else value
+
+    if "categories" in include:
+      out["categories"] = [c.to_dict() for c in self.categories]
+    if "tags" in include:
+      out["tags"] = [t.to_dict() for t in self.tags]
+    if "cover_image" in include:
+      cover = next((img for img in self.images if img.kind == "cover"), None)
+      out["cover_image"] = cover.to_dict() if cover else None
+    if "gallery" in include:
+      out["gallery"] = [img.to_dict() for img in self.images if img.kind in ("gallery", "past")]
+    return out
 
 
 class EventImage(db.Model):
@@ -143,6 +184,13 @@ class EventImage(db.Model):
 
   sort_order = db.Column(db.Integer, nullable=False, default=0)
 
+  # set once the image has been ingested into the local store (images.py)
+  content_hash = db.Column(db.String(64), nullable=True, index=True)
+  width = db.Column(db.Integer, nullable=True)
+  height = db.Column(db.Integer, nullable=True)
+  # [{"width": 320, "format": "webp", "file": "320.webp"}, ...]
+  variants = db.Column(db.JSON, nullable=True)
+
   def to_dict(self):
     return {
       "id": self.id,
@@ -150,4 +198,31 @@ class EventImage(db.Model):
       "alt_text": self.alt_text or "",
       "kind": self.kind,
       "sort_order": self.sort_order,
+      "width": self.width,
+      "height": self.height,
+      "srcset": srcsets(self),
     }
+
+
+# ----------------------------
+# Change feed (changes.py)
+# ----------------------------
+
+class ChangeCounter(db.Model):
+  """Named monotonically increasing counters; a row per sequence."""
+  __tablename__ = "change_counters"
+  name = db.Column(db.String(32), primary_key=True)
+  value = db.Column(db.BigInteger, nullable=False, default=0)
+
+
+class EventTombstone(db.Model):
+  """A deleted event, kept so feed clients learn about the delete."""
+  __tablename__ = "event_tombstones"
+  __table_args__ = (
+    db.Index("ix_event_tombstones_change_seq_event_id", "change_seq", "event_id"),
+  )
+  id = db.Column(db.Integer, primary_key=True)
+  event_id = db.Column(db.Integer, nullable=False, index=True)
+  external_id = db.Column(db.String(64), nullable=True)
+  change_seq = db.Column(db.BigInteger, nullable=False)
+  deleted_at = db.Column(db.DateTime, nullable=False, server_default=func.now())
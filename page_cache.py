@@ -0,0 +1,178 @@
+# page_cache.py
+"""
+Rendered-page cache for anonymous visitors.
+
+Pages decorated with @cached_page are rendered once per (endpoint,
+templates version, catalogue version) and kept in the response cache
+backend. The templates version is the newest mtime under templates/ and
+of the static asset manifest. A request counts as anonymous when the
+session has no user id and there is no remember-me cookie. Checking that
+touches neither Jinja nor the database, so a hit costs one backend lookup.
+
+A CSRF token in the rendered page is stored as a placeholder and replaced
+with the visitor's own token on every hit. Such pages are sent without
+validators; every other page gets an ETag and Last-Modified and answers
+conditional GETs with 304.
+
+A streamed page (stream_template) is passed through on a miss and stored
+once its last chunk has been sent; hits are served whole.
+
+Entries live PAGE_CACHE_TTL seconds. With the per-process memory backend
+another worker's commit doesn't move the catalogue version here, and the
+home page carries the category list and the first explorer page, so there
+the TTL is capped at RESPONSE_CACHE_TTL.
+
+PAGE_CACHE_PRERENDER renders every cached page at startup.
+"""
+import hashlib
+import os
+import time
+from functools import wraps
+
+from flask import Response, current_app, g, make_response, request, session, stream_with_context
+from flask_wtf.csrf import generate_csrf
+from werkzeug.http import http_date
+
+from cache import catalog_version, get_backend, version_is_shared
+
+CSRF_PLACEHOLDER = b"__page_cache_csrf_token__"
+
+# views wrapped with cached_page, for prerender()
+_page_views = set()
+
+
+class PageCache:
+  def __init__(self, app=None):
+    if app is not None:
+      self.init_app(app)
+
+  def init_app(self, app) -> None:
+    app.config.setdefault("PAGE_CACHE_ENABLED", True)
+    app.config.setdefault("PAGE_CACHE_TTL", 3600)
+    app.config.setdefault("PAGE_CACHE_PRERENDER", False)
+    app.extensions["page_cache"] = {"templates_version": None}
+
+  def prerender(self, app) -> int:
+    """Renders every cached page into the cache; returns the count."""
+    rendered = 0
+    for rule in app.url_map.iter_rules():
+      view = app.view_functions.get(rule.endpoint)
+      if view not in _page_views or rule.arguments or "GET" not in rule.methods:
+        continue
+      with app.test_request_context(rule.rule):
+        # a streamed page is stored once its body has been read
+        view().get_data()
+      rendered += 1
+    return rendered
+
+
+def templates_version() -> int:
+  """Newest mtime (ns) of any template or the asset manifest."""
+  state = current_app.extensions["page_cache"]
+  if state["templates_version"] is None or current_app.debug or current_app.jinja_env.auto_reload:
+    newest = 0
+    for folder, _, files in os.walk(os.path.join(current_app.root_path, current_app.template_folder)):
+      for f in files:
+        newest = max(newest, os.stat(os.path.join(folder, f)).st_mtime_ns)
+    manifest = os.path.join(current_app.static_folder, "dist", "manifest.json")
+    if os.path.exists(manifest):
+      newest = max(newest, os.stat(manifest).st_mtime_ns)
+    state["templates_version"] = newest
+  return state["templates_version"]
+
+
+def _is_anonymous() -> bool:
+  remember = current_app.config.get("REMEMBER_COOKIE_NAME", "remember_token")
+  return "_user_id" not in session and remember not in request.cookies
+
+
+def _ttl() -> int:
+  ttl = current_app.config["PAGE_CACHE_TTL"]
+  if version_is_shared():
+    return ttl
+  cap = current_app.config["RESPONSE_CACHE_TTL"]
+  return min(ttl, cap) if ttl and cap else ttl or cap
+
+
+def _page_key() -> str:
+  return f"page:{request.endpoint}:{templates_version()}:{catalog_version()}"
+
+
+def _entry(body: bytes) -> bytes:
+  """b"<etag>\\n<unix time>\\n<body>" with the request's CSRF token swapped out."""
+  # generate_csrf() memoises the token on g for the request
+  token = g.get(current_app.config.get("WTF_CSRF_FIELD_NAME", "csrf_token"))
+  if token:
+    body = body.replace(token.encode("ascii"), CSRF_PLACEHOLDER)
+  etag = hashlib.sha1(body).hexdigest()
+  return etag.encode("ascii") + b"\n" + str(int(time.time())).encode("ascii") + b"\n" + body
+
+
+def _render(view, args, kwargs, store):
+  """
+  Renders the page and passes its cache entry to store(). A streamed page
+  is sent as it renders and stored once the last chunk has gone out.
+  Returns the response to send as is (streamed or not cacheable), or None.
+  """
+  resp = make_response(view(*args, **kwargs))
+  if resp.status_code != 200 or resp.mimetype != "text/html":
+    return resp
+
+  if not resp.is_streamed:
+    store(_entry(resp.get_data()))
+    return None
+
+  chunks = resp.response
+
+  def tee():
+    parts = []
+    for chunk in chunks:
+      parts.append(chunk.encode("utf-8") if isinstance(chunk, str) else chunk)
+      yield chunk
+    store(_entry(b"".join(parts)))
+
+  resp.response = stream_with_context(tee())
+  resp.headers["X-Cache"] = "MISS"
+  resp.vary.add("Cookie")
+  return resp
+
+
+def cached_page(view):
+  @wraps(view)
+  def wrapper(*args, **kwargs):
+    if not current_app.config["PAGE_CACHE_ENABLED"] or not _is_anonymous():
+      return view(*args, **kwargs)
+
+    backend = get_backend()
+    key = _page_key()
+    entry = backend.get(key)
+    status = "HIT"
+    if entry is None:
+      rendered = []
+
+      def store(value):
+        backend.set(key, value, _ttl())
+        rendered.append(value)
+
+      resp = _render(view, args, kwargs, store)
+      if not rendered:
+        return resp
+      entry = rendered[0]
+      status = "MISS"
+
+    etag, modified, body = bytes(entry).split(b"\n", 2)
+    if CSRF_PLACEHOLDER in body:
+      resp = Response(body.replace(CSRF_PLACEHOLDER, generate_csrf().encode("ascii")), mimetype="text/html")
+      resp.headers["Cache-Control"] = "private, no-store"
+    else:
+      resp = Response(body, mimetype="text/html")
+      resp.set_etag(etag.decode("ascii"))
+      resp.headers["Last-Modified"] = http_date(int(modified))
+      resp.headers["Cache-Control"] = "no-cache"
+    resp.headers["X-Cache"] = status
+    # logged-in visitors get a different page
+    resp.vary.add("Cookie")
+    return resp.make_conditional(request)
+
+  _page_views.add(wrapper)
+  return wrapper
@@ -0,0 +1,132 @@
+# passwords.py
+"""
+bcrypt hashing off the request threads.
+
+Hashing and verification run in a small process pool, so a login costs the
+request thread a wait on a future, not hundreds of milliseconds of CPU.
+At most BCRYPT_MAX_PENDING operations may be queued or running; beyond that
+PasswordHasherBusy is raised and the view answers 503 instead of piling up
+workers. The same happens when an operation takes longer than
+BCRYPT_TIMEOUT seconds (its slot stays taken until it really finishes) or
+the pool breaks (it is replaced on the next call). BCRYPT_POOL_SIZE = 0
+hashes inline (tests, CLI scripts).
+
+Hashes are compatible with Flask-Bcrypt (same BCRYPT_LOG_ROUNDS,
+BCRYPT_HASH_PREFIX and BCRYPT_HANDLE_LONG_PASSWORDS settings), and
+needs_rehash() reports hashes made with a different cost so they can be
+upgraded on the next successful login.
+"""
+import hashlib
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+import bcrypt as _bcrypt
+
+
+class PasswordHasherBusy(Exception):
+  """Too many hash/verify operations already queued."""
+
+
+# bcrypt ignores (older releases) or rejects (5.x) anything past 72 bytes
+_MAX_BYTES = 72
+
+
+def _hash(password: bytes, rounds: int, prefix: bytes) -> bytes:
+  return _bcrypt.hashpw(password, _bcrypt.gensalt(rounds=rounds, prefix=prefix))
+
+
+def _check(password: bytes, hashed: bytes) -> bool:
+  return _bcrypt.checkpw(password, hashed)
+
+
+class PasswordHasher:
+  def __init__(self, app=None):
+    self._pool = None
+    self._pool_pid = None
+    self._lock = threading.Lock()
+    self._slots = None
+    if app is not None:
+      self.init_app(app)
+
+  def init_app(self, app) -> None:
+    app.config.setdefault("BCRYPT_LOG_ROUNDS", 12)
+    app.config.setdefault("BCRYPT_HASH_PREFIX", "2b")
+    app.config.setdefault("BCRYPT_HANDLE_LONG_PASSWORDS", False)
+    app.config.setdefault("BCRYPT_POOL_SIZE", min(os.cpu_count() or 1, 4))
+    app.config.setdefault("BCRYPT_MAX_PENDING", 4 * max(app.config["BCRYPT_POOL_SIZE"], 1))
+    app.config.setdefault("BCRYPT_TIMEOUT", 10)
+
+    self.rounds = int(app.config["BCRYPT_LOG_ROUNDS"])
+    self.prefix = app.config["BCRYPT_HASH_PREFIX"].encode("ascii")
+    self.handle_long = bool(app.config["BCRYPT_HANDLE_LONG_PASSWORDS"])
+    self.pool_size = int(app.config["BCRYPT_POOL_SIZE"])
+    self.timeout = app.config["BCRYPT_TIMEOUT"]
+    self._slots = threading.BoundedSemaphore(int(app.config["BCRYPT_MAX_PENDING"]))
+    app.extensions["password_hasher"] = self
+
+  def _executor(self):
+    # created lazily so it is never inherited across a worker fork
+    if self._pool is None or self._pool_pid != os.getpid():
+      with self._lock:
+        if self._pool is None or self._pool_pid != os.getpid():
+          self._pool = ProcessPoolExecutor(max_workers=self.pool_size)
+          self._pool_pid = os.getpid()
+    return self._pool
+
+  def _discard(self, pool) -> None:
+    with self._lock:
+      if self._pool is pool:
+        self._pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+  def shutdown(self) -> None:
+    with self._lock:
+      if self._pool is not None and self._pool_pid == os.getpid():
+        self._pool.shutdown(wait=False, cancel_futures=True)
+      self._pool = None
+
+  def _encode(self, password: str) -> bytes:
+    raw = password.encode("utf-8")
+    if self.handle_long:
+      raw = hashlib.sha256(raw).hexdigest().encode("utf-8")
+    return raw[:_MAX_BYTES]
+
+  def _run(self, fn, *args):
+    if self.pool_size <= 0:
+      return fn(*args)
+    if not self._slots.acquire(blocking=False):
+      raise PasswordHasherBusy()
+    pool = self._executor()
+    try:
+      future = pool.submit(fn, *args)
+    except BrokenProcessPool as exc:
+      self._slots.release()
+      self._discard(pool)
+      raise PasswordHasherBusy() from exc
+    # the slot is freed when the job ends, not when this thread stops waiting
+    future.add_done_callback(lambda _: self._slots.release())
+    try:
+      return future.result(timeout=self.timeout)
+    except FutureTimeoutError as exc:
+      raise PasswordHasherBusy() from exc
+    except BrokenProcessPool as exc:
+      self._discard(pool)
+      raise PasswordHasherBusy() from exc
+
+  def hash(self, password: str) -> str:
+    return self._run(_hash, self._encode(password), self.rounds, self.prefix).decode("utf-8")
+
+  def verify(self, hashed: str, password: str) -> bool:
+    if not hashed:
+      return False
+    return self._run(_check, self._encode(password), hashed.encode("utf-8"))
+
+  def needs_rehash(self, hashed: str) -> bool:
+    """True when hashed was made with a different cost than BCRYPT_LOG_ROUNDS."""
+    # "$2b$12$<salt+hash>"
+    try:
+      return int(hashed.split("$")[2]) != self.rounds
+    except (AttributeError, IndexError, ValueError):
+      return True
@@ -0,0 +1,173 @@
+# ratelimit_store.py
+"""
+SQLite storage for flask-limiter, shared by every worker process on a host.
+
+Importing this module registers the ``sqlite`` scheme with the ``limits``
+package:
+
+  RATELIMIT_STORAGE_URI = "sqlite:////srv/app/instance/ratelimit.db"
+
+Counters live in one small WAL-mode table. Each hit is a single upsert, or
+one short IMMEDIATE transaction for the sliding window counter, so a limit
+holds across all processes instead of per process. Expired windows are
+swept by a daemon thread in each process; reads ignore them in the
+meantime.
+"""
+import os
+import sqlite3
+import threading
+import time
+from math import floor
+
+from limits.storage import SlidingWindowCounterSupport, Storage
+from limits.storage.base import TimestampedSlidingWindow
+
+
+class SQLiteStorage(Storage, SlidingWindowCounterSupport, TimestampedSlidingWindow):
+  """Fixed window and sliding window counter strategies."""
+
+  STORAGE_SCHEME = ["sqlite"]
+
+  # seconds between sweeps of expired counters
+  SWEEP_INTERVAL = 60
+
+  def __init__(self, uri: str, wrap_exceptions: bool = False, **options):
+    self.path = uri[len("sqlite:///"):]
+    self._local = threading.local()
+    self._sweeper_pid = None
+    self._lock = threading.Lock()
+    if os.path.dirname(self.path):
+      os.makedirs(os.path.dirname(self.path), exist_ok=True)
+    super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+
+  @property
+  def base_exceptions(self):
+    return sqlite3.Error
+
+  def _conn(self):
+    conn = getattr(self._local, "conn", None)
+    # connections must not cross a fork
+    if conn is None or self._local.pid != os.getpid():
+      conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+      conn.execute("PRAGMA journal_mode=WAL")
+      # losing the last few hits in a power cut is fine for rate limits
+      conn.execute("PRAGMA synchronous=OFF")
+      conn.execute(
+        "CREATE TABLE IF NOT EXISTS ratelimit_counters ("
+        " key TEXT PRIMARY KEY, value INTEGER NOT NULL, expires REAL NOT NULL)"
+      )
+      self._local.conn = conn
+      self._local.pid = os.getpid()
+      self._start_sweeper()
+    return conn
+
+  # ---- background expiry ----
+
+  def _start_sweeper(self) -> None:
+    with self._lock:
+      if self._sweeper_pid == os.getpid():
+        return
+      self._sweeper_pid = os.getpid()
+    threading.Thread(target=self._sweep_forever, name="ratelimit-sweeper", daemon=True).start()
+
+  def _sweep_forever(self) -> None:
+    while True:
+      time.sleep(self.SWEEP_INTERVAL)
+      try:
+        self._conn().execute("DELETE FROM ratelimit_counters WHERE expires <= ?", (time.time(),))
+      except sqlite3.Error:
+        # locked for longer than the busy timeout; try again next round
+        pass
+
+  # ---- fixed window ----
+
+  def _incr(self, conn, key: str, expiry: float, amount: int, now: float) -> int:
+    # a counter whose window has passed starts over
+    return conn.execute(
+      "INSERT INTO ratelimit_counters (key, value, expires) VALUES (?1, ?2, ?3)"
+      " ON CONFLICT(key) DO UPDATE SET"
+      "  value = CASE WHEN expires <= ?4 THEN ?2 ELSE value + ?2 END,"
+      "  expires = CASE WHEN expires <= ?4 THEN ?3 ELSE expires END"
+      " RETURNING value",
+      (key, amount, now + expiry, now),
+    ).fetchone()[0]
+
+  def incr(self, key: str, expiry: float, amount: int = 1) -> int:
+    return self._incr(self._conn(), key, expiry, amount, time.time())
+
+  def decr(self, key: str, amount: int = 1) -> int:
+    row = self._conn().execute(
+      "UPDATE ratelimit_counters SET value = max(value - ?, 0)"
+      " WHERE key = ? AND expires > ? RETURNING value",
+      (amount, key, time.time()),
+    ).fetchone()
+    return row[0] if row else 0
+
+  def _get(self, conn, key: str, now: float):
+    return conn.execute(
+      "SELECT value, expires FROM ratelimit_counters WHERE key = ? AND expires > ?", (key, now)
+    ).fetchone()
+
+  def get(self, key: str) -> int:
+    row = self._get(self._conn(), key, time.time())
+    return row[0] if row else 0
+
+  def get_expiry(self, key: str) -> float:
+    now = time.time()
+    row = self._get(self._conn(), key, now)
+    return row[1] if row else now
+
+  def clear(self, key: str) -> None:
+    self._conn().execute("DELETE FROM ratelimit_counters WHERE key = ?", (key,))
+
+  def reset(self) -> int:
+    return self._conn().execute("DELETE FROM ratelimit_counters").rowcount
+
+  def check(self) -> bool:
+    try:
+      self._conn().execute("SELECT 1").fetchone()
+      return True
+    except sqlite3.Error:
+      return False
+
+  # ---- sliding window counter ----
+
+  def _window(self, conn, key: str, expiry: int, now: float):
+    previous_key, current_key = self.sliding_window_keys(key, expiry, now)
+    previous = self._get(conn, previous_key, now)
+    current = self._get(conn, current_key, now)
+    previous_count = previous[0] if previous else 0
+    current_count = current[0] if current else 0
+    previous_ttl = (1 - (((now - expiry) / expiry) % 1)) * expiry if previous_count else 0.0
+    current_ttl = (1 - ((now / expiry) % 1)) * expiry + expiry
+    return previous_count, previous_ttl, current_count, current_ttl
+
+  def acquire_sliding_window_entry(self, key: str, limit: int, expiry: int, amount: int = 1) -> bool:
+    if amount > limit:
+      return False
+    conn = self._conn()
+    now = time.time()
+    # read and increment under one write lock, so concurrent workers can't both take the last slot
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+      previous_count, previous_ttl, current_count, _ = self._window(conn, key, expiry, now)
+      if floor(previous_count * previous_ttl / expiry + current_count) + amount > limit:
+        conn.execute("COMMIT")
+        return False
+      _, current_key = self.sliding_window_keys(key, expiry, now)
+      # the current window is read as the previous one during the next window
+      self._incr(conn, current_key, 2 * expiry, amount, now)
+      conn.execute("COMMIT")
+      return True
+    except BaseException:
+      conn.execute("ROLLBACK")
+      raise
+
+  def get_sliding_window(self, key: str, expiry: int):
+    return self._window(self._conn(), key, expiry, time.time())
+
+  def clear_sliding_window(self, key: str, expiry: int) -> None:
+    previous_key, current_key = self.sliding_window_keys(key, expiry, time.time())
+    self._conn().execute(
+      "DELETE FROM ratelimit_counters WHERE key IN (?, ?)", (previous_key, current_key)
+    )
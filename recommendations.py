@@ -0,0 +1,241 @@
+# recommendations.py
+"""
+"Recommended events for you" on the dashboard.
+
+Upcoming events are scored per user from:
+  - overlap between the user's theme categories and the event's categories,
+  - tags common among events in those categories (a derived tag profile),
+  - how soon the event starts,
+  - the user's free/paid preference (User.price_preference).
+
+Scores are computed with NumPy for a batch of users at once: a user x
+category affinity matrix against an event x category matrix, with tags
+handled through (event, tag) pair arrays so no dense event x tag matrix is
+built. Each user's top-N ids are cached in the response cache backend and
+rebuilt when the catalogue version or the user's preferences change.
+Without numpy, upcoming events in the user's categories are listed by date.
+"""
+import json
+import threading
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import select
+
+from cache import catalog_version, get_backend
+from extensions import db
+from models import Event, event_categories, event_tags, user_theme_categories
+
+try:
+  import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+  np = None
+
+TOP_N = 24
+HORIZON_DAYS = 180
+# users per scoring batch; bounds the users x (event, tag) pair temporaries
+BATCH_SIZE = 64
+
+# score weights
+W_CATEGORY = 0.55
+W_TAG = 0.20
+W_SOON = 0.15
+W_PRICE = 0.10
+SOON_DAYS = 30.0
+
+REC_KEY = "recs:{}"
+
+# rebuild the upcoming window at least this often even if nothing changed
+CATALOG_MAX_AGE = timedelta(hours=1)
+
+
+class _UpcomingCatalog:
+  """Upcoming events as arrays, built once per catalogue version."""
+
+  def __init__(self, version, now):
+    self.version = version
+    self.built_at = now
+    horizon = now + timedelta(days=HORIZON_DAYS)
+    upcoming = (db.func.coalesce(Event.end_at, Event.start_at) >= now, Event.start_at < horizon)
+    upcoming_ids = select(Event.id).where(*upcoming)
+
+    rows = db.session.execute(
+      select(Event.id, Event.start_at, Event.is_free)
+      .where(*upcoming)
+      .order_by(Event.start_at, Event.id)
+    ).all()
+    self.ids = np.array([r.id for r in rows], dtype=np.int64)
+    self.start = np.array([r.start_at for r in rows], dtype="datetime64[s]")
+    self.is_free = np.array([bool(r.is_free) for r in rows], dtype=bool)
+    position = {int(i): p for p, i in enumerate(self.ids)}
+
+    cat_pairs = [
+      (position[e], c) for e, c in db.session.execute(
+        select(event_categories.c.event_id, event_categories.c.category_id)
+        .where(event_categories.c.event_id.in_(upcoming_ids))
+      ) if e in position
+    ]
+    self.category_index = {c: k for k, c in enumerate(sorted({c for _, c in cat_pairs}))}
+    self.C = np.zeros((len(self.ids), len(self.category_index)), dtype=np.float32)
+    for p, c in cat_pairs:
+      self.C[p, self.category_index[c]] = 1.0
+    self.cat_counts = self.C.sum(axis=1)
+
+    tag_pairs = [
+      (position[e], t) for e, t in db.session.execute(
+        select(event_tags.c.event_id, event_tags.c.tag_id)
+        .where(event_tags.c.event_id.in_(upcoming_ids))
+      ) if e in position
+    ]
+    tag_index = {t: m for m, t in enumerate(sorted({t for _, t in tag_pairs}))}
+    self.n_tags = len(tag_index)
+    pairs = np.array([(p, tag_index[t]) for p, t in tag_pairs], dtype=np.int64).reshape(-1, 2)
+    self.tag_counts = np.bincount(pairs[:, 0], minlength=len(self.ids)).astype(np.float32)
+
+    # pairs grouped by event and by tag, for reduceat
+    by_event = pairs[np.argsort(pairs[:, 0], kind="stable")]
+    self.pe_event, self.pe_tag = by_event[:, 0], by_event[:, 1]
+    self.pe_starts = np.flatnonzero(np.r_[True, np.diff(self.pe_event) != 0]) if len(by_event) else by_event[:0, 0]
+    by_tag = pairs[np.argsort(pairs[:, 1], kind="stable")]
+    self.pt_event, self.pt_tag = by_tag[:, 0], by_tag[:, 1]
+    self.pt_starts = np.flatnonzero(np.r_[True, np.diff(self.pt_tag) != 0]) if len(by_tag) else by_tag[:0, 0]
+
+  def score(self, users, now):
+    """
+    users: list of (category_ids, price_preference).
+    Returns a list of top-N event id lists, one per user.
+    """
+    n_users, n_events = len(users), len(self.ids)
+    if n_events == 0:
+      return [[] for _ in users]
+
+    # user x category affinity
+    A = np.zeros((n_users, len(self.category_index)), dtype=np.float32)
+    for u, (category_ids, _) in enumerate(users):
+      for c in category_ids:
+        k = self.category_index.get(c)
+        if k is not None:
+          A[u, k] = 1.0
+
+    # cosine between theme set and event categories
+    overlap = A @ self.C.T
+    norm = np.sqrt(np.outer(np.maximum(A.sum(axis=1), 1.0), np.maximum(self.cat_counts, 1.0)))
+    cat_score = overlap / norm
+
+    tag_score = np.zeros((n_users, n_events), dtype=np.float32)
+    if len(self.pt_event):
+      # tag profile: how many matching events carry each tag
+      hit = (overlap > 0).astype(np.float32)
+      profile = np.zeros((n_users, self.n_tags), dtype=np.float32)
+      profile[:, self.pt_tag[self.pt_starts]] = np.add.reduceat(hit[:, self.pt_event], self.pt_starts, axis=1)
+      profile /= np.maximum(profile.max(axis=1, keepdims=True), 1.0)
+      # event tag score: mean profile weight over the event's tags
+      sums = np.add.reduceat(profile[:, self.pe_tag], self.pe_starts, axis=1)
+      events = self.pe_event[self.pe_starts]
+      tag_score[:, events] = sums / self.tag_counts[events]
+
+    days = np.maximum((self.start - np.datetime64(now, "s")).astype(np.float64) / 86400.0, 0.0)
+    soon = np.exp(-days / SOON_DAYS).astype(np.float32)
+
+    price = np.full((n_users, n_events), 0.5, dtype=np.float32)
+    for u, (_, preference) in enumerate(users):
+      if preference == "free":
+        price[u] = self.is_free
+      elif preference == "paid":
+        price[u] = ~self.is_free
+
+    score = W_CATEGORY * cat_score + W_TAG * tag_score + W_SOON * soon + W_PRICE * price
+    score[(cat_score <= 0) & (tag_score <= 0)] = -np.inf
+
+    results = []
+    for u in range(n_users):
+      row = score[u]
+      k = min(TOP_N, n_events)
+      top = np.argpartition(-row, k - 1)[:k]
+      top = top[np.argsort(-row[top], kind="stable")]
+      results.append([int(self.ids[i]) for i in top if np.isfinite(row[i])])
+    return results
+
+
+class Recommender:
+  def __init__(self):
+    self._catalog = None
+    self._lock = threading.Lock()
+
+  def _upcoming(self, now):
+    version = catalog_version()
+
+    def stale(catalog):
+      return catalog is None or catalog.version != version or now - catalog.built_at > CATALOG_MAX_AGE
+
+    catalog = self._catalog
+    if stale(catalog):
+      with self._lock:
+        catalog = self._catalog
+        if stale(catalog):
+          catalog = self._catalog = _UpcomingCatalog(version, now)
+    return catalog
+
+  def _user_themes(self, user_ids):
+    themes = {u: [] for u in user_ids}
+    for u, c in db.session.execute(
+      select(user_theme_categories.c.user_id, user_theme_categories.c.category_id)
+      .where(user_theme_categories.c.user_id.in_(user_ids))
+    ):
+      themes[u].append(c)
+    return themes
+
+  def compute(self, users):
+    """users: list of User. Returns {user_id: [event_id, ...]}."""
+    now = datetime.utcnow()
+    themes = self._user_themes([u.id for u in users])
+
+    if np is None:
+      return {u.id: self._fallback(themes[u.id], now) for u in users}
+
+    catalog = self._upcoming(now)
+    out = {}
+    for i in range(0, len(users), BATCH_SIZE):
+      batch = users[i:i + BATCH_SIZE]
+      ranked = catalog.score([(themes[u.id], u.price_preference) for u in batch], now)
+      out.update({u.id: ids for u, ids in zip(batch, ranked)})
+    return out
+
+  def _fallback(self, category_ids, now):
+    if not category_ids:
+      return []
+    return db.session.execute(
+      select(Event.id)
+      .where(
+        db.func.coalesce(Event.end_at, Event.start_at) >= now,
+        Event.id.in_(
+          select(event_categories.c.event_id).where(event_categories.c.category_id.in_(category_ids))
+        ),
+      )
+      .order_by(Event.start_at, Event.id)
+      .limit(TOP_N)
+    ).scalars().all()
+
+  def for_user(self, user):
+    """Cached top-N event ids for user."""
+    backend = get_backend()
+    version = catalog_version()
+    cached = backend.get(REC_KEY.format(user.id))
+    if cached is not None:
+      entry = json.loads(cached)
+      if entry["v"] == version:
+        return entry["ids"]
+
+    ids = self.compute([user])[user.id]
+    backend.set(
+      REC_KEY.format(user.id),
+      json.dumps({"v": version, "ids": ids}).encode("utf-8"),
+      current_app.config.get("RECOMMENDATIONS_TTL", 3600),
+    )
+    return ids
+
+  def invalidate(self, user_id) -> None:
+    get_backend().delete(REC_KEY.format(user_id))
+
+
+recommender = Recommender()
@@ -0,0 +1,135 @@
+# search.py
+"""
+Full-text search over events (title, location, description).
+
+SQLite uses an external-content FTS5 table (``events_fts``) kept in sync by
+triggers on ``events``; Postgres uses a generated ``tsvector`` column with a
+GIN index. Both are created alongside the ``events`` table by
+``db.create_all()``; existing databases get them from ``flask db upgrade``
+(``flask search-index`` rebuilds the index).
+Any other dialect falls back to ``ilike`` matching.
+"""
+import re
+
+from sqlalchemy import DDL, event, func, literal_column, select, table, column, Integer
+
+from extensions import db
+from models import Event
+
+# bm25 column weights: title, location, description
+_FTS_WEIGHTS = (10.0, 5.0, 1.0)
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+_SQLITE_DDL = [
+  """
+  CREATE VIRTUAL TABLE IF NOT EXISTS events_fts USING fts5(
+    title, location, description,
+    content='events', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+  )
+  """,
+  """
+  CREATE TRIGGER IF NOT EXISTS events_fts_ai AFTER INSERT ON events BEGIN
+    INSERT INTO events_fts(rowid, title, location, description)
+    VALUES (new.id, new.title, coalesce(new.location, ''), coalesce(new.description, ''));
+  END
+  """,
+  """
+  CREATE TRIGGER IF NOT EXISTS events_fts_ad AFTER DELETE ON events BEGIN
+    INSERT INTO events_fts(events_fts, rowid, title, location, description)
+    VALUES ('delete', old.id, old.title, coalesce(old.location, ''), coalesce(old.description, ''));
+  END
+  """,
+  """
+  CREATE TRIGGER IF NOT EXISTS events_fts_au AFTER UPDATE OF title, location, description ON events BEGIN
+    INSERT INTO events_fts(events_fts, rowid, title, location, description)
+    VALUES ('delete', old.id, old.title, coalesce(old.location, ''), coalesce(old.description, ''));
+    INSERT INTO events_fts(rowid, title, location, description)
+    VALUES (new.id, new.title, coalesce(new.location, ''), coalesce(new.description, ''));
+  END
+  """,
+]
+
+_POSTGRES_DDL = [
+  """
+  ALTER TABLE events ADD COLUMN IF NOT EXISTS search_vector tsvector
+  GENERATED ALWAYS AS (
+    setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+    setweight(to_tsvector('simple', coalesce(location, '')), 'B') ||
+    setweight(to_tsvector('simple', coalesce(description, '')), 'C')
+  ) STORED
+  """,
+  "CREATE INDEX IF NOT EXISTS ix_events_search_vector ON events USING gin (search_vector)",
+]
+
+for _stmt in _SQLITE_DDL:
+  event.listen(Event.__table__, "after_create", DDL(_stmt).execute_if(dialect="sqlite"))
+for _stmt in _POSTGRES_DDL:
+  event.listen(Event.__table__, "after_create", DDL(_stmt).execute_if(dialect="postgresql"))
+
+_events_fts = table("events_fts", column("rowid", Integer))
+
+
+def _tokens(q: str):
+  return _TOKEN_RE.findall(q.lower())[:16]
+
+
+def ensure_index(rebuild: bool = False) -> None:
+  """Create the search index for an existing database (idempotent)."""
+  dialect = db.engine.dialect.name
+  with db.engine.begin() as conn:
+    if dialect == "sqlite":
+      for stmt in _SQLITE_DDL:
+        conn.exec_driver_sql(stmt)
+      if rebuild:
+        conn.exec_driver_sql("INSERT INTO events_fts(events_fts) VALUES ('rebuild')")
+    elif dialect == "postgresql":
+      for stmt in _POSTGRES_DDL:
+        conn.exec_driver_sql(stmt)
+
+
+def search_subquery(q: str):
+  """
+  Returns a subquery with columns (event_id, rank) for events matching q,
+  lower rank = more relevant. Returns None when the backend has no
+  full-text index (caller should fall back to ilike).
+  """
+  tokens = _tokens(q)
+  if not tokens:
+    return None
+
+  dialect = db.engine.dialect.name
+
+  if dialect == "sqlite":
+    # every token is a quoted prefix term, implicitly AND-ed
+    match = " ".join(f'"{t}"*' for t in tokens)
+    return (
+      select(
+        _events_fts.c.rowid.label("event_id"),
+        func.bm25(literal_column("events_fts"), *_FTS_WEIGHTS).label("rank"),
+      )
+      .select_from(_events_fts)
+      .where(literal_column("events_fts").op("MATCH")(match))
+      .subquery("search")
+    )
+
+  if dialect == "postgresql":
+    tsquery = func.to_tsquery("simple", " & ".join(f"{t}:*" for t in tokens))
+    vector = literal_column("events.search_vector")
+    return (
+      select(Event.id.label("event_id"), (-func.ts_rank(vector, tsquery)).label("rank"))
+      .where(vector.op("@@")(tsquery))
+      .subquery("search")
+    )
+
+  return None
+
+
+def ilike_filter(q: str):
+  like = f"%{q}%"
+  return db.or_(
+    Event.title.ilike(like),
+    Event.description.ilike(like),
+    Event.location.ilike(like),
+  )
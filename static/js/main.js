@@ -18,6 +18,12 @@ document.addEventListener("DOMContentLoaded", () => {
 
   // Events explorer filters (category/type/date/search)
   bindEventsExplorerFilters();
+
+  // Calendar page month view
+  bindCalendarMonth();
+
+  // Dashboard recommendations
+  loadRecommendations();
 });
 
 function bindHomeDemoControls() {
@@ -229,6 +235,12 @@ function bindEventsExplorerFilters() {
   }
 
   function applyFilters() {
+    // live mode: the server filters (see bindLiveExplorer)
+    if (explorer.dataset.live === "true") {
+      explorer.dispatchEvent(new CustomEvent("explorer:change"));
+      return;
+    }
+
     const cards = getCards();
     let visible = 0;
     const q = norm(state.q);
@@ -343,8 +355,355 @@ function bindEventsExplorerFilters() {
         applyFilters();
       }, 150);
     });
+    bindSuggestions(searchEl);
   }
 
   // Initial render
-  applyFilters();
+  if (!bindLiveExplorer(explorer, state, addDays)) applyFilters();
+}
+
+// ---- Search suggestions (/api/suggest) in a native <datalist> ----
+function bindSuggestions(searchEl) {
+  const list = document.createElement("datalist");
+  list.id = "events-suggest";
+  searchEl.after(list);
+  searchEl.setAttribute("list", list.id);
+  searchEl.setAttribute("autocomplete", "off");
+
+  let seq = 0;
+  searchEl.addEventListener("input", async () => {
+    const q = searchEl.value.trim();
+    const mine = ++seq;
+    if (!q) {
+      list.replaceChildren();
+      return;
+    }
+    try {
+      const res = await fetch(`/api/suggest?q=${encodeURIComponent(q)}`, { headers: { Accept: "application/json" } });
+      if (!res.ok || mine !== seq) return;
+      const { suggestions } = await res.json();
+      if (mine !== seq) return;
+      list.replaceChildren(
+        ...suggestions.map((s) => {
+          const opt = document.createElement("option");
+          opt.value = s.type === "event" ? s.title : s.name;
+          opt.label = s.type === "event" ? s.location : s.type;
+          return opt;
+        })
+      );
+    } catch (_) {
+      // suggestions are a nicety; the search itself still works
+    }
+  });
+}
+
+// ---- Live explorer: cards come from /api/events ----
+// The home page inlines the first page and the category list
+// ([data-explorer-initial]), so nothing is fetched until a filter changes.
+function bindLiveExplorer(explorer, state, addDays) {
+  const inline = explorer.querySelector("[data-explorer-initial]");
+  if (!inline) return false;
+
+  let initial;
+  try {
+    initial = JSON.parse(inline.textContent);
+  } catch (_) {
+    return false;
+  }
+  if (!initial.events || initial.events.total === 0) return false;
+
+  const countEl = explorer.querySelector("[data-events-count]");
+  const cardsEl = explorer.querySelector(".cards");
+  const pagerEl = explorer.querySelector(".pager");
+  const chipsEl = explorer.querySelector(".filters__chips");
+  let page = 1;
+  let seq = 0;
+
+  // category checkboxes use slugs, the values the API filters on
+  if (chipsEl && initial.categories?.length) {
+    chipsEl.replaceChildren(
+      ...initial.categories.map((c) => {
+        const label = document.createElement("label");
+        label.className = "check";
+        const input = document.createElement("input");
+        input.type = "checkbox";
+        input.name = "category";
+        input.value = c.slug;
+        const span = document.createElement("span");
+        span.textContent = c.name;
+        label.append(input, " ", span);
+        return label;
+      })
+    );
+  }
+
+  const fmtISO = (d) =>
+    `${d.getFullYear()}-${String(d.getMonth() + 1).padStart(2, "0")}-${String(d.getDate()).padStart(2, "0")}`;
+
+  function card(ev) {
+    const start = new Date(ev.start_at);
+    const article = document.createElement("article");
+    article.className = "event-card";
+    article.innerHTML = `
+      <div class="event-card__img">
+        <picture><source type="image/webp" /><img alt="" loading="lazy" /></picture>
+        <div class="event-card__date"><span></span><small></small></div>
+      </div>
+      <div class="event-card__body">
+        <div class="event-card__loc"></div>
+        <h4></h4>
+        <p></p>
+        <div class="event-card__tags"></div>
+        <button class="event-card__btn" type="button">View more</button>
+      </div>`;
+    const img = article.querySelector("img");
+    const cover = ev.cover_image;
+    if (cover) {
+      img.alt = cover.alt_text || ev.title;
+      // local resized variants when the image has been ingested (images.py)
+      const sizes = "(max-width: 640px) 100vw, 360px";
+      if (cover.srcset?.webp) {
+        const source = article.querySelector("source");
+        source.srcset = cover.srcset.webp;
+        source.sizes = sizes;
+      }
+      if (cover.srcset?.jpeg) {
+        img.srcset = cover.srcset.jpeg;
+        img.sizes = sizes;
+        img.src = cover.srcset.jpeg.split(", ")[0].split(" ")[0];
+      } else {
+        img.src = cover.url;
+      }
+      if (cover.width && cover.height) {
+        img.width = cover.width;
+        img.height = cover.height;
+      }
+    }
+    article.querySelector(".event-card__date span").textContent = String(start.getDate()).padStart(2, "0");
+    article.querySelector(".event-card__date small").textContent = start.toLocaleDateString(undefined, { month: "short" });
+    article.querySelector(".event-card__loc").textContent = ev.location ? `📍 ${ev.location}` : "";
+    article.querySelector("h4").textContent = ev.title;
+    const desc = ev.description || "";
+    article.querySelector("p").textContent = desc.length > 90 ? `${desc.slice(0, 90)}...` : desc;
+    const tags = article.querySelector(".event-card__tags");
+    for (const name of [...ev.categories.map((c) => c.name), ...(ev.is_free ? ["Free"] : [])]) {
+      const tag = document.createElement("span");
+      tag.className = "tag";
+      tag.textContent = name;
+      tags.append(tag);
+    }
+    return article;
+  }
+
+  function pageButton(label, target, opts = {}) {
+    const btn = document.createElement("button");
+    btn.type = "button";
+    btn.className = opts.arrow ? "pager__arrow" : "pager__page";
+    if (target === page && !opts.arrow) btn.classList.add("is-active");
+    btn.textContent = label;
+    if (opts.label) btn.setAttribute("aria-label", opts.label);
+    btn.disabled = Boolean(opts.disabled);
+    btn.addEventListener("click", () => {
+      page = target;
+      load();
+    });
+    return btn;
+  }
+
+  function renderPager(pages) {
+    if (!pagerEl) return;
+    const items = [pageButton("←", page - 1, { arrow: true, label: "Previous page", disabled: page <= 1 })];
+    let last = 0;
+    for (let p = 1; p <= pages; p++) {
+      if (p !== 1 && p !== pages && Math.abs(p - page) > 1) continue;
+      if (p - last > 1) {
+        const dots = document.createElement("span");
+        dots.className = "pager__dots";
+        dots.textContent = "…";
+        items.push(dots);
+      }
+      items.push(pageButton(String(p), p));
+      last = p;
+    }
+    items.push(pageButton("→", page + 1, { arrow: true, label: "Next page", disabled: page >= pages }));
+    pagerEl.replaceChildren(...items);
+    pagerEl.hidden = pages <= 1;
+  }
+
+  function render(data) {
+    if (countEl) countEl.textContent = String(data.total);
+    cardsEl?.replaceChildren(...data.events.map(card));
+    renderPager(data.pages);
+  }
+
+  // the current filters, as /api/events (and the exports) take them
+  function filterParams() {
+    const params = new URLSearchParams();
+    for (const slug of state.categories) params.append("category", slug);
+    if (state.type !== "all") params.set("type", state.type);
+    if (state.date === "custom" && state.customDate) {
+      params.set("start", fmtISO(state.customDate));
+      params.set("end", fmtISO(addDays(state.customDate, 1)));
+    } else if (state.date !== "all") {
+      params.set("date", state.date);
+    }
+    if (state.q.trim()) params.set("q", state.q.trim());
+    return params;
+  }
+
+  async function load() {
+    const params = filterParams();
+    params.set("page", String(page));
+    params.set("per_page", String(initial.events.per_page));
+    // only what card() renders
+    params.set("fields", "title,description,location,is_free,start_at");
+    params.set("include", "categories,cover_image");
+
+    // drop responses that arrive after a newer request was sent
+    const mine = ++seq;
+    try {
+      const res = await fetch(`/api/events?${params}`);
+      if (!res.ok || mine !== seq) return;
+      const data = await res.json();
+      if (mine === seq) render(data);
+    } catch (_) {
+      // keep the current cards
+    }
+  }
+
+  // the filter handlers above call applyFilters(); route them to the API instead
+  explorer.addEventListener("explorer:change", () => {
+    page = 1;
+    load();
+  });
+
+  // exports are built in the background: poll until the file is ready
+  const pdfBtn = explorer.querySelector(".pdf-btn");
+  pdfBtn?.addEventListener("click", async () => {
+    const label = pdfBtn.textContent;
+    pdfBtn.disabled = true;
+    pdfBtn.textContent = "Generating…";
+    try {
+      const url = `/api/events/export.pdf?${filterParams()}`;
+      for (let attempt = 0; attempt < 60; attempt++) {
+        const res = await fetch(url);
+        if (res.status === 202) {
+          const wait = Number(res.headers.get("Retry-After")) || 1;
+          await new Promise((resolve) => setTimeout(resolve, wait * 1000));
+          continue;
+        }
+        if (!res.ok) break;
+        const link = document.createElement("a");
+        link.href = URL.createObjectURL(await res.blob());
+        link.download = "events.pdf";
+        link.click();
+        setTimeout(() => URL.revokeObjectURL(link.href), 10000);
+        break;
+      }
+    } catch (_) {
+      // leave the button usable for another try
+    } finally {
+      pdfBtn.disabled = false;
+      pdfBtn.textContent = label;
+    }
+  });
+
+  const icsLink = explorer.querySelector("[data-ics-link]");
+  if (icsLink) {
+    const syncIcs = () => {
+      const params = filterParams().toString();
+      icsLink.href = `/api/events/export.ics${params ? `?${params}` : ""}`;
+    };
+    explorer.addEventListener("explorer:change", syncIcs);
+    syncIcs();
+    icsLink.hidden = false;
+  }
+
+  render(initial.events);
+  explorer.dataset.live = "true";
+  return true;
+}
+
+function bindCalendarMonth() {
+  const root = document.querySelector("[data-calendar-month]");
+  if (!root) return;
+
+  const grid = root.querySelector("[data-month-grid]");
+  const title = root.querySelector("[data-month-title]");
+  const now = new Date();
+  let year = now.getFullYear();
+  let month = now.getMonth(); // 0-based
+
+  const pad = (n) => String(n).padStart(2, "0");
+
+  async function render() {
+    const key = `${year}-${pad(month + 1)}`;
+    title.textContent = new Date(year, month, 1).toLocaleDateString(undefined, { month: "long", year: "numeric" });
+
+    let counts = {};
+    try {
+      const res = await fetch(`/api/calendar?month=${key}`);
+      const data = await res.json();
+      for (const d of data.days || []) counts[d.date] = d.count;
+    } catch (_) {
+      counts = {};
+    }
+
+    const cells = [];
+    const lead = (new Date(year, month, 1).getDay() + 6) % 7; // Monday first
+    const days = new Date(year, month + 1, 0).getDate();
+    for (let i = 0; i < lead; i++) cells.push('<div class="month__day is-blank"></div>');
+    for (let d = 1; d <= days; d++) {
+      const n = counts[`${key}-${pad(d)}`] || 0;
+      const badge = n ? `<span class="month__count">${n} event${n === 1 ? "" : "s"}</span>` : "";
+      cells.push(`<div class="month__day"><div>${d}</div>${badge}</div>`);
+    }
+    grid.innerHTML = cells.join("");
+  }
+
+  root.querySelector("[data-month-prev]")?.addEventListener("click", () => {
+    month -= 1;
+    if (month < 0) { month = 11; year -= 1; }
+    render();
+  });
+
+  root.querySelector("[data-month-next]")?.addEventListener("click", () => {
+    month += 1;
+    if (month > 11) { month = 0; year += 1; }
+    render();
+  });
+
+  render();
+}
+
+async function loadRecommendations() {
+  const list = document.querySelector("[data-recommendations]");
+  if (!list) return;
+  const lock = document.querySelector("[data-recommendations-lock]");
+
+  let events = [];
+  try {
+    const res = await fetch("/api/me/recommendations", { credentials: "same-origin" });
+    if (!res.ok) return;
+    events = (await res.json()).events || [];
+  } catch (_) {
+    return;
+  }
+  if (events.length === 0) return;
+
+  list.replaceChildren(
+    ...events.slice(0, 6).map((ev) => {
+      const li = document.createElement("li");
+      li.className = "dashRecs__item";
+      const title = document.createElement("strong");
+      title.textContent = ev.title;
+      const meta = document.createElement("span");
+      const when = new Date(ev.start_at).toLocaleDateString(undefined, { day: "numeric", month: "short" });
+      meta.textContent = [when, ev.location, ev.is_free ? "Free" : ""].filter(Boolean).join(" · ");
+      li.append(title, meta);
+      return li;
+    })
+  );
+  list.hidden = false;
+  if (lock) lock.hidden = true;
 }
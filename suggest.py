@@ -0,0 +1,406 @@
+# suggest.py
+"""
+In-memory prefix index for search-box suggestions (``GET /api/suggest``).
+
+Every upcoming event is indexed under its title and location, and every
+category and tag under its name. Text is case- and accent-folded
+("Paro Tshechu" -> "paro tshechu") and indexed from each word onward, so
+"tsh" and "paro ts" both match. The keys live in one sorted list and a
+lookup is a bisect plus a short scan. Prefixes of up to three characters,
+whose ranges are huge, are answered from top-k lists built with the index.
+
+Categories and tags rank by their number of upcoming events, events by
+start date, soonest first. Ended events are left out.
+
+Like the columnar explorer engine, the index is tied to the catalogue
+version: commits made in this process are patched in by reloading just the
+changed events. With a shared cache backend (sqlite), a version bump from
+another process triggers a full reload; with the per-process memory backend
+the index is instead rebuilt once it is SUGGEST_INDEX_TTL seconds old.
+Lookups themselves never query the database.
+"""
+import heapq
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime
+
+from flask import current_app
+
+from cache import catalog_changed, catalog_version, version_is_shared
+from database import primary
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+# folded keys are cut to this length; longer queries are matched on it
+MAX_KEY = 48
+
+# prefixes this short get precomputed lists of their best SHORT_POOL entries
+SHORT_PREFIX = 3
+SHORT_POOL = 64
+
+# cap on index entries read for one lookup
+MAX_SCAN = 2000
+
+# at most this many categories/tags in one answer
+MAX_LABELS = 3
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def fold(text: str) -> str:
+  """Lowercase, accent-free words joined by single spaces."""
+  text = unicodedata.normalize("NFKD", text or "")
+  text = "".join(c for c in text if not unicodedata.combining(c)).casefold()
+  return " ".join(_WORD_RE.findall(text))
+
+
+def _keys(text: str):
+  """Folded text from each word onward: "a b c" -> "a b c", "b c", "c"."""
+  folded = fold(text)
+  keys = []
+  for m in re.finditer(r"\S+", folded):
+    keys.append(folded[m.start():m.start() + MAX_KEY])
+  return keys
+
+
+def _ts(value: datetime) -> float:
+  return (value - _EPOCH).total_seconds()
+
+
+class SuggestIndex:
+  """
+  One index version; readers never see it change.
+
+  events: {id: (title, location, start_at, end_at, category slugs, tag slugs)}
+  labels: {("category" | "tag", slug): name}
+
+  An entry is (rank, kind, event id | slug, end time | event count); a lower
+  rank is better, and ranks are unique, so entries sort by rank. keys/refs
+  hold every (folded key, entry) pair sorted by key, then entry.
+  """
+
+  def __init__(self, version, events, labels):
+    self.version = version
+    self.events = events
+    self.labels = labels
+    self.loaded_at = time.monotonic()
+
+    now = _ts(datetime.utcnow())
+    self.counts = {}          # label -> number of upcoming events
+    self.event_entries = {}   # event id -> entry, upcoming events only
+    for event_id, event in events.items():
+      entry = _event_entry(event_id, event, now)
+      if entry is not None:
+        self.event_entries[event_id] = entry
+        self._count(event, 1)
+    self.label_entries = {label: self._label_entry(label) for label in labels}
+
+    entries = sorted([*self.label_entries.values(), *self.event_entries.values()])
+    pairs = []
+    self.short = {}
+    for entry in entries:
+      keys = self._entry_keys(entry)
+      pairs.extend((key, entry) for key in keys)
+      # entries come in rank order, so each list keeps the best ones
+      for prefix in _prefixes(keys):
+        bucket = self.short.setdefault(prefix, [])
+        if len(bucket) < SHORT_POOL:
+          bucket.append(entry)
+    # stable: within a key the entries stay in rank order
+    pairs.sort(key=lambda pair: pair[0])
+    self.keys = [k for k, _ in pairs]
+    self.refs = [e for _, e in pairs]
+
+  def __len__(self):
+    return len(self.event_entries) + len(self.label_entries)
+
+  def _count(self, event, delta: int) -> None:
+    for kind, slugs in (("category", event[4]), ("tag", event[5])):
+      for slug in slugs:
+        self.counts[(kind, slug)] = self.counts.get((kind, slug), 0) + delta
+
+  def _label_entry(self, label):
+    count = self.counts.get(label, 0)
+    return ((0, -count, label[1]), label[0], label[1], count)
+
+  def _entry_keys(self, entry):
+    kind, ref = entry[1], entry[2]
+    if kind == "event":
+      title, location = self.events[ref][:2]
+      return set(_keys(title)) | set(_keys(location))
+    return set(_keys(self.labels[(kind, ref)]))
+
+  # ---- building ----
+
+  def patched(self, version, changed_ids, rows, category_pairs, tag_pairs, labels):
+    """
+    New index with changed_ids replaced by rows (missing ids = deleted).
+    Only the changed events' keys, and those of labels whose name or count
+    moved, are taken out of and bisected back into a copy of keys/refs; a
+    short-prefix list is rescanned only when removals leave it short.
+    """
+    index = SuggestIndex.__new__(SuggestIndex)
+    index.version = version
+    index.loaded_at = self.loaded_at
+    index.events = dict(self.events)
+    index.labels = labels
+    index.counts = dict(self.counts)
+    index.event_entries = dict(self.event_entries)
+    index.label_entries = dict(self.label_entries)
+    index.keys = list(self.keys)
+    index.refs = list(self.refs)
+    index.short = dict(self.short)
+
+    now = _ts(datetime.utcnow())
+    removed, added = [], []  # (entry, keys)
+    for event_id in changed_ids:
+      event = index.events.pop(event_id, None)
+      entry = index.event_entries.pop(event_id, None)
+      if entry is not None:
+        removed.append((entry, self._entry_keys(entry)))
+        index._count(event, -1)
+    for event_id, event in _events(rows, category_pairs, tag_pairs).items():
+      index.events[event_id] = event
+      entry = _event_entry(event_id, event, now)
+      if entry is not None:
+        index.event_entries[event_id] = entry
+        index._count(event, 1)
+        added.append((entry, index._entry_keys(entry)))
+
+    for label in self.labels.keys() | labels.keys():
+      old = index.label_entries.pop(label, None)
+      new = index._label_entry(label) if label in labels else None
+      if old == new and self.labels.get(label) == labels.get(label):
+        index.label_entries[label] = old
+        continue
+      if old is not None:
+        removed.append((old, self._entry_keys(old)))
+      if new is not None:
+        index.label_entries[label] = new
+        added.append((new, index._entry_keys(new)))
+
+    # Adds go in first and lists may overrun SHORT_POOL until the end. A list
+    # that was full (or turned an entry away) has entries outside it, so it is
+    # rebuilt from the keys only if removals leave it short.
+    overflowed = set()
+    copied = set()
+
+    def bucket(prefix):
+      if prefix not in copied:
+        copied.add(prefix)
+        index.short[prefix] = list(index.short.get(prefix, ()))
+      return index.short[prefix]
+
+    for entry, keys in added:
+      for key in keys:
+        index._link(key, entry)
+      for prefix in _prefixes(keys):
+        pool = index.short.get(prefix, ())
+        if len(pool) >= SHORT_POOL and prefix not in copied:
+          overflowed.add(prefix)
+        if len(pool) < SHORT_POOL or entry < pool[-1]:
+          insort(bucket(prefix), entry)
+        else:
+          overflowed.add(prefix)
+    for entry, keys in removed:
+      for key in keys:
+        index._unlink(key, entry)
+      for prefix in _prefixes(keys):
+        pool = index.short.get(prefix, ())
+        if len(pool) >= SHORT_POOL and prefix not in copied:
+          overflowed.add(prefix)
+        i = bisect_left(pool, entry)
+        if i < len(pool) and pool[i] == entry:
+          del bucket(prefix)[i]
+    for prefix in copied:
+      pool = index.short[prefix]
+      if len(pool) < SHORT_POOL and prefix in overflowed:
+        index.short[prefix] = index._best(prefix)
+      else:
+        del pool[SHORT_POOL:]
+    return index
+
+  def _link(self, key, entry) -> None:
+    lo = bisect_left(self.keys, key)
+    i = bisect_left(self.refs, entry, lo, bisect_right(self.keys, key, lo))
+    self.keys.insert(i, key)
+    self.refs.insert(i, entry)
+
+  def _unlink(self, key, entry) -> None:
+    lo = bisect_left(self.keys, key)
+    hi = bisect_right(self.keys, key, lo)
+    i = bisect_left(self.refs, entry, lo, hi)
+    if i < hi and self.refs[i] == entry:
+      del self.keys[i]
+      del self.refs[i]
+
+  def _best(self, prefix):
+    """The SHORT_POOL best entries with a key starting with prefix."""
+    found = set()
+    pos = bisect_left(self.keys, prefix)
+    while pos < len(self.keys) and self.keys[pos].startswith(prefix):
+      found.add(self.refs[pos])
+      pos += 1
+    return heapq.nsmallest(SHORT_POOL, found)
+
+  # ---- querying ----
+
+  def lookup(self, q: str, limit: int = 8):
+    """Best matches for the prefix q, as dicts ready for JSON."""
+    q = fold(q)[:MAX_KEY]
+    if not q:
+      return []
+
+    if len(q) <= SHORT_PREFIX:
+      candidates = self.short.get(q, ())
+    else:
+      found = set()
+      pos = bisect_left(self.keys, q)
+      end = min(pos + MAX_SCAN, len(self.keys))
+      while pos < end and self.keys[pos].startswith(q):
+        found.add(self.refs[pos])
+        pos += 1
+      candidates = sorted(found)
+
+    now = _ts(datetime.utcnow())
+    labels, events = [], []
+    for entry in candidates:
+      if entry[1] != "event":
+        if len(labels) < MAX_LABELS:
+          labels.append(entry)
+      elif entry[3] >= now:
+        events.append(entry)
+        if len(labels) + len(events) >= limit:
+          break
+    return [self._render(e) for e in (labels + events)[:limit]]
+
+  def _render(self, entry) -> dict:
+    kind, ref = entry[1], entry[2]
+    if kind != "event":
+      return {"type": kind, "slug": ref, "name": self.labels[(kind, ref)], "count": entry[3]}
+    title, location, start_at = self.events[ref][:3]
+    return {
+      "type": "event",
+      "id": ref,
+      "title": title,
+      "location": location or "",
+      "start_at": start_at.isoformat(),
+    }
+
+
+def _event_entry(event_id, event, now):
+  """The event's entry, or None once it has ended."""
+  start_at, end_at = event[2], event[3]
+  ends = _ts(end_at or start_at)
+  if ends < now:
+    return None
+  return ((1, _ts(start_at), event_id), "event", event_id, ends)
+
+
+def _prefixes(keys):
+  return {key[:n] for key in keys for n in range(1, min(len(key), SHORT_PREFIX) + 1)}
+
+
+class Suggestions:
+  def __init__(self, app=None):
+    self._index = None
+    self._lock = threading.Lock()
+    self._pending = {}  # catalogue version -> event ids changed by this process
+    if app is not None:
+      self.init_app(app)
+
+  def init_app(self, app) -> None:
+    app.config.setdefault("SUGGEST_ENABLED", True)
+    app.config.setdefault("SUGGEST_INDEX_TTL", 60)
+    app.extensions["suggest"] = self if app.config["SUGGEST_ENABLED"] else None
+    if app.config["SUGGEST_ENABLED"]:
+      catalog_changed.connect(self._on_catalog_changed, sender=app, weak=False)
+
+  def _on_catalog_changed(self, app, event_ids=frozenset(), version=None, **extra):
+    if version is not None:
+      with self._lock:
+        if len(self._pending) > 1000:
+          self._pending.clear()
+        self._pending[version] = set(event_ids)
+
+  def _expired(self, index) -> bool:
+    ttl = current_app.config["SUGGEST_INDEX_TTL"]
+    return bool(ttl) and not version_is_shared() and time.monotonic() - index.loaded_at >= ttl
+
+  def _fresh(self, index, version) -> bool:
+    return index is not None and index.version == version and not self._expired(index)
+
+  def index(self) -> SuggestIndex:
+    """Current index, refreshed if the catalogue version moved on (or it expired)."""
+    version = catalog_version()
+    index = self._index
+    if self._fresh(index, version):
+      return index
+
+    with self._lock:
+      index = self._index
+      if self._fresh(index, version):
+        return index
+
+      started = time.perf_counter()
+      missed = set(range(index.version + 1, version + 1)) if index is not None else None
+      if missed and missed <= self._pending.keys() and not self._expired(index):
+        changed = set().union(*(self._pending[v] for v in missed))
+        index = index.patched(version, changed, *_load(changed))
+      else:
+        rows, category_pairs, tag_pairs, labels = _load(None)
+        index = SuggestIndex(version, _events(rows, category_pairs, tag_pairs), labels)
+      current_app.logger.debug(
+        "suggest index v%s: %d entries in %.1f ms", version, len(index), (time.perf_counter() - started) * 1000,
+      )
+
+      self._pending = {v: ids for v, ids in self._pending.items() if v > version}
+      self._index = index
+      return index
+
+
+def _events(rows, category_pairs, tag_pairs) -> dict:
+  cats, tags = {}, {}
+  for event_id, slug in category_pairs:
+    cats.setdefault(event_id, []).append(slug)
+  for event_id, slug in tag_pairs:
+    tags.setdefault(event_id, []).append(slug)
+  return {
+    r.id: (r.title, r.location, r.start_at, r.end_at, tuple(cats.get(r.id, ())), tuple(tags.get(r.id, ())))
+    for r in rows
+  }
+
+
+def _load(event_ids):
+  """Event rows, (event_id, slug) pairs for event_ids (all if None), and every label."""
+  from sqlalchemy import select
+
+  from extensions import db
+  from models import Category, Event, Tag, event_categories, event_tags
+
+  rows = select(Event.id, Event.title, Event.location, Event.start_at, Event.end_at)
+  cats = select(event_categories.c.event_id, Category.slug).join(Category)
+  tags = select(event_tags.c.event_id, Tag.slug).join(Tag)
+  if event_ids is not None:
+    ids = list(event_ids)
+    rows = rows.where(Event.id.in_(ids))
+    cats = cats.where(event_categories.c.event_id.in_(ids))
+    tags = tags.where(event_tags.c.event_id.in_(ids))
+
+  with primary():
+    labels = {("category", slug): name for slug, name in db.session.execute(select(Category.slug, Category.name))}
+    labels.update({("tag", slug): name for slug, name in db.session.execute(select(Tag.slug, Tag.name))})
+    return (
+      db.session.execute(rows).all(),
+      db.session.execute(cats).all(),
+      db.session.execute(tags).all(),
+      labels,
+    )
+
+
+def get_suggestions():
+  """The suggestions extension if enabled for the current app, else None."""
+  return current_app.extensions.get("suggest")
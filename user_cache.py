@@ -0,0 +1,75 @@
+# user_cache.py
+"""
+Identity cache for the Flask-Login user loader.
+
+The loader runs on every authenticated request, including plain page
+renders. A user's column values are kept here for USER_CACHE_TTL seconds
+and turned back into a session-bound ``User`` with ``merge(load=False)``,
+which emits no SQL. Entries are dropped as soon as a commit changes the
+user (password, profile, saved themes); other worker processes see the
+change once their entry expires.
+"""
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from extensions import db
+from models import User
+
+_entries = {}  # user_id -> (expires, {column: value})
+_lock = threading.Lock()
+
+
+def _snapshot(user) -> dict:
+  return {attr.key: getattr(user, attr.key) for attr in inspect(User).column_attrs}
+
+
+def load_user(user_id: str):
+  try:
+    uid = int(user_id)
+  except (TypeError, ValueError):
+    return None
+
+  ttl = current_app.config.get("USER_CACHE_TTL", 30)
+  entry = _entries.get(uid)
+  if entry is not None and entry[0] > time.monotonic():
+    user = User(**entry[1])
+    make_transient_to_detached(user)
+    return db.session.merge(user, load=False)
+
+  user = db.session.get(User, uid)
+  if user is not None and ttl:
+    with _lock:
+      _entries[uid] = (time.monotonic() + ttl, _snapshot(user))
+  return user
+
+
+def invalidate_user(user_id) -> None:
+  with _lock:
+    _entries.pop(user_id, None)
+
+
+def clear() -> None:
+  with _lock:
+    _entries.clear()
+
+
+@event.listens_for(Session, "after_flush")
+def _track_user_changes(session, flush_context):
+  ids = {o.id for o in (*session.dirty, *session.deleted) if isinstance(o, User)}
+  if ids:
+    session.info.setdefault("changed_user_ids", set()).update(ids)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_on_commit(session):
+  for user_id in session.info.pop("changed_user_ids", ()):
+    invalidate_user(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_on_rollback(session):
+  session.info.pop("changed_user_ids", None)
@@ -1,38 +1,86 @@
 # views.py
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import Blueprint, Response, render_template, stream_template, stream_with_context, send_file, request, redirect, url_for, flash, abort
 from flask_login import login_user, logout_user, current_user, login_required
 from extensions import db, limiter
-from models import User, Event, Category
-from flask import jsonify
+from passwords import PasswordHasherBusy
+from models import User, Event, Category, EventImage, event_categories
+from flask import current_app, jsonify
+from markupsafe import Markup
+from werkzeug.datastructures import MultiDict
 from datetime import datetime, timedelta
-from sqlalchemy.orm import joinedload
+import base64
+from sqlalchemy import case, func, literal, select, tuple_, union_all
+
+import search
+import calendar_index
+import changes
+from cache import cached_response
+from database import read_replica
+from documents import api_response, dumps, encode_event, event_documents, json_response, load_events, parse_fieldset, sparse_documents
+from exports import describe_filters, export_key, get_exports, ical_chunks, pdf_event
+from explorer_engine import get_engine
+from images import ImagesUnavailable
+from instrumentation import timed
+from page_cache import cached_page
+from recommendations import recommender
+from suggest import get_suggestions
 
 bp = Blueprint("main", __name__)
 
 @bp.get("/")
+@cached_page
 def home():
-  return render_template("layout.html", page="pages/home.html", active="home")
+  # streamed, so the head and CSS go out before the explorer query runs
+  return Response(stream_template(
+    "layout.html", page="pages/home.html", active="home", explorer_initial=_explorer_initial,
+  ), mimetype="text/html")
+
+
+def _explorer_initial() -> Markup:
+  """
+  Category list and the default explorer page (= GET /api/events) as JSON
+  for an inline <script type="application/json">; called from the template.
+  """
+  engine = get_engine()
+  payload, ids = _events_page(_event_filters(MultiDict()), 1, 12, snap=engine.snapshot() if engine else None)
+  cats = Category.query.order_by(Category.name.asc()).all()
+  body = json_response(
+    {"categories": [c.to_dict() for c in cats]},
+    events=json_response(payload, events=event_documents(ids)).get_data(),
+  ).get_data()
+  # nothing in the JSON may close the <script> element
+  return Markup(body.replace(b"<", b"\\u003c").replace(b">", b"\\u003e").replace(b"&", b"\\u0026").decode("utf-8"))
 
 @bp.get("/about")
+@cached_page
 def about():
   return render_template("layout.html", page="pages/about.html", active="about")
 
 @bp.get("/plan")
+@cached_page
 def plan():
   return render_template("layout.html", page="pages/plan.html", active="plan")
 
 @bp.get("/things")
+@cached_page
 def things():
   return render_template("layout.html", page="pages/things.html", active="things")
 
 @bp.get("/calendar")
+@cached_page
 def calendar():
   return render_template("layout.html", page="pages/calendar.html", active="calendar")
 
 @bp.get("/offers")
+@cached_page
 def offers():
   return render_template("layout.html", page="pages/offers.html", active="offers")
 
+@bp.get("/stopover")
+@cached_page
+def stopover():
+  return render_template("layout.html", page="pages/stopover.html", active="stopover")
+
 
 # DASHBOARD (protected)
 @bp.get("/dashboard")
@@ -43,6 +91,11 @@ def dashboard():
 
 # ---- auth ----
 
+def _hasher_busy(template: str):
+  flash("We're handling a lot of sign-ins right now. Please try again in a moment.", "error")
+  return render_template(template), 503, {"Retry-After": "2"}
+
+
 @bp.route("/login", methods=["GET", "POST"])
 @limiter.limit("10/minute")
 def login():
@@ -57,7 +110,16 @@ def login():
     user = User.query.filter_by(email=email).first()
 
     # print("FOUND USER:", bool(user))
-    if not user or not user.check_password(password):
+    try:
+      valid = bool(user) and user.check_password(password)
+      if valid and user.password_needs_rehash():
+        # transparent upgrade to the configured bcrypt cost
+        user.set_password(password)
+        db.session.commit()
+    except PasswordHasherBusy:
+      return _hasher_busy("pages/login.html")
+
+    if not valid:
       flash("Invalid email or password.", "error")
       return render_template("pages/login.html"), 401
 
@@ -100,7 +162,10 @@ def signup():
       return render_template("pages/signup.html"), 409
 
     user = User(email=email, first_name=first, last_name=last)
-    user.set_password(password)
+    try:
+      user.set_password(password)
+    except PasswordHasherBusy:
+      return _hasher_busy("pages/signup.html")
     db.session.add(user)
     db.session.commit()
 
@@ -162,12 +227,199 @@ def _window_from_preset(preset: str):
 
 
 @bp.get("/api/categories")
+@cached_response
+@read_replica
 def api_categories():
   cats = Category.query.order_by(Category.name.asc()).all()
-  return jsonify({"categories": [c.to_dict() for c in cats]})
+  with timed("serialize"):
+    return jsonify({"categories": [c.to_dict() for c in cats]})
+
+
+def _encode_cursor(start_at: datetime, event_id: int) -> str:
+  raw = f"{start_at.isoformat()}|{event_id}".encode("utf-8")
+  return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str):
+  """Returns (start_at, id) or None if the cursor is malformed."""
+  try:
+    raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+    start_at, event_id = raw.split("|", 1)
+    return datetime.fromisoformat(start_at), int(event_id)
+  except Exception:
+    return None
+
+
+def _event_filters(args):
+  """
+  Normalises the explorer filter params shared by the events endpoints.
+  Exports key their files on the result (exports.export_key), so whatever
+  changes the matched events must be in here, and nothing else.
+  """
+  start = None
+  end = None
+  date = None
+
+  # Date logic: either explicit start/end OR preset window
+  if args.get("start") or args.get("end"):
+    start = _parse_iso_date(args.get("start") or "")
+    end = _parse_iso_date(args.get("end") or "")
+  else:
+    date = (args.get("date") or "all").lower()
+    start, end = _window_from_preset(date)
+
+  return {
+    # slugs match exactly; order and repeats don't matter
+    "categories": sorted({v.strip() for v in args.getlist("category") if v.strip()}),
+    "type": (args.get("type") or "all").lower(),
+    "date": date,
+    "start": start,
+    "end": end,
+    "q": (args.get("q") or "").strip(),
+  }
+
+
+def _overlaps(start, end):
+  """
+  An event overlaps [start, end) if:
+    (no end_at and start_at in window) OR
+    (end_at >= start and start_at < end)
+  """
+  return db.or_(
+    db.and_(Event.end_at.is_(None), Event.start_at >= start, Event.start_at < end),
+    db.and_(Event.end_at.isnot(None), Event.end_at >= start, Event.start_at < end),
+  )
+
+
+def _event_conditions(filters):
+  """WHERE clauses for the category / type / date filters."""
+  conditions = []
+
+  # Theme/category filter (EXISTS, so no DISTINCT over the joined rows)
+  if filters["categories"]:
+    conditions.append(Event.categories.any(Category.slug.in_(filters["categories"])))
+
+  # Free/paid filter
+  if filters["type"] == "free":
+    conditions.append(Event.is_free.is_(True))
+  elif filters["type"] == "paid":
+    conditions.append(Event.is_free.is_(False))
+
+  # Time overlap filter; the day buckets narrow it to an index range first
+  start, end = filters["start"], filters["end"]
+  if start and end:
+    conditions.append(calendar_index.window_filter(start, end))
+    conditions.append(_overlaps(start, end))
+  elif start and not end:
+    conditions.append(Event.start_at >= start)
+  elif end and not start:
+    conditions.append(Event.start_at < end)
+
+  return conditions
+
+
+def _filtered_select(filters, *columns):
+  """
+  Select of the given columns over events matching the filters (no ordering).
+  Returns (stmt, search_subquery_or_None).
+  """
+  stmt = select(*columns).select_from(Event).where(*_event_conditions(filters))
+
+  # Search: full-text index when available, ilike otherwise
+  q = filters["q"]
+  matches = search.search_subquery(q) if q else None
+  if matches is not None:
+    stmt = stmt.join(matches, matches.c.event_id == Event.id)
+  elif q:
+    stmt = stmt.where(search.ilike_filter(q))
+
+  return stmt, matches
+
+
+def _event_id_query(filters, rank: bool = True):
+  """
+  Select of (Event.id, Event.start_at) matching the filters, in explorer order.
+  With a search term and rank=True the order is relevance first.
+  """
+  stmt, matches = _filtered_select(filters, Event.id, Event.start_at)
+  order = [matches.c.rank.asc()] if matches is not None and rank else []
+  return stmt.order_by(*order, Event.start_at.asc(), Event.id.asc())
+
+
+FACET_DATE_PRESETS = ("today", "week", "next30", "next3m", "next6m")
+
+
+def _facet_windows():
+  return {p: _window_from_preset(p) for p in FACET_DATE_PRESETS}
+
+
+def _event_facets(filters):
+  """
+  Total plus facet counts in one UNION ALL statement. Each facet ignores its
+  own filter (so every checkbox shows what selecting it would give) but
+  honours all the others.
+
+  Returns (total, {"categories": {slug: n}, "type": {...}, "date": {...}}).
+  """
+  def ids(**without):
+    stmt, _ = _filtered_select({**filters, **without}, Event.id)
+    return stmt
+
+  no_dates = ids(start=None, end=None).subquery("no_dates")
+  # inline (preset, w_start, w_end) rows; a UNION of literals since SQLite
+  # can't alias VALUES columns
+  rows = []
+  for preset, (w_start, w_end) in _facet_windows().items():
+    rows.append(select(
+      literal(preset).label("preset"),
+      literal(w_start, db.DateTime).label("w_start"),
+      literal(w_end, db.DateTime).label("w_end"),
+    ))
+  windows = union_all(*rows).subquery("windows")
+  in_window = db.and_(
+    Event.start_at < windows.c.w_end,
+    db.or_(
+      db.and_(Event.end_at.is_(None), Event.start_at >= windows.c.w_start),
+      Event.end_at >= windows.c.w_start,
+    ),
+  )
+
+  stmt = union_all(
+    select(literal("total"), literal(""), func.count()).select_from(ids().subquery()),
+    select(literal("categories"), Category.slug, func.count())
+      .select_from(event_categories.join(Category))
+      .where(event_categories.c.event_id.in_(ids(categories=[])))
+      .group_by(Category.slug),
+    select(literal("type"), case((Event.is_free.is_(True), "free"), else_="paid"), func.count())
+      .where(Event.id.in_(ids(type="all")))
+      .group_by(Event.is_free),
+    select(literal("date"), literal("all"), func.count()).select_from(no_dates),
+    select(literal("date"), windows.c.preset, func.count())
+      .select_from(Event)
+      .join(windows, in_window)
+      .where(Event.id.in_(select(no_dates.c.id)))
+      .group_by(windows.c.preset),
+  )
+
+  total = 0
+  facets = {
+    "categories": {},
+    "type": {"all": 0, "free": 0, "paid": 0},
+    "date": {"all": 0, **{p: 0 for p in FACET_DATE_PRESETS}},
+  }
+  for facet, key, n in db.session.execute(stmt):
+    if facet == "total":
+      total = n
+    else:
+      facets[facet][key] = n
+  facets["type"]["all"] = facets["type"]["free"] + facets["type"]["paid"]
+
+  return total, facets
 
 
 @bp.get("/api/events")
+@cached_response
+@read_replica
 def api_events():
   """
   Query params:
@@ -176,105 +428,347 @@ def api_events():
     date=all|today|week|next30|next3m|next6m
     start=YYYY-MM-DD (optional)
     end=YYYY-MM-DD   (optional)
-    q=search text (title/desc/location)
+    q=search text (title/desc/location); results are ranked by relevance
     page=1
     per_page=12 (max 48)
+    cursor=<opaque> (keyset mode; pass "" for the first page, then next_cursor.
+                     Always ordered by start date, even with q)
+    facets=1 (also return per category / type / date preset counts)
+    fields=id,title,start_at,... (only these event fields)
+    include=categories,tags,cover_image,gallery (only these relations)
+
+  Send Accept: application/msgpack for a MessagePack body.
   """
-  category_slugs = request.args.getlist("category")
-  type_filter = (request.args.get("type") or "all").lower()
-  date_preset = (request.args.get("date") or "all").lower()
-  q = (request.args.get("q") or "").strip()
+  filters = _event_filters(request.args)
+  per_page = min(max(int(request.args.get("per_page", 12)), 1), 48)
+  want_facets = request.args.get("facets") in ("1", "true")
+  try:
+    fieldset = parse_fieldset(request.args)
+  except ValueError as exc:
+    return jsonify({"error": str(exc)}), 400
+
+  # In-memory columnar snapshot when enabled; it can't do full-text search
+  engine = get_engine()
+  snap = engine.snapshot() if engine is not None and not filters["q"] else None
+
+  # Keyset mode: seek on (start_at, id) through ix_events_start_at_id
+  if "cursor" in request.args:
+    after = None
+    cursor = request.args.get("cursor") or ""
+    if cursor:
+      after = _decode_cursor(cursor)
+      if after is None:
+        return jsonify({"error": "invalid cursor"}), 400
+
+    if snap is not None:
+      rows = snap.seek(filters, after, per_page + 1)
+    else:
+      stmt = _event_id_query(filters, rank=False)
+      if after is not None:
+        stmt = stmt.where(tuple_(Event.start_at, Event.id) > tuple_(*after))
+      rows = db.session.execute(stmt.limit(per_page + 1)).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+
+    payload = {
+      "per_page": per_page,
+      "next_cursor": _encode_cursor(rows[-1][1], rows[-1][0]) if has_more else None,
+    }
+    if want_facets:
+      if snap is not None:
+        payload["total"], payload["facets"] = snap.facets(filters, _facet_windows())
+      else:
+        payload["total"], payload["facets"] = _event_facets(filters)
+    return api_response(payload, events=_documents([r[0] for r in rows], fieldset))
 
   page = max(int(request.args.get("page", 1)), 1)
-  per_page = min(max(int(request.args.get("per_page", 12)), 1), 48)
+  payload, ids = _events_page(filters, page, per_page, want_facets, snap)
+  return api_response(payload, events=_documents(ids, fieldset))
 
-  # Date logic: either explicit start/end OR preset window
-  start = None
-  end = None
 
-  if request.args.get("start") or request.args.get("end"):
-    start = _parse_iso_date(request.args.get("start") or "")
-    end = _parse_iso_date(request.args.get("end") or "")
-  else:
-    start, end = _window_from_preset(date_preset)
+def _documents(ids, fieldset):
+  """Full (stored) documents, or sparse ones for ?fields= / ?include=."""
+  if fieldset is None:
+    return event_documents(ids)
+  return sparse_documents(ids, *fieldset)
 
-  query = (
-    Event.query
-      .options(joinedload(Event.categories), joinedload(Event.images))
-  )
 
-  # Theme/category filter
-  if category_slugs:
-    query = (
-      query.join(Event.categories)
-           .filter(Category.slug.in_(category_slugs))
-           .distinct()
-    )
+def _events_page(filters, page: int, per_page: int, want_facets: bool = False, snap=None):
+  """(payload without events, event ids) for an offset page of the explorer."""
+  offset = (page - 1) * per_page
 
-  # Free/paid filter
-  if type_filter == "free":
-    query = query.filter(Event.is_free.is_(True))
-  elif type_filter == "paid":
-    query = query.filter(Event.is_free.is_(False))
-
-  # Time overlap filter:
-  # An event overlaps [start, end) if:
-  #   (no end_at and start_at in window) OR
-  #   (end_at >= start and start_at < end)
-  if start and end:
-    query = query.filter(
-      db.or_(
-        db.and_(Event.end_at.is_(None), Event.start_at >= start, Event.start_at < end),
-        db.and_(Event.end_at.isnot(None), Event.end_at >= start, Event.start_at < end),
-      )
-    )
-  elif start and not end:
-    query = query.filter(Event.start_at >= start)
-  elif end and not start:
-    query = query.filter(Event.start_at < end)
-
-  # Search
-  if q:
-    like = f"%{q}%"
-    query = query.filter(
-      db.or_(
-        Event.title.ilike(like),
-        Event.description.ilike(like),
-        Event.location.ilike(like),
-      )
-    )
-
-  query = query.order_by(Event.start_at.asc(), Event.id.asc())
-  pagination = query.paginate(page=page, per_page=per_page, error_out=False)
-
-  return jsonify({
+  facets = None
+  if snap is not None:
+    total, ids = snap.page(filters, offset, per_page)
+    if want_facets:
+      total, facets = snap.facets(filters, _facet_windows())
+  else:
+    stmt = _event_id_query(filters)
+    if want_facets:
+      # the facet query carries the total, so no separate COUNT
+      total, facets = _event_facets(filters)
+    else:
+      total = db.session.execute(
+        select(func.count()).select_from(stmt.order_by(None).subquery())
+      ).scalar_one()
+    ids = db.session.execute(stmt.limit(per_page).offset(offset)).scalars().all()
+
+  payload = {
     "page": page,
     "per_page": per_page,
-    "total": pagination.total,
-    "pages": pagination.pages,
-    "events": [e.to_dict() for e in pagination.items],
-  })
+    "total": total,
+    "pages": -(-total // per_page),
+  }
+  if facets is not None:
+    payload["facets"] = facets
+  return payload, ids
 
 
 @bp.get("/api/events/<int:event_id>")
+@read_replica
 def api_event_detail(event_id: int):
-  e = (
-    Event.query.options(joinedload(Event.categories), joinedload(Event.images))
-    .filter_by(id=event_id)
-    .first_or_404()
+  try:
+    fieldset = parse_fieldset(request.args)
+  except ValueError as exc:
+    return jsonify({"error": str(exc)}), 400
+  docs = _documents([event_id], fieldset)
+  if not docs:
+    abort(404)
+  return api_response({}, event=docs[0])
+
+
+@bp.post("/api/events/<int:event_id>/images")
+@login_required
+def api_upload_event_image(event_id: int):
+  """
+  Multipart form:
+    image=<file>
+    kind=cover|gallery|past (default gallery; a new cover demotes the old one)
+    alt_text=... (optional)
+  Stores the image and its resized variants, then answers 201 with it.
+  Only accounts in ADMIN_EMAILS may upload.
+  """
+  if not current_user.is_admin:
+    return jsonify({"error": "only admins can upload event images"}), 403
+  event = db.session.get(Event, event_id)
+  if event is None:
+    abort(404)
+  upload = request.files.get("image")
+  if upload is None:
+    return jsonify({"error": "image file is required"}), 400
+  kind = (request.form.get("kind") or "gallery").lower()
+  if kind not in ("cover", "gallery", "past"):
+    return jsonify({"error": "kind must be cover, gallery or past"}), 400
+
+  store = current_app.extensions["images"]
+  image = EventImage(
+    event_id=event.id,
+    url="",
+    kind=kind,
+    alt_text=(request.form.get("alt_text") or "").strip()[:180] or None,
+    sort_order=max((img.sort_order for img in event.images), default=-1) + 1,
+  )
+  try:
+    # one byte over the limit is enough for store_original to refuse it
+    store.process(image, upload.read(store.max_bytes + 1))
+  except ValueError as exc:
+    return jsonify({"error": str(exc)}), 400
+  except ImagesUnavailable as exc:
+    return jsonify({"error": f"image uploads are not available ({exc})"}), 503
+
+  if kind == "cover":
+    for old in event.images:
+      if old.kind == "cover":
+        old.kind = "gallery"
+  db.session.add(image)
+  db.session.commit()
+  return jsonify({"image": image.to_dict()}), 201
+
+
+@bp.get("/api/events/export.ics")
+def api_events_ics():
+  """Every event matching the /api/events filters as an iCalendar file."""
+  exports = get_exports()
+  filters = _event_filters(request.args)
+  key = export_key(filters)
+  path = exports.cached(key, ".ics")
+  if path is not None:
+    return send_file(path, mimetype="text/calendar", as_attachment=True, download_name="events.ics", conditional=True)
+
+  stmt, _ = _filtered_select(
+    filters,
+    Event.id, Event.title, Event.description, Event.location, Event.start_at, Event.end_at, Event.updated_at,
   )
-  return jsonify({"event": e.to_dict()})
+  # yield_per: a server-side cursor where the driver has one, never the full list in memory
+  rows = db.session.execute(stmt.order_by(Event.start_at, Event.id).execution_options(yield_per=500))
+  body = exports.stream_ics(key, ical_chunks(rows, request.host))
+  resp = Response(stream_with_context(body), mimetype="text/calendar")
+  resp.headers["Content-Disposition"] = "attachment; filename=events.ics"
+  return resp
+
+
+@bp.get("/api/events/export.pdf")
+def api_events_pdf():
+  """
+  Printable list of the first EXPORT_PDF_LIMIT events matching the
+  /api/events filters. Answers 202 (poll again after Retry-After) until the
+  background build has finished, then the PDF.
+  """
+  exports = get_exports()
+  filters = _event_filters(request.args)
+  key = export_key(filters)
+  path = exports.cached(key, ".pdf")
+  if path is not None:
+    return send_file(path, mimetype="application/pdf", as_attachment=True, download_name="events.pdf", conditional=True)
+  if exports.pop_failure(key):
+    return jsonify({"error": "export failed, try again"}), 500
+
+  if not exports.building(key):
+    ids = db.session.execute(_event_id_query(filters).limit(exports.pdf_limit)).scalars().all()
+    events = [pdf_event(e) for e in load_events(ids)]
+    exports.submit_pdf(key, "Events", describe_filters(filters), events)
+  return jsonify({"status": "pending"}), 202, {"Retry-After": "1", "Cache-Control": "no-store"}
+
+
+@bp.get("/api/suggest")
+def api_suggest():
+  """
+  Search-box suggestions from the in-memory prefix index.
+    q=text (prefix; case and accents are ignored)
+    limit=8 (max 20)
+  """
+  suggestions = get_suggestions()
+  if suggestions is None:
+    abort(404)
+  try:
+    limit = min(max(int(request.args.get("limit", 8)), 1), 20)
+  except ValueError:
+    return jsonify({"error": "limit must be an integer"}), 400
+  results = suggestions.index().lookup(request.args.get("q") or "", limit)
+  resp = jsonify({"suggestions": results})
+  # a catalogue change only adds or drops the odd suggestion
+  resp.headers["Cache-Control"] = "public, max-age=60"
+  return resp
+
+
+@bp.get("/api/events/changes")
+def api_event_changes():
+  """
+  Events created, updated or deleted since a cursor, oldest first.
+
+  Query params:
+    since=<opaque> (next_cursor of the previous call; omit for everything)
+    limit=500 (max 1000)
+    fields=... / include=... (as for /api/events)
+
+  Each change is {"op": "upsert", "id", "seq", "external_id", "at", "event": {...}}
+  or {"op": "delete", "id", "seq", "external_id", "at"}. Keep calling with
+  next_cursor while has_more is true; next_cursor is returned (unchanged)
+  even when there is nothing new.
+  """
+  try:
+    limit = min(max(int(request.args.get("limit", 500)), 1), 1000)
+  except ValueError:
+    return jsonify({"error": "limit must be an integer"}), 400
+  try:
+    fieldset = parse_fieldset(request.args)
+  except ValueError as exc:
+    return jsonify({"error": str(exc)}), 400
+
+  after = (0, 0)
+  since = request.args.get("since") or ""
+  if since:
+    after = changes.decode_cursor(since)
+    if after is None:
+      return jsonify({"error": "invalid cursor"}), 400
+
+  rows, has_more = changes.read(after, limit)
+  upserts = [r.id for r in rows if r.op == "upsert"]
+  # never the cached documents: another worker's copy can predate r.seq, and
+  # the client moves its cursor past the change as soon as it sees the seq
+  if fieldset is None:
+    docs = [encode_event(e) for e in load_events(upserts)]
+  else:
+    docs = sparse_documents(upserts, *fieldset)
+  if len(docs) != len(upserts):
+    # deleted since the feed was read; its tombstone comes in a later batch
+    present = set(db.session.execute(select(Event.id).where(Event.id.in_(upserts))).scalars())
+    upserts = [i for i in upserts if i in present]
+  docs = dict(zip(upserts, docs))
+
+  entries = []
+  with timed("serialize"):
+    for r in rows:
+      meta = dumps({
+        "op": r.op, "id": r.id, "seq": r.seq, "external_id": r.external_id,
+        "at": r.at.isoformat() if r.at else None,
+      })
+      if r.op == "delete":
+        entries.append(meta)
+      elif r.id in docs:
+        entries.append(meta[:-1] + b',"event":' + docs[r.id] + b"}")
+
+  payload = {
+    "has_more": has_more,
+    "next_cursor": changes.encode_cursor(rows[-1].seq, rows[-1].id) if rows else (since or changes.encode_cursor(*after)),
+  }
+  return api_response(payload, changes=entries)
+
+
+@bp.get("/api/calendar")
+@cached_response
+def api_calendar():
+  """
+  month=YYYY-MM (default: current month)
+  Per local day: number of events and their ids.
+  """
+  month = request.args.get("month") or datetime.utcnow().strftime("%Y-%m")
+  try:
+    first = datetime.strptime(month, "%Y-%m")
+  except ValueError:
+    return jsonify({"error": "month must be YYYY-MM"}), 400
+
+  days = calendar_index.month_days(first.year, first.month)
+  return jsonify({
+    "month": first.strftime("%Y-%m"),
+    "days": [
+      {"date": d.isoformat(), "count": len(ids), "event_ids": ids}
+      for d, ids in days.items()
+    ],
+  })
 
 
 # Optional: persist theme interests for logged-in users
 @bp.post("/api/me/themes")
 @login_required
 def api_save_my_themes():
+  """
+  JSON body:
+    categories=[<slug>, ...]
+    price=free|paid|any (optional, kept as is when omitted)
+  """
   data = request.get_json(silent=True) or {}
   slugs = data.get("categories") or []
 
   cats = Category.query.filter(Category.slug.in_(slugs)).all()
   current_user.theme_categories = cats
+  if "price" in data:
+    price = (data.get("price") or "").lower()
+    current_user.price_preference = price if price in ("free", "paid") else None
   db.session.commit()
+  recommender.invalidate(current_user.id)
 
-  return jsonify({"ok": True, "categories": [c.to_dict() for c in cats]})
\ No newline at end of file
+  return jsonify({
+    "ok": True,
+    "categories": [c.to_dict() for c in cats],
+    "price": current_user.price_preference or "any",
+  })
+
+
+@bp.get("/api/me/recommendations")
+@login_required
+def api_my_recommendations():
+  """Top upcoming events for the current user (cached per user)."""
+  ids = recommender.for_user(current_user)
+  payload = {"needs_preferences": not ids and not current_user.theme_categories}
+  return json_response(payload, events=event_documents(ids))
\ No newline at end of file
@@ -0,0 +1,114 @@
+# warmup.py
+"""
+Startup warm-up for preloaded (fork-after-load) deployments.
+
+wsgi.py builds the app and calls warm() once in the master process. It
+compiles every template under templates/, prerenders the cached pages
+(the home page carries the category list and the default explorer page),
+fills the event documents, the explorer snapshot and the suggestion index,
+and primes the catalogue API responses. Then gunicorn forks, and every
+worker starts with all of that in memory (copy-on-write).
+
+Across the fork:
+  - warm() disposes the engines in the master, and after_fork() disposes
+    each worker's inherited pool with close=False, so no connection is
+    ever shared by two processes;
+  - process pools (bcrypt, images, exports) and the SQLite cache and
+    rate-limit connections are created lazily and keyed on the pid, so a
+    worker never uses its parent's.
+
+track_first_request() (register it before warm()) logs each worker's first request, so slow cold
+starts show up in the logs; python -m bench.startup measures startup and
+first-request latency offline, cold and warmed, for regression tracking.
+"""
+import os
+import time
+
+from flask import g, request
+
+# primed as JSON, the format browsers negotiate
+WARM_URLS = ("/api/categories", "/api/events")
+
+
+def _ms(started: float) -> float:
+  return round((time.perf_counter() - started) * 1000.0, 1)
+
+
+def precompile_templates(app) -> int:
+  """Loads (compiles) every template into the Jinja cache; returns the count."""
+  env = app.jinja_env
+  names = [n for n in env.list_templates() if not os.path.basename(n).startswith(".")]
+  if env.cache is not None and getattr(env.cache, "capacity", len(names)) < len(names):
+    env.cache.capacity = len(names)
+  for name in names:
+    env.get_template(name)
+  return len(names)
+
+
+def warm(app) -> dict:
+  """Warms the app in this process; returns timings in ms per step."""
+  from extensions import db, page_cache
+  from explorer_engine import get_engine
+  from suggest import get_suggestions
+
+  timings = {}
+  # the warm-up requests don't count as this process's first request
+  app.extensions.get("first_request_logged", set()).add(os.getpid())
+
+  started = time.perf_counter()
+  timings["templates"] = precompile_templates(app)
+  timings["templates_ms"] = _ms(started)
+
+  started = time.perf_counter()
+  with app.app_context():
+    engine = get_engine()
+    if engine is not None:
+      engine.snapshot()
+    suggestions = get_suggestions()
+    if suggestions is not None:
+      suggestions.index()
+  timings["indexes_ms"] = _ms(started)
+
+  started = time.perf_counter()
+  if app.config["PAGE_CACHE_ENABLED"]:
+    timings["pages"] = page_cache.prerender(app)
+  client = app.test_client()
+  for url in WARM_URLS:
+    client.get(url, headers={"Accept": "*/*"})
+  timings["responses_ms"] = _ms(started)
+
+  # nothing opened here may be inherited by the workers
+  with app.app_context():
+    for engine in db.engines.values():
+      engine.dispose()
+  return timings
+
+
+def after_fork(app) -> None:
+  """Call in each worker right after the fork (gunicorn post_fork)."""
+  from extensions import db
+
+  with app.app_context():
+    for engine in db.engines.values():
+      # drop the parent's pooled connections without closing them under it
+      engine.dispose(close=False)
+
+
+def track_first_request(app) -> None:
+  """Logs how long each process's first request took (once per pid)."""
+  logged = app.extensions.setdefault("first_request_logged", set())
+
+  @app.before_request
+  def _first_request_started():
+    if os.getpid() not in logged:
+      g._first_request_started = time.perf_counter()
+
+  @app.after_request
+  def _first_request_finished(response):
+    started = g.pop("_first_request_started", None)
+    if started is not None and os.getpid() not in logged:
+      logged.add(os.getpid())
+      app.logger.info(
+        "first request in pid %d: %s %s took %.1f ms", os.getpid(), request.method, request.path, _ms(started),
+      )
+    return response
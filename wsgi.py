@@ -0,0 +1,26 @@
+# wsgi.py
+"""
+WSGI entry point:
+
+  gunicorn -c gunicorn.conf.py wsgi:app
+
+With preload_app (the default in gunicorn.conf.py) this module is imported
+once in the master: the app is built and warmed there (warmup.py), then the
+workers are forked from it. WARMUP=0 skips the warm-up.
+"""
+import os
+import time
+
+_started = time.perf_counter()
+
+from app import create_app  # noqa: E402
+import warmup  # noqa: E402
+
+app = create_app()
+warmup.track_first_request(app)
+startup = {"create_app_ms": round((time.perf_counter() - _started) * 1000.0, 1)}
+
+if os.environ.get("WARMUP", "1") == "1":
+  startup.update(warmup.warm(app))
+startup["total_ms"] = round((time.perf_counter() - _started) * 1000.0, 1)
+app.logger.info("startup in pid %d: %s", os.getpid(), startup)